@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль резервного копирования базы данных
+
+Снимок создается через sqlite3.Connection.backup порциями страниц:
+между порциями БД доступна другим соединениям, поэтому копирование
+не блокирует запись и работу GUI. Снимок можно сжать (gzip или zstd,
+если установлен необязательный пакет zstandard).
+
+Файлы архивных разделов (archive/results-YYYY-MM.db) копируются тем же API
+через ATTACH в каталог <снимок>.archive рядом со снимком, поэтому снимок
+содержит и архивные результаты.
+
+Восстановление выполняется тем же API в обратную сторону, перед ним
+текущая БД сохраняется рядом с исходным файлом.
+"""
+
+import os
+import gzip
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+import db
+
+try:
+    import zstandard  # Необязательная зависимость: более быстрое и плотное сжатие
+except ImportError:
+    zstandard = None
+
+
+# Страниц за один шаг копирования; между шагами БД доступна другим соединениям
+DEFAULT_PAGES_PER_STEP = 256
+
+# Пауза между шагами (секунды)
+STEP_SLEEP = 0.005
+
+# Размер блока при сжатии и распаковке
+CHUNK_SIZE = 1024 * 1024
+
+# Суффикс каталога с архивными разделами снимка
+ARCHIVE_SUFFIX = '.archive'
+
+# Псевдоним подключаемого файла раздела при копировании
+_PARTITION_ALIAS = 'backup_part'
+
+# Расширения файлов снимков для способов сжатия
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def available_compressions() -> list:
+    """Доступные способы сжатия снимка"""
+    result = ['none', 'gzip']
+    if zstandard is not None:
+        result.append('zstd')
+    return result
+
+
+def detect_compression(path: str) -> str:
+    """Способ сжатия снимка по расширению файла"""
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return 'none'
+
+
+def default_backup_name(compression: str = 'gzip') -> str:
+    """Имя файла снимка по умолчанию: chatlist-YYYYMMDD-HHMMSS.db[.gz|.zst]"""
+    name = f"chatlist-{db.format_ts(db.now_ms(), '%Y%m%d-%H%M%S')}.db"
+    return name + COMPRESSION_EXTENSIONS.get(compression, '')
+
+
+def _compress_file(source_path: str, target_path: str, compression: str):
+    with open(source_path, 'rb') as source:
+        if compression == 'gzip':
+            with gzip.open(target_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+        elif compression == 'zstd':
+            if zstandard is None:
+                raise ValueError('Для сжатия zstd установите пакет zstandard')
+            with open(target_path, 'wb') as target:
+                zstandard.ZstdCompressor(level=3).copy_stream(source, target, read_size=CHUNK_SIZE)
+        else:
+            with open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+
+def _decompress_file(source_path: str, target_path: str, compression: str):
+    with open(target_path, 'wb') as target:
+        if compression == 'gzip':
+            with gzip.open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+        elif compression == 'zstd':
+            if zstandard is None:
+                raise ValueError('Для распаковки zstd установите пакет zstandard')
+            with open(source_path, 'rb') as source:
+                zstandard.ZstdDecompressor().copy_stream(source, target, read_size=CHUNK_SIZE)
+        else:
+            with open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+
+def _copy_pages(source: sqlite3.Connection, target: sqlite3.Connection, pages: int,
+                progress: Optional[Callable[[int, int], None]] = None, name: str = 'main'):
+    """Копирование страниц схемы name через backup API с обратным вызовом (скопировано, всего)"""
+    def on_step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+
+    source.backup(target, pages=pages, progress=on_step, name=name, sleep=STEP_SLEEP)
+
+
+def _page_count(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _check_integrity(path: str):
+    """Быстрая проверка целостности файла БД"""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise ValueError(f'Снимок поврежден: {result}')
+
+
+class _Progress:
+    """Общий ход копирования нескольких файлов (основная БД и архивные разделы)"""
+
+    def __init__(self, callback: Optional[Callable[[int, int], None]], total: int):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+
+    def file(self, pages: int) -> Optional[Callable[[int, int], None]]:
+        """Обратный вызов для копирования очередного файла из pages страниц"""
+        if self.callback is None:
+            return None
+        offset = self.done
+        self.done += pages
+        return lambda done, total: self.callback(offset + done, max(self.total, offset + total))
+
+
+def archive_backup_dir(path: str) -> str:
+    """Каталог архивных разделов снимка: chatlist-....db.gz -> chatlist-....archive"""
+    base = path
+    extension = COMPRESSION_EXTENSIONS.get(detect_compression(path))
+    if extension:
+        base = base[:-len(extension)]
+    if base.endswith('.db'):
+        base = base[:-len('.db')]
+    return base + ARCHIVE_SUFFIX
+
+
+def _catalog_files(conn: sqlite3.Connection) -> List[str]:
+    """Файлы разделов из каталога archive_partitions"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'archive_partitions'").fetchone() is None:
+        return []
+    return [row[0] for row in conn.execute('SELECT file FROM archive_partitions ORDER BY name')]
+
+
+def _snapshot_file(copy: Callable[[sqlite3.Connection], None], target_path: str, compression: str) -> int:
+    """
+    Скопировать БД во временный файл функцией copy, проверить и записать в target_path
+
+    Returns:
+        Размер несжатой копии в байтах
+    """
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    os.makedirs(target_dir, exist_ok=True)
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=target_dir)
+    os.close(fd)
+    try:
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            copy(snapshot)
+        finally:
+            snapshot.close()
+        _check_integrity(snapshot_path)
+        size = os.path.getsize(snapshot_path)
+        if compression == 'none':
+            os.replace(snapshot_path, target_path)
+        else:
+            _compress_file(snapshot_path, target_path, compression)
+        return size
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def _backup_partition(partition_path: str, target_path: str, compression: str, pages: int,
+                      progress: Optional[Callable[[int, int], None]]) -> int:
+    """Снимок файла архивного раздела (подключается к соединению через ATTACH)"""
+    def copy(snapshot):
+        source = db.get_connection()
+        try:
+            source.execute('ATTACH DATABASE ? AS ' + _PARTITION_ALIAS, (partition_path,))
+            _copy_pages(source, snapshot, pages, progress, name=_PARTITION_ALIAS)
+        finally:
+            source.close()
+
+    return _snapshot_file(copy, target_path, compression)
+
+
+def backup_database(target_path: str, compression: str = 'none',
+                    pages: int = DEFAULT_PAGES_PER_STEP,
+                    progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Создать снимок БД без остановки приложения
+
+    Архивные разделы из каталога archive_partitions снимка копируются
+    в каталог archive_backup_dir(target_path) с тем же сжатием.
+
+    Args:
+        target_path: Путь к файлу снимка
+        compression: 'none', 'gzip' или 'zstd'
+        pages: Страниц за один шаг копирования
+        progress: Функция обратного вызова (скопировано страниц, всего страниц)
+
+    Returns:
+        Словарь: path, compression, db_size, size, partitions (скопировано разделов),
+        archive_path (каталог разделов или None), missing_partitions (файлы разделов
+        из каталога, которых нет на диске), duration
+    """
+    if compression not in ('none', 'gzip', 'zstd'):
+        raise ValueError(f'Неизвестный способ сжатия: {compression}')
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError('Для сжатия zstd установите пакет zstandard')
+
+    start_time = time.perf_counter()
+    archive_dir = db.get_archive_dir()
+    source = db.get_connection()
+    try:
+        total_pages = source.execute('PRAGMA page_count').fetchone()[0]
+        total_pages += sum(_page_count(os.path.join(archive_dir, file)) for file in _catalog_files(source)
+                           if os.path.exists(os.path.join(archive_dir, file)))
+        tracker = _Progress(progress, total_pages)
+        catalog = []
+
+        def copy_main(snapshot):
+            _copy_pages(source, snapshot, pages, tracker.file(source.execute('PRAGMA page_count').fetchone()[0]))
+            # Разделы - по каталогу в снимке: он согласован с перенесенными в архив строками
+            catalog.extend(_catalog_files(snapshot))
+
+        db_size = _snapshot_file(copy_main, target_path, compression)
+    finally:
+        source.close()
+    size = os.path.getsize(target_path)
+
+    extension = COMPRESSION_EXTENSIONS.get(compression, '')
+    backup_dir = archive_backup_dir(target_path)
+    temp_dir = backup_dir + '.tmp'
+    missing = [file for file in catalog if not os.path.exists(os.path.join(archive_dir, file))]
+    copied = [file for file in catalog if file not in missing]
+    if os.path.isdir(temp_dir):
+        shutil.rmtree(temp_dir)
+    try:
+        for file in copied:
+            partition_path = os.path.join(archive_dir, file)
+            _backup_partition(partition_path, os.path.join(temp_dir, file + extension), compression,
+                              pages, tracker.file(_page_count(partition_path)))
+            size += os.path.getsize(os.path.join(temp_dir, file + extension))
+        # Каталог прежнего снимка с тем же именем заменяется целиком
+        if os.path.isdir(backup_dir):
+            shutil.rmtree(backup_dir)
+        if copied:
+            os.replace(temp_dir, backup_dir)
+    finally:
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir)
+    return {
+        'path': target_path,
+        'compression': compression,
+        'db_size': db_size,
+        'size': size,
+        'partitions': len(copied),
+        'archive_path': backup_dir if copied else None,
+        'missing_partitions': missing,
+        'duration': time.perf_counter() - start_time
+    }
+
+
+def _unpack_snapshot(source_path: str, temp_files: List[str]) -> str:
+    """Распаковать файл снимка во временный файл и проверить его целостность"""
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    temp_files.append(snapshot_path)
+    _decompress_file(source_path, snapshot_path, detect_compression(source_path))
+    _check_integrity(snapshot_path)
+    return snapshot_path
+
+
+def _partition_snapshots(source_path: str) -> Dict[str, str]:
+    """Файлы разделов в каталоге снимка: имя файла раздела -> путь к (сжатой) копии"""
+    backup_dir = archive_backup_dir(source_path)
+    if not os.path.isdir(backup_dir):
+        return {}
+    snapshots = {}
+    for name in os.listdir(backup_dir):
+        extension = COMPRESSION_EXTENSIONS.get(detect_compression(name), '')
+        snapshots[name[:-len(extension)] if extension else name] = os.path.join(backup_dir, name)
+    return snapshots
+
+
+def restore_database(source_path: str, keep_current: bool = True,
+                     pages: int = DEFAULT_PAGES_PER_STEP,
+                     progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Восстановить БД из снимка
+
+    Снимок и копии архивных разделов распаковываются во временные файлы,
+    проверяются и копируются в рабочую БД и каталог архива через backup API
+    (открытые соединения видят новое содержимое). Если в каталоге
+    archive_partitions снимка есть разделы, копий которых нет рядом со снимком,
+    восстановление не выполняется. Файлы разделов, которых нет в снимке,
+    переименовываются (*.before-restore-<время>), чтобы не смешиваться с новыми.
+    После восстановления применяются миграции, если снимок старой версии.
+
+    Args:
+        source_path: Файл снимка (.db, .db.gz или .db.zst)
+        keep_current: Сохранить текущую БД (с архивными разделами) перед восстановлением
+        pages: Страниц за один шаг копирования
+        progress: Функция обратного вызова (скопировано страниц, всего страниц)
+
+    Returns:
+        Словарь: path, safety_copy (путь к копии текущей БД или None),
+        partitions (восстановлено разделов), duration
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f'Файл снимка не найден: {source_path}')
+
+    start_time = time.perf_counter()
+    temp_files = []
+    try:
+        # Все файлы проверяются до изменения рабочей БД
+        snapshot_path = _unpack_snapshot(source_path, temp_files)
+        snapshot = sqlite3.connect(snapshot_path)
+        try:
+            catalog = _catalog_files(snapshot)
+        finally:
+            snapshot.close()
+        available = _partition_snapshots(source_path)
+        missing = [file for file in catalog if file not in available]
+        if missing:
+            raise ValueError(
+                f'В снимке нет архивных разделов: {", ".join(missing)} '
+                f'(ожидаются в каталоге {archive_backup_dir(source_path)})')
+        partitions = {file: _unpack_snapshot(available[file], temp_files) for file in catalog}
+
+        safety_copy = None
+        if keep_current and os.path.exists(db.DB_NAME):
+            stamp = db.format_ts(db.now_ms(), '%Y%m%d-%H%M%S')
+            safety_copy = f"{db.DB_NAME}.before-restore-{stamp}"
+            backup_database(safety_copy, pages=pages)
+
+        tracker = _Progress(progress, sum(_page_count(path) for path in [snapshot_path, *partitions.values()]))
+        snapshot = sqlite3.connect(snapshot_path)
+        target = db.get_connection()
+        try:
+            _copy_pages(snapshot, target, pages, tracker.file(_page_count(snapshot_path)))
+        finally:
+            target.close()
+            snapshot.close()
+
+        archive_dir = db.get_archive_dir()
+        if catalog:
+            os.makedirs(archive_dir, exist_ok=True)
+        for file, partition_snapshot in partitions.items():
+            snapshot = sqlite3.connect(partition_snapshot)
+            target = sqlite3.connect(os.path.join(archive_dir, file))
+            try:
+                _copy_pages(snapshot, target, pages, tracker.file(_page_count(partition_snapshot)))
+            finally:
+                target.close()
+                snapshot.close()
+
+        # Разделы, которых нет в восстановленном каталоге: при следующем архивировании
+        # в файл с тем же именем попали бы устаревшие строки
+        if os.path.isdir(archive_dir):
+            stamp = db.format_ts(db.now_ms(), '%Y%m%d-%H%M%S')
+            for name in os.listdir(archive_dir):
+                if name.startswith('results-') and name.endswith('.db') and name not in partitions:
+                    os.replace(os.path.join(archive_dir, name),
+                               os.path.join(archive_dir, f'{name}.before-restore-{stamp}'))
+
+        db.init_database()
+        return {
+            'path': source_path,
+            'safety_copy': safety_copy,
+            'partitions': len(partitions),
+            'duration': time.perf_counter() - start_time
+        }
+    finally:
+        for path in temp_files:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль пакетного улучшения библиотеки промтов
+
+Промты выбираются по ID, тегам или подстроке, для каждого промта варианты
+улучшения запрашиваются у выбранных моделей (prompt_improver.get_prompt_variants,
+в том числе из кэша improver_cache). Одновременно выполняется не больше
+concurrency запросов, и задачи ставятся в пул по мере освобождения потоков,
+поэтому память не растет с размером библиотеки. Варианты сохраняются
+в таблицу prompt_variants в вызывающем потоке сразу после ответа модели:
+прерванный запуск сохраняет готовое, повторный берет его из кэша.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+from models import Model
+import db
+import prompt_improver
+
+
+# Одновременных запросов к моделям по умолчанию
+DEFAULT_CONCURRENCY = 4
+
+# Сколько ошибок сохранять в отчете
+MAX_REPORTED_ERRORS = 20
+
+
+def select_prompts(ids: Optional[List[int]] = None, tags=None, tags_mode: str = 'any',
+                   search: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Промты для улучшения
+
+    Args:
+        ids: ID промтов (несуществующие и повторные пропускаются, порядок сохраняется)
+        tags, tags_mode, search: Фильтры как в db.get_prompts
+        limit: Не больше стольких промтов (самые новые)
+    """
+    if ids:
+        ids = list(dict.fromkeys(ids))
+        prompts = [prompt for prompt in (db.get_prompt_by_id(prompt_id) for prompt_id in ids) if prompt]
+        if tags or search:
+            selected = {prompt['id'] for prompt in db.get_prompts(search=search, tags=tags, tags_mode=tags_mode)}
+            prompts = [prompt for prompt in prompts if prompt['id'] in selected]
+    else:
+        prompts = db.get_prompts(search=search, tags=tags, tags_mode=tags_mode)
+    return prompts[:limit] if limit else prompts
+
+
+def variant_entries(variants_data: Dict) -> List[Dict]:
+    """Варианты из результата get_prompt_variants в виде строк prompt_variants (kind, text)"""
+    entries = []
+    if variants_data.get('improved'):
+        entries.append({'kind': 'improved', 'text': variants_data['improved']})
+    entries.extend({'kind': 'variant', 'text': text} for text in variants_data.get('variants') or [] if text)
+    for key, kind in prompt_improver.SPECIALIZED_KEYS.items():
+        if variants_data.get(key):
+            entries.append({'kind': kind, 'text': variants_data[key]})
+    return entries
+
+
+def _request(model: Model, prompt_text: str, use_cache: bool):
+    start_time = time.perf_counter()
+    variants_data = prompt_improver.get_prompt_variants(model, prompt_text, use_cache)
+    return variants_data, time.perf_counter() - start_time
+
+
+def improve_prompts(prompts: List[Dict], models_list: List[Model], concurrency: int = DEFAULT_CONCURRENCY,
+                    use_cache: bool = True, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Запросить и сохранить варианты улучшения для списка промтов
+
+    Args:
+        prompts: Промты (словари с id и prompt, см. select_prompts)
+        models_list: Модели, у которых запрашиваются варианты
+        concurrency: Максимум одновременных запросов
+        use_cache: Брать ответы из кэша improver_cache
+        progress: Функция обратного вызова (выполнено запросов, всего запросов)
+
+    Returns:
+        Словарь: prompts, prompts_done (ответили все модели, хотя бы одна успешно), models,
+        requests, succeeded, cached, failed, variants_saved, errors, interrupted, duration,
+        request_time (суммарное время запросов к API), requests_per_second, prompts_per_minute,
+        avg_latency
+    """
+    start_time = time.perf_counter()
+    total = len(prompts) * len(models_list)
+    report = {
+        'prompts': len(prompts),
+        'models': len(models_list),
+        'requests': 0,
+        'succeeded': 0,
+        'cached': 0,
+        'failed': 0,
+        'variants_saved': 0,
+        'errors': [],
+        'interrupted': False,
+        'request_time': 0.0,
+    }
+    tasks = ((prompt, model) for prompt in prompts for model in models_list)
+    # Запрошенные модели по промту: промт считается готовым, когда ответили все
+    # и хотя бы один ответ успешен
+    remaining = {prompt['id']: len(models_list) for prompt in prompts}
+    improved = set()
+    prompts_done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        pending = {}
+
+        def submit(count: int):
+            for prompt, model in tasks:
+                pending[executor.submit(_request, model, prompt['prompt'], use_cache)] = (prompt, model)
+                count -= 1
+                if count <= 0:
+                    break
+
+        submit(max(1, concurrency) * 2)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    prompt, model = pending.pop(future)
+                    variants_data, elapsed = future.result()  # get_prompt_variants не выбрасывает исключений
+                    report['requests'] += 1
+                    if variants_data.get('success', False) and not variants_data.get('parsed', True):
+                        # Оборванный или не-JSON ответ не сохраняется (и не кэшируется):
+                        # повторный запуск запросит модель заново
+                        variants_data = {'success': False, 'error': 'ответ модели не разобран как JSON'}
+                    if variants_data.get('success', False):
+                        report['succeeded'] += 1
+                        if variants_data.get('cached'):
+                            report['cached'] += 1
+                        else:
+                            report['request_time'] += elapsed
+                        report['variants_saved'] += db.replace_prompt_variants(
+                            prompt['id'], model.id, variant_entries(variants_data))
+                        improved.add(prompt['id'])
+                    else:
+                        report['failed'] += 1
+                        if len(report['errors']) < MAX_REPORTED_ERRORS:
+                            report['errors'].append(
+                                f"промт {prompt['id']}, {model.name}: {variants_data.get('error', 'Неизвестная ошибка')}")
+                    remaining[prompt['id']] -= 1
+                    if remaining[prompt['id']] == 0 and prompt['id'] in improved:
+                        prompts_done += 1
+                    if progress:
+                        progress(report['requests'], total)
+                submit(len(done))
+        except KeyboardInterrupt:
+            # Готовые варианты уже сохранены; дожидаемся только выполняющихся запросов
+            report['interrupted'] = True
+            for future in pending:
+                future.cancel()
+
+    duration = time.perf_counter() - start_time
+    report['prompts_done'] = prompts_done
+    report['duration'] = duration
+    report['requests_per_second'] = report['requests'] / duration if duration > 0 else 0.0
+    report['prompts_per_minute'] = prompts_done * 60 / duration if duration > 0 else 0.0
+    report['avg_latency'] = report['request_time'] / (report['succeeded'] - report['cached']) \
+        if report['succeeded'] > report['cached'] else None
+    return report
+
+
+def format_report(report: Dict) -> str:
+    """Текстовый отчет о пакетном улучшении для консоли"""
+    lines = [
+        f"Пакетное улучшение {'прервано' if report['interrupted'] else 'завершено'} за {report['duration']:.1f} с",
+        f"  промтов улучшено: {report['prompts_done']} из {report['prompts']}, моделей: {report['models']}",
+        f"  запросов: {report['requests']} (успешно {report['succeeded']}, из кэша {report['cached']}, "
+        f"ошибок {report['failed']})",
+        f"  сохранено вариантов: {report['variants_saved']}",
+        f"  пропускная способность: {report['requests_per_second']:.2f} запросов/с, "
+        f"{report['prompts_per_minute']:.1f} промтов/мин",
+    ]
+    if report['avg_latency'] is not None:
+        lines.append(f"  среднее время запроса к API: {report['avg_latency']:.2f} с")
+    if report['errors']:
+        lines.append('  ошибки:')
+        lines.extend(f'    {error}' for error in report['errors'])
+    return '\n'.join(lines)
@@ -11,6 +11,6 @@ pip install -r requirements.txt
 
 Write-Host "`nСоздание исполняемого файла..." -ForegroundColor Green
 $exeName = "ChatList-v$version"
-python -m PyInstaller --onefile --windowed --name="$exeName" --icon="app.ico" --hidden-import=dotenv --hidden-import=sqlite3 --hidden-import=version main.py
+python -m PyInstaller --onefile --windowed --name="$exeName" --icon="app.ico" --hidden-import=dotenv --hidden-import=sqlite3 --hidden-import=version --add-data "themes;themes" main.py
 
 Write-Host "`nИсполняемый файл создан в папке dist\$exeName.exe" -ForegroundColor Green
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Консольные команды ChatList для обслуживания без графического интерфейса
+
+Примеры:
+    python cli.py migrate --dry-run
+    python cli.py migrate --batch-size 1000
+    python cli.py archive --older-than-days 180 --dry-run
+    python cli.py archive --list
+    python cli.py maintenance --if-due
+    python cli.py backup backups/ --compress gzip
+    python cli.py restore backups/chatlist-20250101-120000.db.gz
+    python cli.py export results.jsonl --since-days 30
+    python cli.py import results.jsonl
+    python cli.py startup-profile
+    python cli.py improve-batch --tag работа --concurrency 4
+"""
+
+import sys
+import os
+import argparse
+import backup
+import db
+import exporters
+import importers
+import maintenance
+import migrations
+import startup_profile
+
+
+def cmd_migrate(args) -> int:
+    """Применить миграции схемы БД или показать план (--dry-run)"""
+    conn = db.get_connection()
+    try:
+        current = migrations.get_schema_version(conn)
+        print(f'БД: {db.DB_NAME}')
+        print(f'Версия схемы: {current}, актуальная: {migrations.latest_version()}')
+
+        def progress(item, stage):
+            stage_name = 'схема' if stage == 'schema' else 'перенос данных'
+            print(f'  v{item.version} ({stage_name})...', flush=True)
+
+        report = migrations.migrate(conn, dry_run=args.dry_run, batch_size=args.batch_size,
+                                    progress=None if args.dry_run else progress)
+        print(migrations.format_report(report, dry_run=args.dry_run))
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_archive(args) -> int:
+    """Перенести старые результаты в помесячные архивные разделы"""
+    db.init_database()
+    if args.list:
+        partitions = db.get_archive_partitions()
+        if not partitions:
+            print('Архивных разделов нет')
+        for partition in partitions:
+            print(f"  {partition['name']}: {partition['row_count']} результатов, "
+                  f"{db.format_ts(partition['min_ts'])} - {db.format_ts(partition['max_ts'])} ({partition['file']})")
+        return 0
+
+    if args.older_than_days is None:
+        print('Укажите --older-than-days или --list', file=sys.stderr)
+        return 2
+    cutoff_ts = db.now_ms() - args.older_than_days * 86400 * 1000
+    print(f'Граница: {db.format_ts(cutoff_ts)}')
+
+    if args.dry_run:
+        candidates = db.get_archive_candidates(cutoff_ts)
+        if not candidates:
+            print('Нет результатов для архивирования')
+        for item in candidates:
+            print(f"  {item['name']}: {item['count']} результатов")
+        return 0
+
+    report = db.archive_results(cutoff_ts, batch_size=args.batch_size,
+                                progress=lambda moved: print(f'  перенесено: {moved}', flush=True))
+    print(f"Перенесено результатов: {report['moved']} за {report['duration']:.2f} с")
+    if report['partitions']:
+        print(f"Разделы: {', '.join(report['partitions'])}")
+    return 0
+
+
+def cmd_maintenance(args) -> int:
+    """Обслуживание БД: optimize, инкрементальная очистка, контрольная точка WAL"""
+    db.init_database()
+    if args.history:
+        for run in maintenance.get_runs():
+            print(f"  {db.format_ts(run['started_ts'])} [{run['trigger']}] {run['duration']:.2f} с, "
+                  f"освобождено {run['reclaimed_bytes'] / 1024:.0f} КБ ({run['vacuum_mode']})")
+        return 0
+    if args.if_due and not maintenance.is_due():
+        print('Обслуживание не требуется: интервал с последнего запуска не истек')
+        return 0
+    report = maintenance.run_maintenance(trigger='cli', vacuum_pages=args.vacuum_pages,
+                                         full_vacuum=args.full_vacuum, checkpoint_mode=args.checkpoint)
+    print(maintenance.format_report(report))
+    return 0
+
+
+def _print_progress(done: int, total: int):
+    print(f'\r  страниц: {done}/{total}', end='', flush=True)
+
+
+def cmd_backup(args) -> int:
+    """Создать снимок БД (онлайн, без остановки приложения)"""
+    target = args.target
+    if os.path.isdir(target) or target.endswith(os.sep):
+        target = os.path.join(target, backup.default_backup_name(args.compress))
+    report = backup.backup_database(target, compression=args.compress, pages=args.pages,
+                                    progress=_print_progress)
+    print()
+    print(f"Снимок: {report['path']}")
+    print(f"Размер: {report['size'] / 1024:.0f} КБ (БД {report['db_size'] / 1024:.0f} КБ), {report['duration']:.2f} с")
+    if report['archive_path']:
+        print(f"Архивные разделы ({report['partitions']}): {report['archive_path']}")
+    if report['missing_partitions']:
+        print(f"Внимание: файлы архивных разделов не найдены и не скопированы: "
+              f"{', '.join(report['missing_partitions'])}")
+        return 1
+    return 0
+
+
+def cmd_restore(args) -> int:
+    """Восстановить БД из снимка"""
+    report = backup.restore_database(args.source, keep_current=not args.no_safety_copy,
+                                     pages=args.pages, progress=_print_progress)
+    print()
+    print(f"БД восстановлена из {report['path']} за {report['duration']:.2f} с")
+    if report['partitions']:
+        print(f"Восстановлено архивных разделов: {report['partitions']}")
+    if report['safety_copy']:
+        print(f"Предыдущая БД сохранена в {report['safety_copy']}")
+    return 0
+
+
+def cmd_export(args) -> int:
+    """Потоковый экспорт результатов в файл"""
+    db.init_database()
+    filters = {'search': args.search}
+    if args.since_days is not None:
+        filters['since'] = db.now_ms() - args.since_days * 86400 * 1000
+
+    def progress(count, total):
+        print(f'\r  результатов: {count}' + (f'/{total}' if total is not None else ''), end='', flush=True)
+
+    report = exporters.export_results(args.path, args.format, filters=filters, progress=progress)
+    print()
+    print(f"Экспортировано результатов: {report['count']} в {report['path']} за {report['duration']:.2f} с")
+    return 0
+
+
+def cmd_import(args) -> int:
+    """Пакетный импорт промтов и результатов из JSONL или CSV"""
+    db.init_database()
+    report = importers.import_file(
+        args.path, args.format, batch_size=args.batch_size, create_models=not args.no_create_models,
+        progress=lambda count: print(f'\r  прочитано записей: {count}', end='', flush=True))
+    print()
+    print(importers.format_report(report))
+    return 0
+
+
+def cmd_startup_profile(args) -> int:
+    """Профиль запуска GUI: этапы запуска и самые медленные импорты (python -X importtime)"""
+    report = startup_profile.profile_startup(top=args.top)
+    print(report['report'])
+    return 0 if report['returncode'] == 0 else 1
+
+
+def cmd_improve_batch(args) -> int:
+    """Пакетное улучшение сохраненных промтов (варианты сохраняются в prompt_variants)"""
+    # Модули запросов к API нужны только этой команде
+    import batch_improver
+    import models
+    db.init_database()
+    prompts = batch_improver.select_prompts(ids=args.ids, tags=args.tag, tags_mode=args.tags_mode,
+                                            search=args.search, limit=args.limit)
+    models_list = models.get_active_models()
+    if args.models:
+        names = {name.casefold() for name in args.models}
+        models_list = [model for model in models.get_all_models() if model.name.casefold() in names]
+    if not prompts or not models_list:
+        print('Нет промтов для улучшения' if not prompts else 'Нет моделей для улучшения')
+        return 1
+    print(f"Промтов: {len(prompts)}, моделей: {len(models_list)} ({', '.join(model.name for model in models_list)}), "
+          f"запросов: {len(prompts) * len(models_list)}")
+    if args.dry_run:
+        for prompt in prompts:
+            print(f"  {prompt['id']}: {' '.join(prompt['prompt'].split())[:80]}")
+        return 0
+    report = batch_improver.improve_prompts(
+        prompts, models_list, concurrency=args.concurrency or batch_improver.DEFAULT_CONCURRENCY,
+        use_cache=not args.no_cache,
+        progress=lambda done, total: print(f'\r  запросов: {done}/{total}', end='', flush=True))
+    print()
+    print(batch_improver.format_report(report))
+    return 1 if report['interrupted'] or report['failed'] == report['requests'] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='chatlist', description='Обслуживание базы данных ChatList')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Применить миграции схемы БД')
+    migrate_parser.add_argument('--dry-run', action='store_true',
+                                help='Только показать план и объем переноса данных')
+    migrate_parser.add_argument('--batch-size', type=int, default=500,
+                                help='Размер порции при переносе данных (по умолчанию 500)')
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    archive_parser = subparsers.add_parser('archive', help='Архивировать старые результаты')
+    archive_parser.add_argument('--older-than-days', type=int,
+                                help='Переносить результаты старше указанного числа дней')
+    archive_parser.add_argument('--dry-run', action='store_true',
+                                help='Только показать, сколько результатов попадет в каждый раздел')
+    archive_parser.add_argument('--list', action='store_true', help='Показать архивные разделы')
+    archive_parser.add_argument('--batch-size', type=int, default=500,
+                                help='Размер порции при переносе (по умолчанию 500)')
+    archive_parser.set_defaults(func=cmd_archive)
+
+    maintenance_parser = subparsers.add_parser('maintenance', help='Обслуживание базы данных')
+    maintenance_parser.add_argument('--if-due', action='store_true',
+                                    help='Выполнить, только если истек интервал с последнего запуска')
+    maintenance_parser.add_argument('--full-vacuum', action='store_true',
+                                    help='Полный VACUUM (однократно переводит старую БД на инкрементальную очистку)')
+    maintenance_parser.add_argument('--vacuum-pages', type=int, default=maintenance.DEFAULT_VACUUM_PAGES,
+                                    help='Максимум страниц за инкрементальную очистку (0 - все)')
+    maintenance_parser.add_argument('--checkpoint', choices=maintenance.CHECKPOINT_MODES, default='TRUNCATE',
+                                    help='Режим контрольной точки WAL (по умолчанию TRUNCATE)')
+    maintenance_parser.add_argument('--history', action='store_true', help='Показать журнал обслуживания')
+    maintenance_parser.set_defaults(func=cmd_maintenance)
+
+    backup_parser = subparsers.add_parser('backup', help='Создать резервную копию БД')
+    backup_parser.add_argument('target', help='Файл снимка или каталог (имя с датой формируется автоматически)')
+    backup_parser.add_argument('--compress', choices=backup.available_compressions(), default='gzip',
+                               help='Сжатие снимка (по умолчанию gzip)')
+    backup_parser.add_argument('--pages', type=int, default=backup.DEFAULT_PAGES_PER_STEP,
+                               help='Страниц за один шаг копирования')
+    backup_parser.set_defaults(func=cmd_backup)
+
+    restore_parser = subparsers.add_parser('restore', help='Восстановить БД из резервной копии')
+    restore_parser.add_argument('source', help='Файл снимка (.db, .db.gz, .db.zst)')
+    restore_parser.add_argument('--no-safety-copy', action='store_true',
+                                help='Не сохранять текущую БД перед восстановлением')
+    restore_parser.add_argument('--pages', type=int, default=backup.DEFAULT_PAGES_PER_STEP,
+                                help='Страниц за один шаг копирования')
+    restore_parser.set_defaults(func=cmd_restore)
+
+    export_parser = subparsers.add_parser('export', help='Экспортировать результаты')
+    export_parser.add_argument('path', help='Файл экспорта (формат по расширению: .md, .json, .jsonl, .csv)')
+    export_parser.add_argument('--format', choices=list(exporters.EXPORTERS),
+                               help='Формат, если не определяется по расширению')
+    export_parser.add_argument('--search', help='Только результаты, содержащие текст')
+    export_parser.add_argument('--since-days', type=int, help='Только результаты за последние N дней')
+    export_parser.set_defaults(func=cmd_export)
+
+    import_parser = subparsers.add_parser('import', help='Импортировать промты и результаты')
+    import_parser.add_argument('path', help='Файл JSONL или CSV (например, созданный командой export)')
+    import_parser.add_argument('--format', choices=list(importers.IMPORT_FORMATS),
+                               help='Формат, если не определяется по расширению')
+    import_parser.add_argument('--batch-size', type=int, default=importers.DEFAULT_BATCH_SIZE,
+                               help=f'Записей в одной транзакции (по умолчанию {importers.DEFAULT_BATCH_SIZE})')
+    import_parser.add_argument('--no-create-models', action='store_true',
+                               help='Пропускать результаты моделей, которых нет в БД')
+    import_parser.set_defaults(func=cmd_import)
+
+    profile_parser = subparsers.add_parser('startup-profile', help='Замерить время запуска GUI')
+    profile_parser.add_argument('--top', type=int, default=15, help='Сколько самых медленных импортов показать')
+    profile_parser.set_defaults(func=cmd_startup_profile)
+
+    improve_parser = subparsers.add_parser('improve-batch', help='Улучшить сохраненные промты без GUI')
+    improve_parser.add_argument('--ids', type=int, nargs='+', help='ID промтов')
+    improve_parser.add_argument('--tag', action='append', help='Только промты с тегом (можно повторять)')
+    improve_parser.add_argument('--tags-mode', choices=['any', 'all'], default='any',
+                                help='any - хотя бы один из тегов, all - все теги (по умолчанию any)')
+    improve_parser.add_argument('--search', help='Только промты, содержащие текст')
+    improve_parser.add_argument('--limit', type=int, help='Не больше N самых новых промтов')
+    improve_parser.add_argument('--models', nargs='+', help='Названия моделей (по умолчанию все активные)')
+    improve_parser.add_argument('--concurrency', type=int,
+                                help='Одновременных запросов к моделям (по умолчанию 4)')
+    improve_parser.add_argument('--no-cache', action='store_true', help='Запросить модели в обход кэша')
+    improve_parser.add_argument('--dry-run', action='store_true', help='Только показать выбранные промты')
+    improve_parser.set_defaults(func=cmd_improve_batch)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
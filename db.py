@@ -7,8 +7,19 @@
 import sqlite3
 import json
 import os
+import time
+import hashlib
+import threading
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Tuple
+import metrics
+
+try:
+    import zstandard  # Необязательная зависимость: более быстрое и плотное сжатие
+except ImportError:
+    zstandard = None
 
 
 def get_db_path():
@@ -63,143 +74,387 @@ def get_db_path():
         return os.path.join(home_dir, 'chatlist.db')
 
 
-DB_NAME = get_db_path()
+def get_db_name() -> str:
+    """
+    Путь к БД: определяется при первом обращении и кэшируется
+    
+    Проверка прав на запись не выполняется при импорте модуля; db.DB_NAME
+    по-прежнему доступен (через __getattr__ модуля) и может быть переопределен.
+    """
+    global DB_NAME
+    try:
+        return DB_NAME
+    except NameError:
+        DB_NAME = get_db_path()
+        return DB_NAME
+
+
+def __getattr__(name: str):
+    if name == 'DB_NAME':
+        return get_db_name()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_connection():
     """Получить соединение с базой данных"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(get_db_name())
     conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+    # Функция распаковки текста ответа для поиска по blobs в SQL
+    conn.create_function('chatlist_text', 2, _decode_text_or_none, deterministic=True)
+    # Регистронезависимый поиск подстроки с поддержкой кириллицы (LIKE учитывает только ASCII)
+    conn.create_function('chatlist_contains', 2, _contains_casefold, deterministic=True)
     return conn
 
 
+# Через сколько инструкций виртуальной машины SQLite проверять отмену запроса
+CANCEL_CHECK_STEPS = 1000
+
+
+def _watch_cancel(conn: sqlite3.Connection, cancel_event: Optional[threading.Event]):
+    """Прерывать запросы соединения после установки cancel_event (для поиска в рабочих потоках)"""
+    if cancel_event is not None:
+        conn.set_progress_handler(lambda: 1 if cancel_event.is_set() else 0, CANCEL_CHECK_STEPS)
+
+
+def _contains_casefold(text: Optional[str], needle: Optional[str]) -> bool:
+    """Проверка вхождения подстроки без учета регистра"""
+    if not text or not needle:
+        return False
+    return needle.casefold() in text.casefold()
+
+
 def init_database():
-    """Инициализация базы данных: создание таблиц и индексов"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Инициализация базы данных: применение недостающих миграций схемы"""
+    import migrations  # Модуль миграций сам импортирует db
     
+    conn = get_connection()
     try:
-        # Таблица промтов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS prompts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                prompt TEXT NOT NULL,
-                tags TEXT
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompts_date ON prompts(date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompts_tags ON prompts(tags)')
-        
-        # Таблица моделей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS models (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                api_url TEXT NOT NULL,
-                api_key_env TEXT NOT NULL,
-                model_type TEXT NOT NULL,
-                is_active INTEGER NOT NULL DEFAULT 1,
-                created_date TEXT NOT NULL
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_models_name ON models(name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_models_active ON models(is_active)')
-        
-        # Таблица результатов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prompt_id INTEGER NOT NULL,
-                model_id INTEGER NOT NULL,
-                response_text TEXT NOT NULL,
-                saved_date TEXT NOT NULL,
-                metadata TEXT,
-                FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
-                FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE SET NULL
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_prompt ON results(prompt_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_model ON results(model_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_date ON results(saved_date)')
-        
-        # Таблица настроек
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                key TEXT NOT NULL UNIQUE,
-                value TEXT,
-                description TEXT
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_settings_key ON settings(key)')
-        
-        # Вставка стандартных настроек
-        cursor.executemany('''
-            INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)
-        ''', [
-            ('default_timeout', '30', 'Таймаут HTTP-запросов в секундах'),
-            ('max_response_length', '5000', 'Максимальная длина ответа для отображения'),
-            ('auto_save_prompts', 'false', 'Автоматически сохранять промты при отправке'),
-            ('theme', 'system', 'Тема интерфейса')
-        ])
-        
-        conn.commit()
+        migrations.migrate(conn)
         return True
-    except Exception as e:
-        conn.rollback()
-        raise e
     finally:
         conn.close()
 
 
+# ==================== Отметки времени ====================
+
+# Формат даты для отображения (и для текстовых колонок дат, сохраняемых для совместимости)
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Текстовая дата в локальном времени из отметки в миллисекундах (параметр запроса)
+_LOCAL_DATE_SQL = "strftime('%Y-%m-%d %H:%M:%S', ? / 1000, 'unixepoch', 'localtime')"
+
+
+def now_ms() -> int:
+    """Текущее время в миллисекундах с начала эпохи (UTC)"""
+    return int(time.time() * 1000)
+
+
+def format_ts(ts: Optional[int], fmt: str = DATE_FORMAT) -> str:
+    """Отформатировать отметку времени в миллисекундах для отображения (локальное время)"""
+    if ts is None:
+        return ''
+    return datetime.fromtimestamp(ts / 1000).strftime(fmt)
+
+
+def _add_time_range(query: str, params: list, column: str,
+                    since: Optional[int], until: Optional[int]) -> str:
+    """Добавить к запросу условие по диапазону времени [since, until) в миллисекундах"""
+    if since is not None:
+        query += f'AND {column} >= ? '
+        params.append(since)
+    if until is not None:
+        query += f'AND {column} < ? '
+        params.append(until)
+    return query
+
+
+# ==================== Хранилище текстов ответов (blobs) ====================
+
+# Тексты короче порога (в байтах UTF-8) хранятся без сжатия
+COMPRESS_THRESHOLD = 1024
+
+# Длина превью ответа, которое хранится прямо в results для списков
+PREVIEW_LENGTH = 100
+
+
+def make_preview(text: str) -> str:
+    """Короткое превью ответа для списков результатов"""
+    if len(text) > PREVIEW_LENGTH:
+        return text[:PREVIEW_LENGTH] + '...'
+    return text
+
+
+def _default_codec() -> str:
+    """Кодек сжатия для новых текстов"""
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def text_hash(text: str) -> str:
+    """Хеш содержимого текста (ключ в таблице blobs)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def encode_text(text: str, codec: Optional[str] = None) -> tuple:
+    """
+    Закодировать текст для хранения в blobs
+    
+    Returns:
+        tuple: (codec, data). Короткие тексты и тексты, которые не
+        уменьшаются при сжатии, возвращаются как 'raw'.
+    """
+    raw = text.encode('utf-8')
+    if len(raw) < COMPRESS_THRESHOLD:
+        return 'raw', raw
+    codec = codec or _default_codec()
+    if codec == 'zstd' and zstandard is not None:
+        data = zstandard.ZstdCompressor(level=6).compress(raw)
+    elif codec in ('zlib', 'zstd'):
+        codec = 'zlib'
+        data = zlib.compress(raw, 6)
+    else:
+        return 'raw', raw
+    if len(data) >= len(raw):
+        return 'raw', raw
+    return codec, data
+
+
+def decode_text(codec: str, data: bytes) -> str:
+    """Раскодировать текст из blobs"""
+    if codec == 'raw':
+        return bytes(data).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Для чтения ответа требуется пакет zstandard (pip install zstandard)')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    raise ValueError(f'Неизвестный кодек: {codec}')
+
+
+def _decode_text_or_none(codec: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    """Вариант decode_text для SQL-функции chatlist_text"""
+    if codec is None or data is None:
+        return None
+    return decode_text(codec, data)
+
+
+def store_text(cursor: sqlite3.Cursor, text: str) -> int:
+    """
+    Сохранить текст в blobs (или найти уже сохраненный)
+    
+    Returns:
+        ID записи в blobs
+    """
+    digest = text_hash(text)
+    cursor.execute('SELECT id FROM blobs WHERE hash = ?', (digest,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    codec, data = encode_text(text)
+    cursor.execute('''
+        INSERT INTO blobs (hash, codec, text_length, size, data) VALUES (?, ?, ?, ?, ?)
+    ''', (digest, codec, len(text), len(data), data))
+    return cursor.lastrowid
+
+
+def _result_row_to_dict(row: sqlite3.Row) -> Dict:
+    """Преобразовать строку результата, раскодировав текст ответа из blobs"""
+    result = dict(row)
+    codec = result.pop('blob_codec', None)
+    data = result.pop('blob_data', None)
+    if data is not None:
+        result['response_text'] = decode_text(codec, data)
+    return result
+
+
 # ==================== CRUD операции для prompts ====================
 
-def create_prompt(prompt: str, tags: Optional[str] = None) -> int:
-    """Создать новый промт"""
+def normalize_prompt(prompt: str) -> str:
+    """Нормализованный текст промта для сравнения: единые переводы строк, без пробелов по краям строк"""
+    lines = prompt.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    """Хеш нормализованного текста промта (prompts.content_hash, уникальный индекс)"""
+    return text_hash(normalize_prompt(prompt))
+
+
+# Длина заголовка промта в списках и длина ключа поиска по началу текста
+PROMPT_TITLE_LENGTH = 50
+TITLE_KEY_LENGTH = 100
+
+
+def prompt_title_key(prompt: str) -> str:
+    """Ключ поиска по началу промта (prompts.title_key): пробелы схлопнуты, без учета регистра"""
+    return ' '.join(prompt.split())[:TITLE_KEY_LENGTH].casefold()
+
+
+def _merge_prompt_tags(cursor: sqlite3.Cursor, prompt_id: int, tags: Optional[str]):
+    """Добавить к тегам существующего промта новые теги"""
+    if not tags:
+        return
+    cursor.execute('SELECT tags FROM prompts WHERE id = ?', (prompt_id,))
+    current = cursor.fetchone()['tags']
+    merged = ', '.join(parse_tags(f'{current or ""},{tags}'))
+    if merged != (current or ''):
+        cursor.execute('UPDATE prompts SET tags = ? WHERE id = ?', (merged, prompt_id))
+        set_prompt_tags(cursor, prompt_id, merged)
+
+
+def get_or_create_prompt(prompt: str, tags: Optional[str] = None) -> int:
+    """
+    Найти промт с таким же текстом (без учета пробелов по краям строк) или создать новый
+    
+    Теги tags добавляются к тегам найденного промта.
+    
+    Returns:
+        ID промта
+    """
+    return create_prompt(prompt, tags)[0]
+
+
+def create_prompt(prompt: str, tags: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Создать новый промт (см. get_or_create_prompt)
+    
+    Если такой текст уже сохранен, новая строка не создается: теги tags
+    добавляются к тегам существующего промта.
+    
+    Returns:
+        Кортеж (ID промта, True - промт создан / False - найден существующий)
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            INSERT INTO prompts (date, prompt, tags) VALUES (?, ?, ?)
-        ''', (date, prompt, tags))
+        digest = prompt_hash(prompt)
+        created_ts = now_ms()
+        # OR IGNORE: промт мог быть создан другим соединением между проверкой и вставкой
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO prompts (date, created_ts, prompt, tags, content_hash, title_key)
+            VALUES ({_LOCAL_DATE_SQL}, ?, ?, ?, ?, ?)
+        ''', (created_ts, created_ts, prompt, tags, digest, prompt_title_key(prompt)))
+        created = cursor.rowcount > 0
+        if created:
+            prompt_id = cursor.lastrowid
+            set_prompt_tags(cursor, prompt_id, tags)
+        else:
+            cursor.execute('SELECT id FROM prompts WHERE content_hash = ?', (digest,))
+            prompt_id = cursor.fetchone()['id']
+            _merge_prompt_tags(cursor, prompt_id, tags)
         conn.commit()
-        return cursor.lastrowid
+        return prompt_id, created
     finally:
         conn.close()
 
 
-def get_prompts(search: Optional[str] = None, tags: Optional[str] = None) -> List[Dict]:
-    """Получить список промтов с опциональным поиском"""
+def get_prompts(search: Optional[str] = None, tags=None, tags_mode: str = 'any',
+                since: Optional[int] = None, until: Optional[int] = None) -> List[Dict]:
+    """
+    Получить список промтов с опциональным поиском
+    
+    Args:
+        search: Подстрока в тексте промта
+        tags: Теги строкой через запятую или списком
+        tags_mode: 'any' - промт содержит хотя бы один из тегов,
+                   'all' - промт содержит все указанные теги
+        since, until: Диапазон времени создания [since, until) в миллисекундах
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
+        query = 'SELECT * FROM prompts WHERE 1=1 '
+        params = []
+        
         if search:
-            cursor.execute('''
-                SELECT * FROM prompts 
-                WHERE prompt LIKE ? 
-                ORDER BY date DESC
-            ''', (f'%{search}%',))
-        elif tags:
-            cursor.execute('''
-                SELECT * FROM prompts 
-                WHERE tags LIKE ? 
-                ORDER BY date DESC
-            ''', (f'%{tags}%',))
-        else:
-            cursor.execute('SELECT * FROM prompts ORDER BY date DESC')
+            query += 'AND prompt LIKE ? '
+            params.append(f'%{search}%')
+        
+        tag_keys = [tag.casefold() for tag in (parse_tags(tags) if isinstance(tags, str) else tags or [])]
+        if tag_keys:
+            placeholders = ', '.join('?' * len(tag_keys))
+            query += f'''AND id IN (
+                SELECT pt.prompt_id FROM tags t
+                JOIN prompt_tags pt ON pt.tag_id = t.id
+                WHERE t.name_key IN ({placeholders})
+                GROUP BY pt.prompt_id
+                HAVING COUNT(*) >= ?
+            ) '''
+            params.extend(tag_keys)
+            params.append(len(set(tag_keys)) if tags_mode == 'all' else 1)
         
+        query = _add_time_range(query, params, 'created_ts', since, until)
+        query += 'ORDER BY created_ts DESC, id DESC'
+        cursor.execute(query, params)
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     finally:
         conn.close()
 
 
+def _prompt_title_row(row: sqlite3.Row) -> Dict:
+    title = row['title']
+    if len(title) > PROMPT_TITLE_LENGTH:
+        title = title[:PROMPT_TITLE_LENGTH] + '...'
+    return {'id': row['id'], 'title': title, 'created_ts': row['created_ts'], 'title_key': row['title_key']}
+
+
+def get_prompt_titles(search: Optional[str] = None, limit: int = 200,
+                      after: Optional[tuple] = None) -> List[Dict]:
+    """
+    Страница списка промтов: только ID и заголовок (начало текста), без полного текста
+    
+    Args:
+        search: Начало текста промта (без учета регистра) - поиск по индексу title_key,
+                результаты по алфавиту; без поиска - последние созданные промты
+        limit: Размер страницы
+        after: Курсор - последняя строка предыдущей страницы: (created_ts, id) без поиска,
+               (title_key, id) с поиском
+    
+    Returns:
+        Список словарей id, title, created_ts, title_key
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        query = f'SELECT id, created_ts, title_key, substr(prompt, 1, {PROMPT_TITLE_LENGTH + 1}) AS title FROM prompts '
+        params = []
+        key = prompt_title_key(search) if search else ''
+        if key:
+            # Диапазон [key, key + максимальный символ) - все строки, начинающиеся с key
+            query += 'WHERE title_key >= ? AND title_key < ? '
+            params.extend([key, key + '\U0010ffff'])
+            if after:
+                query += 'AND (title_key > ? OR (title_key = ? AND id > ?)) '
+                params.extend([after[0], after[0], after[1]])
+            query += 'ORDER BY title_key, id LIMIT ?'
+        else:
+            if after:
+                query += 'WHERE (created_ts < ? OR (created_ts = ? AND id < ?)) '
+                params.extend([after[0], after[0], after[1]])
+            query += 'ORDER BY created_ts DESC, id DESC LIMIT ?'
+        params.append(limit)
+        cursor.execute(query, params)
+        return [_prompt_title_row(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def get_prompt_title(prompt_id: int) -> Optional[Dict]:
+    """Заголовок одного промта (для добавления в список без перезагрузки)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            SELECT id, created_ts, title_key, substr(prompt, 1, {PROMPT_TITLE_LENGTH + 1}) AS title
+            FROM prompts WHERE id = ?
+        ''', (prompt_id,))
+        row = cursor.fetchone()
+        return _prompt_title_row(row) if row else None
+    finally:
+        conn.close()
+
+
 def get_prompt_by_id(prompt_id: int) -> Optional[Dict]:
     """Получить промт по ID"""
     conn = get_connection()
@@ -221,8 +476,8 @@ def update_prompt(prompt_id: int, prompt: str = None, tags: str = None) -> bool:
         params = []
         
         if prompt is not None:
-            updates.append('prompt = ?')
-            params.append(prompt)
+            updates.append('prompt = ?, content_hash = ?, title_key = ?')
+            params.extend([prompt, prompt_hash(prompt), prompt_title_key(prompt)])
         if tags is not None:
             updates.append('tags = ?')
             params.append(tags)
@@ -231,11 +486,17 @@ def update_prompt(prompt_id: int, prompt: str = None, tags: str = None) -> bool:
             return False
         
         params.append(prompt_id)
-        cursor.execute(f'''
-            UPDATE prompts SET {', '.join(updates)} WHERE id = ?
-        ''', params)
+        try:
+            cursor.execute(f'''
+                UPDATE prompts SET {', '.join(updates)} WHERE id = ?
+            ''', params)
+        except sqlite3.IntegrityError:
+            raise ValueError('Промт с таким текстом уже существует')
+        updated = cursor.rowcount > 0
+        if updated and tags is not None:
+            set_prompt_tags(cursor, prompt_id, tags)
         conn.commit()
-        return cursor.rowcount > 0
+        return updated
     finally:
         conn.close()
 
@@ -252,6 +513,46 @@ def delete_prompt(prompt_id: int) -> bool:
         conn.close()
 
 
+# ==================== Теги промтов ====================
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Разобрать строку тегов через запятую (без пустых и повторов)"""
+    result = []
+    seen = set()
+    for tag in (tags or '').split(','):
+        tag = tag.strip()
+        if tag and tag.casefold() not in seen:
+            seen.add(tag.casefold())
+            result.append(tag)
+    return result
+
+
+def set_prompt_tags(cursor: sqlite3.Cursor, prompt_id: int, tags: Optional[str]):
+    """Заменить набор тегов промта (в рамках текущей транзакции)"""
+    cursor.execute('DELETE FROM prompt_tags WHERE prompt_id = ?', (prompt_id,))
+    for tag in parse_tags(tags):
+        cursor.execute('INSERT OR IGNORE INTO tags (name, name_key) VALUES (?, ?)', (tag, tag.casefold()))
+        cursor.execute('''
+            INSERT OR IGNORE INTO prompt_tags (tag_id, prompt_id)
+            SELECT id, ? FROM tags WHERE name_key = ?
+        ''', (prompt_id, tag.casefold()))
+
+
+def get_tag_counts() -> List[Dict]:
+    """Получить список тегов с количеством промтов (по убыванию)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT id, name, prompt_count FROM tags
+            WHERE prompt_count > 0
+            ORDER BY prompt_count DESC, name
+        ''')
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
 # ==================== CRUD операции для models ====================
 
 def create_model(name: str, api_url: str, api_key_env: str, model_type: str, is_active: int = 1) -> int:
@@ -259,11 +560,11 @@ def create_model(name: str, api_url: str, api_key_env: str, model_type: str, is_
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        created_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            INSERT INTO models (name, api_url, api_key_env, model_type, is_active, created_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (name, api_url, api_key_env, model_type, is_active, created_date))
+        created_ts = now_ms()
+        cursor.execute(f'''
+            INSERT INTO models (name, api_url, api_key_env, model_type, is_active, created_date, created_ts)
+            VALUES (?, ?, ?, ?, ?, {_LOCAL_DATE_SQL}, ?)
+        ''', (name, api_url, api_key_env, model_type, is_active, created_ts, created_ts))
         conn.commit()
         return cursor.lastrowid
     finally:
@@ -364,73 +665,669 @@ def save_result(prompt_id: int, model_id: int, response_text: str, metadata: Opt
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        saved_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        start_time = time.perf_counter()
+        saved_ts = now_ms()
         metadata_json = json.dumps(metadata) if metadata else None
-        cursor.execute('''
-            INSERT INTO results (prompt_id, model_id, response_text, saved_date, metadata)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (prompt_id, model_id, response_text, saved_date, metadata_json))
+        blob_id = store_text(cursor, response_text)
+        cursor.execute(f'''
+            INSERT INTO results (prompt_id, model_id, response_text, saved_date, saved_ts, metadata, blob_id, preview)
+            VALUES (?, ?, '', {_LOCAL_DATE_SQL}, ?, ?, ?, ?)
+        ''', (prompt_id, model_id, saved_ts, saved_ts, metadata_json, blob_id, make_preview(response_text)))
         conn.commit()
-        return cursor.lastrowid
+        result_id = cursor.lastrowid
+        elapsed = time.perf_counter() - start_time
+        
+        # Метрика времени записи с метками модели и провайдера
+        cursor.execute('SELECT name, model_type FROM models WHERE id = ?', (model_id,))
+        model_row = cursor.fetchone()
+        metrics.DB_WRITE_TIME.observe(
+            elapsed,
+            model=model_row['name'] if model_row else '',
+            provider=model_row['model_type'].lower() if model_row else ''
+        )
+        return result_id
     finally:
         conn.close()
 
 
+def _result_source(alias: Optional[str] = None, with_body: bool = True) -> Dict[str, str]:
+    """
+    Фрагменты SQL для чтения результатов из оперативной БД (alias=None)
+    или из подключенного архивного раздела. Строка результата везде доступна как r.
+    """
+    if alias is None:
+        return {
+            'from': 'results r LEFT JOIN blobs b ON r.blob_id = b.id' if with_body else 'results r',
+            'codec': 'b.codec',
+            'data': 'b.data',
+            'text': 'r.response_text',
+        }
+    return {
+        'from': f'{alias}.results r',
+        'codec': 'r.codec',
+        'data': 'r.data',
+        'text': "''",
+    }
+
+
+def _result_select_sql(source: Dict[str, str]) -> str:
+    """SELECT полной строки результата (текст ответа раскодируется в _result_row_to_dict)"""
+    return f'''
+        SELECT r.id, r.prompt_id, r.model_id, {source['text']} AS response_text,
+               r.saved_date, r.saved_ts, r.metadata, r.preview,
+               p.prompt, m.name AS model_name,
+               {source['codec']} AS blob_codec, {source['data']} AS blob_data
+        FROM {source['from']}
+        LEFT JOIN main.prompts p ON r.prompt_id = p.id
+        LEFT JOIN main.models m ON r.model_id = m.id
+    '''
+
+
+def _sort_by_time(rows: List[Dict], key: str = 'saved_ts') -> List[Dict]:
+    """Сортировка строк из нескольких разделов: сначала новые"""
+    rows.sort(key=lambda row: (row[key] or 0, row['id']), reverse=True)
+    return rows
+
+
 def get_results(prompt_id: Optional[int] = None, model_id: Optional[int] = None, 
-                search: Optional[str] = None) -> List[Dict]:
-    """Получить список сохраненных результатов"""
+                search: Optional[str] = None, since: Optional[int] = None,
+                until: Optional[int] = None) -> List[Dict]:
+    """
+    Получить список сохраненных результатов (с полными текстами ответов)
+    
+    Архивные разделы читаются только если их период пересекается с [since, until).
+    
+    Args:
+        since, until: Диапазон времени сохранения [since, until) в миллисекундах
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        query = 'SELECT r.*, p.prompt, m.name as model_name FROM results r '
-        query += 'LEFT JOIN prompts p ON r.prompt_id = p.id '
-        query += 'LEFT JOIN models m ON r.model_id = m.id WHERE 1=1 '
-        params = []
+        results = []
+        for alias in _iter_result_sources(conn, since, until):
+            source = _result_source(alias)
+            query = _result_select_sql(source) + 'WHERE 1=1 '
+            params = []
+            
+            if prompt_id:
+                query += 'AND r.prompt_id = ? '
+                params.append(prompt_id)
+            if model_id:
+                query += 'AND r.model_id = ? '
+                params.append(model_id)
+            if search:
+                query += f"AND COALESCE(chatlist_text({source['codec']}, {source['data']}), {source['text']}) LIKE ? "
+                params.append(f'%{search}%')
+            query = _add_time_range(query, params, 'r.saved_ts', since, until)
+            
+            query += 'ORDER BY r.saved_ts DESC, r.id DESC'
+            cursor.execute(query, params)
+            results.extend(_result_row_to_dict(row) for row in cursor.fetchall())
+        return _sort_by_time(results)
+    finally:
+        conn.close()
+
+
+# Длина усеченного текста промта в списке результатов
+LIST_PROMPT_LENGTH = 50
+
+
+def get_result_list(prompt_id: Optional[int] = None, model_id: Optional[int] = None,
+                    search: Optional[str] = None, limit: int = 200,
+                    before: Optional[tuple] = None, since: Optional[int] = None,
+                    until: Optional[int] = None, ids: Optional[List[int]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> List[Dict]:
+    """
+    Получить страницу списка результатов без полных текстов
+    
+    Выбираются только колонки, нужные для отображения: id, усеченный
+    промт, название модели, превью ответа и дата. Полный текст ответа
+    загружается отдельно через get_result_body.
+    
+    Args:
+        search: Поиск без учета регистра по промту, названию модели и полному тексту ответа
+        limit: Размер страницы
+        before: Курсор (saved_ts, id) последней строки предыдущей страницы
+        since, until: Диапазон времени сохранения [since, until) в миллисекундах
+        ids: Искать только среди результатов с этими ID (уточнение предыдущего поиска)
+        cancel_event: Событие отмены; запрос прерывается с sqlite3.OperationalError
+    
+    Returns:
+        Список словарей: id, prompt_id, model_id, prompt, model_name, preview, saved_ts
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        _watch_cancel(conn, cancel_event)
+        page = []
+        for alias in _iter_result_sources(conn, since, until, before[0] if before else None):
+            source = _result_source(alias, with_body=bool(search))
+            query = f'''
+                SELECT r.id, r.prompt_id, r.model_id, r.preview, r.saved_ts,
+                       substr(p.prompt, 1, ?) AS prompt, m.name AS model_name
+                FROM {source['from']}
+                LEFT JOIN main.prompts p ON r.prompt_id = p.id
+                LEFT JOIN main.models m ON r.model_id = m.id
+                WHERE 1=1 
+            '''
+            params = [LIST_PROMPT_LENGTH]
+            query = _add_list_filter(query, params, source, prompt_id, model_id, search, since, until)
+            if ids is not None:
+                query += 'AND r.id IN (SELECT value FROM json_each(?)) '
+                params.append(json.dumps(ids))
+            if before:
+                query += 'AND (r.saved_ts, r.id) < (?, ?) '
+                params.extend(before)
+            
+            query += 'ORDER BY r.saved_ts DESC, r.id DESC LIMIT ?'
+            params.append(limit)
+            cursor.execute(query, params)
+            page.extend(dict(row) for row in cursor.fetchall())
+        return _sort_by_time(page)[:limit]
+    finally:
+        conn.close()
+
+
+def _add_list_filter(query: str, params: list, source: Dict[str, str], prompt_id: Optional[int],
+                     model_id: Optional[int], search: Optional[str], since: Optional[int],
+                     until: Optional[int]) -> str:
+    """Условия фильтра списка результатов (общие для списка и экспорта)"""
+    if prompt_id:
+        query += 'AND r.prompt_id = ? '
+        params.append(prompt_id)
+    if model_id:
+        query += 'AND r.model_id = ? '
+        params.append(model_id)
+    if search:
+        body_sql = f"COALESCE(chatlist_text({source['codec']}, {source['data']}), {source['text']})"
+        query += f'''AND (chatlist_contains(p.prompt, ?) OR chatlist_contains(m.name, ?)
+                     OR chatlist_contains({body_sql}, ?)) '''
+        params.extend([search, search, search])
+    return _add_time_range(query, params, 'r.saved_ts', since, until)
+
+
+def iter_results(prompt_id: Optional[int] = None, model_id: Optional[int] = None,
+                 search: Optional[str] = None, since: Optional[int] = None,
+                 until: Optional[int] = None, chunk_size: int = 500):
+    """
+    Генератор результатов с полными текстами ответов для потоковой обработки (экспорт)
+    
+    Фильтр совпадает с get_result_list. Строки читаются из курсора порциями
+    по chunk_size, поэтому в памяти одновременно находится только одна порция.
+    Сначала выдаются результаты оперативной БД, затем архивных разделов (от новых к старым).
+    
+    Yields:
+        Словари результатов, как в get_results
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    sources = _iter_result_sources(conn, since, until)
+    try:
+        for alias in sources:
+            source = _result_source(alias)
+            params = []
+            query = _add_list_filter(_result_select_sql(source) + 'WHERE 1=1 ', params, source,
+                                     prompt_id, model_id, search, since, until)
+            query += 'ORDER BY r.saved_ts DESC, r.id DESC'
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _result_row_to_dict(row)
+    finally:
+        # При досрочной остановке: сначала завершаем запрос, затем отключаем раздел
+        cursor.close()
+        sources.close()
+        conn.close()
+
+
+def count_results(prompt_id: Optional[int] = None, model_id: Optional[int] = None,
+                  since: Optional[int] = None, until: Optional[int] = None) -> int:
+    """Количество результатов (с учетом архива) без поиска по тексту - только по индексам"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        total = 0
+        for alias in _iter_result_sources(conn, since, until):
+            source = _result_source(alias, with_body=False)
+            params = []
+            query = _add_list_filter(f"SELECT COUNT(*) FROM {source['from']} WHERE 1=1 ", params, source,
+                                     prompt_id, model_id, None, since, until)
+            cursor.execute(query, params)
+            total += cursor.fetchone()[0]
+        return total
+    finally:
+        conn.close()
+
+
+def get_result_body(result_id: int) -> Optional[str]:
+    """Получить полный текст ответа по ID результата (в том числе из архива)"""
+    result = get_result_by_id(result_id)
+    return result['response_text'] if result else None
+
+
+def get_result_by_id(result_id: int) -> Optional[Dict]:
+    """Получить результат по ID (если его нет в оперативной БД - ищется в архиве)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for alias in _iter_result_sources(conn, all_partitions=True):
+            cursor.execute(_result_select_sql(_result_source(alias)) + 'WHERE r.id = ?', (result_id,))
+            rows = cursor.fetchall()
+            if rows:
+                return _result_row_to_dict(rows[0])
+        return None
+    finally:
+        conn.close()
+
+
+def delete_result(result_id: int) -> bool:
+    """Удалить результат (из оперативной БД или из архивного раздела)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM results WHERE id = ?', (result_id,))
+        conn.commit()
+        if cursor.rowcount > 0:
+            return True
         
-        if prompt_id:
-            query += 'AND r.prompt_id = ? '
-            params.append(prompt_id)
-        if model_id:
-            query += 'AND r.model_id = ? '
-            params.append(model_id)
-        if search:
-            query += 'AND r.response_text LIKE ? '
-            params.append(f'%{search}%')
+        for partition in _get_partitions(cursor):
+            with _attached_partition(conn, partition) as alias:
+                cursor.execute(f'DELETE FROM {alias}.results WHERE id = ?', (result_id,))
+                deleted = cursor.rowcount > 0
+                if deleted:
+                    # Статистика архивных результатов хранится в оперативной БД
+                    cursor.execute('DELETE FROM result_stats WHERE result_id = ?', (result_id,))
+                    cursor.execute('UPDATE archive_partitions SET row_count = row_count - 1 WHERE name = ?',
+                                   (partition['name'],))
+                # Перед отключением раздела транзакция должна быть завершена
+                conn.commit()
+            if deleted:
+                return True
+        return False
+    finally:
+        conn.close()
+
+
+# ==================== Архив результатов ====================
+
+# Каталог архивных разделов (рядом с файлом БД) и имя схемы при подключении раздела
+ARCHIVE_DIR_NAME = 'archive'
+_ARCHIVE_ALIAS = 'archive_part'
+
+
+def get_archive_dir() -> str:
+    """Каталог с файлами архивных разделов"""
+    return os.path.join(os.path.dirname(os.path.abspath(get_db_name())), ARCHIVE_DIR_NAME)
+
+
+def partition_name(ts: int) -> str:
+    """Имя помесячного раздела для отметки времени (локальное время): 'YYYY-MM'"""
+    return format_ts(ts, '%Y-%m')
+
+
+def _get_partitions(cursor: sqlite3.Cursor, since: Optional[int] = None, until: Optional[int] = None,
+                    before_ts: Optional[int] = None) -> List[Dict]:
+    """Архивные разделы, период которых пересекается с [since, until) и не новее курсора"""
+    query = 'SELECT * FROM archive_partitions WHERE row_count > 0 '
+    params = []
+    if since is not None:
+        query += 'AND max_ts >= ? '
+        params.append(since)
+    if until is not None:
+        query += 'AND min_ts < ? '
+        params.append(until)
+    if before_ts is not None:
+        query += 'AND min_ts <= ? '
+        params.append(before_ts)
+    query += 'ORDER BY max_ts DESC'
+    cursor.execute(query, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+@contextmanager
+def _attached_partition(conn: sqlite3.Connection, partition: Dict, create: bool = False):
+    """Подключить файл раздела через ATTACH на время блока"""
+    path = os.path.join(get_archive_dir(), partition['file'])
+    conn.execute('ATTACH DATABASE ? AS ' + _ARCHIVE_ALIAS, (path,))
+    try:
+        if create:
+            _init_partition_schema(conn.cursor(), _ARCHIVE_ALIAS)
+        yield _ARCHIVE_ALIAS
+    finally:
+        conn.execute('DETACH DATABASE ' + _ARCHIVE_ALIAS)
+
+
+def _iter_result_sources(conn: sqlite3.Connection, since: Optional[int] = None,
+                         until: Optional[int] = None, before_ts: Optional[int] = None,
+                         all_partitions: bool = False):
+    """
+    Источники результатов: оперативная БД (None), затем нужные архивные разделы
+    
+    Разделы подключаются по одному, поэтому их число не ограничено лимитом ATTACH.
+    Без фильтра по времени (all_partitions или since/until не заданы) читаются все разделы.
+    """
+    yield None
+    cursor = conn.cursor()
+    partitions = _get_partitions(cursor) if all_partitions else _get_partitions(cursor, since, until, before_ts)
+    for partition in partitions:
+        if not os.path.exists(os.path.join(get_archive_dir(), partition['file'])):
+            continue
+        with _attached_partition(conn, partition) as alias:
+            yield alias
+
+
+def _init_partition_schema(cursor: sqlite3.Cursor, alias: str):
+    """Схема файла архивного раздела: результаты вместе со сжатыми текстами ответов"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {alias}.results (
+            id INTEGER PRIMARY KEY,
+            prompt_id INTEGER NOT NULL,
+            model_id INTEGER,
+            saved_date TEXT NOT NULL,
+            saved_ts INTEGER NOT NULL,
+            metadata TEXT,
+            preview TEXT,
+            codec TEXT NOT NULL,
+            text_length INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS {alias}.idx_results_saved
+        ON results(saved_ts, id, prompt_id, model_id, preview)
+    ''')
+
+
+def get_archive_partitions() -> List[Dict]:
+    """Список архивных разделов: name, file, min_ts, max_ts, row_count"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT * FROM archive_partitions ORDER BY name')
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def get_archive_candidates(cutoff_ts: int) -> List[Dict]:
+    """Сколько результатов старше cutoff_ts попадет в каждый помесячный раздел"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT strftime('%Y-%m', saved_ts / 1000, 'unixepoch', 'localtime') AS name, COUNT(*) AS count
+            FROM results WHERE saved_ts < ?
+            GROUP BY name ORDER BY name
+        ''', (cutoff_ts,))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def _move_to_partition(conn: sqlite3.Connection, name: str, rows: List[sqlite3.Row]) -> int:
+    """
+    Перенести строки результатов в раздел name
+    
+    Сначала строки фиксируются в файле раздела, затем удаляются из оперативной БД
+    (в режиме WAL транзакция над несколькими файлами не атомарна). Повторный
+    перенос уже скопированных строк безопасен (INSERT OR IGNORE), поэтому
+    прерванная архивация продолжается без потерь и дубликатов.
+    """
+    partition = {'name': name, 'file': f'results-{name}.db'}
+    cursor = conn.cursor()
+    with _attached_partition(conn, partition, create=True) as alias:
+        values = []
+        for row in rows:
+            if row['data'] is not None:
+                codec, data, text_length = row['codec'], row['data'], row['text_length']
+            else:
+                text = row['response_text'] or ''
+                codec, data = encode_text(text)
+                text_length = len(text)
+            values.append((row['id'], row['prompt_id'], row['model_id'], row['saved_date'], row['saved_ts'],
+                           row['metadata'], row['preview'], codec, text_length, data))
+        ids = [(row['id'],) for row in rows]
         
-        query += 'ORDER BY r.saved_date DESC'
+        cursor.execute('BEGIN')
+        try:
+            cursor.executemany(f'''
+                INSERT OR IGNORE INTO {alias}.results
+                    (id, prompt_id, model_id, saved_date, saved_ts, metadata, preview, codec, text_length, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+            conn.commit()
+            
+            cursor.execute('BEGIN')
+            # Пометка archived сохраняет статистику при удалении (см. trg_results_stats_delete)
+            cursor.executemany('UPDATE results SET archived = 1 WHERE id = ?', ids)
+            cursor.executemany('DELETE FROM results WHERE id = ?', ids)
+            moved = cursor.rowcount
+            cursor.execute('''
+                INSERT INTO archive_partitions (name, file, min_ts, max_ts, row_count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    min_ts = MIN(min_ts, excluded.min_ts),
+                    max_ts = MAX(max_ts, excluded.max_ts),
+                    row_count = row_count + excluded.row_count
+            ''', (name, partition['file'], min(row['saved_ts'] for row in rows),
+                  max(row['saved_ts'] for row in rows), moved))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return moved
+
+
+def archive_results(cutoff_ts: int, batch_size: int = 500,
+                    progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """
+    Перенести результаты старше cutoff_ts в помесячные архивные разделы
+    
+    Перенос идет порциями: строки порции фиксируются в разделе, затем удаляются из оперативной БД.
+    Освобожденные страницы оперативной БД возвращаются при очистке (VACUUM).
+    
+    Args:
+        cutoff_ts: Граница в миллисекундах: переносятся результаты с saved_ts < cutoff_ts
+        batch_size: Размер порции
+        progress: Функция обратного вызова (перенесено строк)
+    
+    Returns:
+        Словарь: moved, partitions, duration
+    """
+    os.makedirs(get_archive_dir(), exist_ok=True)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        start_time = time.perf_counter()
+        moved = 0
+        partitions = set()
+        while True:
+            cursor.execute('''
+                SELECT r.id, r.prompt_id, r.model_id, r.response_text, r.saved_date, r.saved_ts,
+                       r.metadata, r.preview, b.codec, b.data, b.text_length
+                FROM results r LEFT JOIN blobs b ON r.blob_id = b.id
+                WHERE r.saved_ts < ?
+                ORDER BY r.saved_ts, r.id LIMIT ?
+            ''', (cutoff_ts, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            by_partition = {}
+            for row in rows:
+                by_partition.setdefault(partition_name(row['saved_ts']), []).append(row)
+            for name, partition_rows in by_partition.items():
+                moved += _move_to_partition(conn, name, partition_rows)
+                partitions.add(name)
+            if progress:
+                progress(moved)
+        return {
+            'moved': moved,
+            'partitions': sorted(partitions),
+            'duration': time.perf_counter() - start_time
+        }
+    finally:
+        conn.close()
+
+
+# ==================== Статистика моделей ====================
+
+def get_model_stats(window: Optional[int] = None) -> List[Dict]:
+    """
+    Получить агрегированную статистику по моделям
+    
+    Args:
+        window: Окно в секундах (например, 86400 - последние сутки);
+                None - за все время. Окно выравнивается по границе часа.
+    
+    Returns:
+        Список словарей, отсортированный по среднему времени ответа:
+        model_id, model_name, count, success_count, success_rate,
+        avg_response_time, avg_tokens, avg_length
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        query = '''
+            SELECT s.model_id, m.name AS model_name,
+                   SUM(s.count) AS count,
+                   SUM(s.success_count) AS success_count,
+                   SUM(s.timed_count) AS timed_count,
+                   SUM(s.time_sum) AS time_sum,
+                   SUM(s.tokens_sum) AS tokens_sum,
+                   SUM(s.length_sum) AS length_sum
+            FROM model_stats_hourly s
+            LEFT JOIN models m ON s.model_id = m.id
+        '''
+        params = []
+        if window:
+            query += 'WHERE s.hour >= ? '
+            params.append((int(time.time()) - int(window)) // 3600)
+        query += 'GROUP BY s.model_id HAVING SUM(s.count) > 0'
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        
+        stats = []
+        for row in cursor.fetchall():
+            count = row['count']
+            stats.append({
+                'model_id': row['model_id'],
+                'model_name': row['model_name'] or '',
+                'count': count,
+                'success_count': row['success_count'],
+                'success_rate': row['success_count'] / count,
+                'avg_response_time': row['time_sum'] / row['timed_count'] if row['timed_count'] else None,
+                'avg_tokens': row['tokens_sum'] / count,
+                'avg_length': row['length_sum'] / count
+            })
+        stats.sort(key=lambda s: (s['avg_response_time'] is None, s['avg_response_time'] or 0))
+        return stats
     finally:
         conn.close()
 
 
-def get_result_by_id(result_id: int) -> Optional[Dict]:
-    """Получить результат по ID"""
+# ==================== Кэш улучшения промтов ====================
+
+def get_improver_cache(prompt_hash_value: str, variant_type: str, model_id: int,
+                       max_age_ms: int) -> Optional[Dict]:
+    """
+    Получить сохраненный ответ улучшения промта, если он не старше max_age_ms
+    
+    Returns:
+        Разобранный ответ (словарь) или None
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
         cursor.execute('''
-            SELECT r.*, p.prompt, m.name as model_name 
-            FROM results r
-            LEFT JOIN prompts p ON r.prompt_id = p.id
-            LEFT JOIN models m ON r.model_id = m.id
-            WHERE r.id = ?
-        ''', (result_id,))
+            SELECT response FROM improver_cache
+            WHERE prompt_hash = ? AND variant_type = ? AND model_id = ? AND created_ts >= ?
+        ''', (prompt_hash_value, variant_type, model_id, now_ms() - max_age_ms))
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return json.loads(row['response']) if row else None
     finally:
         conn.close()
 
 
-def delete_result(result_id: int) -> bool:
-    """Удалить результат"""
+def set_improver_cache(prompt_hash_value: str, variant_type: str, model_id: int, response: Dict,
+                       max_age_ms: Optional[int] = None):
+    """
+    Сохранить ответ улучшения промта
+    
+    Args:
+        max_age_ms: Если задан, заодно удаляются записи старше этого срока
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('DELETE FROM results WHERE id = ?', (result_id,))
+        ts = now_ms()
+        cursor.execute('''
+            INSERT OR REPLACE INTO improver_cache (prompt_hash, variant_type, model_id, response, created_ts)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (prompt_hash_value, variant_type, model_id, json.dumps(response, ensure_ascii=False), ts))
+        if max_age_ms is not None:
+            cursor.execute('DELETE FROM improver_cache WHERE created_ts < ?', (ts - max_age_ms,))
         conn.commit()
-        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def clear_improver_cache() -> int:
+    """Удалить все сохраненные ответы улучшения промтов"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM improver_cache')
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+# ==================== Варианты промтов ====================
+
+def replace_prompt_variants(prompt_id: int, model_id: Optional[int], entries: List[Dict]) -> int:
+    """
+    Сохранить варианты улучшения промта от модели (прежние варианты этой модели удаляются)
+    
+    Args:
+        prompt_id: ID исходного промта
+        model_id: ID модели, предложившей варианты
+        entries: Варианты: словари kind, text
+    
+    Returns:
+        Количество сохраненных вариантов
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        ts = now_ms()
+        cursor.execute('DELETE FROM prompt_variants WHERE prompt_id = ? AND model_id IS ?', (prompt_id, model_id))
+        cursor.executemany('''
+            INSERT INTO prompt_variants (prompt_id, model_id, kind, text, position, created_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(prompt_id, model_id, entry['kind'], entry['text'], position, ts)
+              for position, entry in enumerate(entries)])
+        conn.commit()
+        return len(entries)
+    finally:
+        conn.close()
+
+
+def get_saved_prompt_variants(prompt_id: int) -> List[Dict]:
+    """Сохраненные варианты улучшения промта (с названием модели)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT v.*, m.name AS model_name
+            FROM prompt_variants v
+            LEFT JOIN models m ON m.id = v.model_id
+            WHERE v.prompt_id = ?
+            ORDER BY v.model_id, v.position
+        ''', (prompt_id,))
+        return [dict(row) for row in cursor.fetchall()]
     finally:
         conn.close()
 
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль потокового экспорта результатов
+
+Результаты читаются из БД порциями (db.iter_results) и сразу записываются
+в файл, поэтому расход памяти не зависит от количества результатов.
+Поддерживаются форматы Markdown, JSON (массив пишется по элементам),
+JSONL и CSV. Файлы JSONL и CSV читаются импортом (importers.py).
+"""
+
+import os
+import csv
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional
+import db
+
+
+# Поля результата в экспорте (порядок колонок CSV)
+EXPORT_FIELDS = ['id', 'prompt_id', 'prompt', 'model_id', 'model_name',
+                 'saved_ts', 'saved_date', 'response_text', 'metadata']
+
+# Как часто сообщать о прогрессе (результатов)
+PROGRESS_EVERY = 200
+
+
+def result_to_record(result: Dict) -> Dict:
+    """Запись результата для экспорта: только публичные поля, metadata разобрана из JSON"""
+    metadata = result.get('metadata')
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            pass
+    return {
+        'id': result['id'],
+        'prompt_id': result.get('prompt_id'),
+        'prompt': result.get('prompt') or '',
+        'model_id': result.get('model_id'),
+        'model_name': result.get('model_name') or '',
+        'saved_ts': result.get('saved_ts'),
+        'saved_date': db.format_ts(result.get('saved_ts')),
+        'response_text': result.get('response_text') or '',
+        'metadata': metadata,
+    }
+
+
+class ResultExporter:
+    """Базовый класс экспортера: заголовок, запись на каждый результат, завершение"""
+    extension = ''
+    title = ''
+
+    def __init__(self, f):
+        self.f = f
+
+    def write_header(self):
+        pass
+
+    def write_record(self, record: Dict):
+        raise NotImplementedError
+
+    def write_footer(self, count: int):
+        pass
+
+
+class MarkdownExporter(ResultExporter):
+    extension = '.md'
+    title = 'Markdown'
+
+    def write_header(self):
+        self.f.write("# Экспорт результатов ChatList\n\n")
+        self.f.write(f"Дата экспорта: {db.format_ts(db.now_ms())}\n\n")
+        self.f.write("---\n\n")
+
+    def write_record(self, record: Dict):
+        self.f.write(f"## Результат #{record['id']}\n\n")
+        self.f.write(f"**Промт:** {record['prompt']}\n\n")
+        self.f.write(f"**Модель:** {record['model_name']}\n\n")
+        self.f.write(f"**Дата:** {record['saved_date']}\n\n")
+        self.f.write(f"**Ответ:**\n\n{record['response_text']}\n\n")
+        self.f.write("---\n\n")
+
+    def write_footer(self, count: int):
+        self.f.write(f"Всего результатов: {count}\n")
+
+
+class JsonExporter(ResultExporter):
+    """JSON-объект с массивом results, который пишется по одному элементу"""
+    extension = '.json'
+    title = 'JSON'
+
+    def __init__(self, f):
+        super().__init__(f)
+        self.first = True
+
+    def write_header(self):
+        self.f.write('{\n')
+        self.f.write(f'  "export_date": {json.dumps(db.format_ts(db.now_ms(), "%Y-%m-%dT%H:%M:%S"))},\n')
+        self.f.write('  "results": [')
+
+    def write_record(self, record: Dict):
+        self.f.write('\n    ' if self.first else ',\n    ')
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.first = False
+
+    def write_footer(self, count: int):
+        self.f.write('\n  ],\n')
+        self.f.write(f'  "total_results": {count}\n')
+        self.f.write('}\n')
+
+
+class JsonlExporter(ResultExporter):
+    """По одному JSON-объекту на строку"""
+    extension = '.jsonl'
+    title = 'JSONL'
+
+    def write_record(self, record: Dict):
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.f.write('\n')
+
+
+class CsvExporter(ResultExporter):
+    extension = '.csv'
+    title = 'CSV'
+
+    def __init__(self, f):
+        super().__init__(f)
+        self.writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+
+    def write_header(self):
+        self.writer.writeheader()
+
+    def write_record(self, record: Dict):
+        row = dict(record)
+        if row['metadata'] is not None:
+            row['metadata'] = json.dumps(row['metadata'], ensure_ascii=False)
+        self.writer.writerow(row)
+
+
+EXPORTERS = {
+    'markdown': MarkdownExporter,
+    'json': JsonExporter,
+    'jsonl': JsonlExporter,
+    'csv': CsvExporter,
+}
+
+
+def detect_format(path: str) -> Optional[str]:
+    """Формат по расширению файла"""
+    for format_type, exporter_class in EXPORTERS.items():
+        if path.lower().endswith(exporter_class.extension):
+            return format_type
+    return None
+
+
+def export_results(path: str, format_type: Optional[str] = None,
+                   filters: Optional[Dict] = None,
+                   progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                   cancel_event: Optional[threading.Event] = None,
+                   chunk_size: int = 500) -> Dict:
+    """
+    Потоковый экспорт результатов в файл
+
+    Данные пишутся во временный файл path + '.part', который переименовывается
+    после успешного завершения; при отмене он удаляется.
+
+    Args:
+        path: Путь к файлу
+        format_type: 'markdown', 'json', 'jsonl' или 'csv' (None - по расширению)
+        filters: Фильтр как в db.get_result_list: prompt_id, model_id, search, since, until
+        progress: Функция обратного вызова (записано, всего или None, если всего неизвестно)
+        cancel_event: Событие отмены (проверяется после каждого результата)
+        chunk_size: Размер порции чтения из БД
+
+    Returns:
+        Словарь: path, format, count, cancelled, duration
+    """
+    format_type = format_type or detect_format(path)
+    if format_type not in EXPORTERS:
+        raise ValueError(f'Неизвестный формат экспорта: {format_type}')
+    filters = dict(filters or {})
+
+    start_time = time.perf_counter()
+    # Подсчет без поиска по тексту дешевый (по индексам); с поиском общее количество неизвестно
+    total = None
+    if progress and not filters.get('search'):
+        total = db.count_results(**{key: filters.get(key) for key in ('prompt_id', 'model_id', 'since', 'until')})
+
+    part_path = path + '.part'
+    count = 0
+    cancelled = False
+    results = db.iter_results(chunk_size=chunk_size, **filters)
+    try:
+        # newline='' - переводы строк в CSV расставляет модуль csv
+        with open(part_path, 'w', encoding='utf-8', newline='' if format_type == 'csv' else None) as f:
+            exporter = EXPORTERS[format_type](f)
+            exporter.write_header()
+            for result in results:
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+                exporter.write_record(result_to_record(result))
+                count += 1
+                if progress and count % PROGRESS_EVERY == 0:
+                    progress(count, total)
+            exporter.write_footer(count)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        results.close()
+
+    if cancelled:
+        os.remove(part_path)
+    else:
+        os.replace(part_path, path)
+        if progress:
+            progress(count, total)
+    return {
+        'path': path,
+        'format': format_type,
+        'count': count,
+        'cancelled': cancelled,
+        'duration': time.perf_counter() - start_time
+    }
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль пакетного импорта промтов и результатов
+
+Поддерживаются файлы JSONL и CSV, в том числе созданные экспортом
+(exporters.py). Запись с полем response_text импортируется как результат,
+запись только с полем prompt - как промт (библиотека промтов).
+
+Файл читается построчно, записи вставляются порциями через executemany,
+каждая порция - одна транзакция. Промты с одинаковым текстом не дублируются
+(поиск по уникальному индексу prompts.content_hash), имена моделей
+сопоставляются с ID по словарю, загруженному один раз.
+"""
+
+import os
+import csv
+import json
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import db
+
+
+# Записей в одной транзакции
+DEFAULT_BATCH_SIZE = 10000
+
+# Ограничение числа параметров в одном запросе SQLite
+SQL_VARIABLES_LIMIT = 900
+
+# Тип API для моделей, которые создаются при импорте результатов неизвестных моделей
+PLACEHOLDER_MODEL_TYPE = 'OpenAI'
+
+# Сколько номеров ошибочных строк сохранять в отчете
+MAX_REPORTED_ERRORS = 20
+
+IMPORT_FORMATS = {
+    'jsonl': ('.jsonl', '.ndjson'),
+    'csv': ('.csv',),
+}
+
+
+def detect_format(path: str) -> Optional[str]:
+    """Формат по расширению файла"""
+    for format_type, extensions in IMPORT_FORMATS.items():
+        if path.lower().endswith(extensions):
+            return format_type
+    return None
+
+
+def iter_records(path: str, format_type: str) -> Iterator[Tuple[int, Optional[Dict]]]:
+    """
+    Построчное чтение файла импорта
+
+    Yields:
+        (номер строки, запись или None, если строку не удалось разобрать)
+    """
+    if format_type == 'jsonl':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_number, record if isinstance(record, dict) else None
+    elif format_type == 'csv':
+        # Ответы длиннее ограничения модуля csv по умолчанию (128 КБ)
+        csv.field_size_limit(2 ** 31 - 1)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+    else:
+        raise ValueError(f'Неизвестный формат импорта: {format_type}')
+
+
+def _parse_ts(record: Dict, ts_key: str, date_key: str) -> Optional[int]:
+    """Отметка времени записи: поле *_ts (мс) или текстовая дата в формате db.DATE_FORMAT"""
+    value = record.get(ts_key)
+    if value not in (None, ''):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    value = record.get(date_key)
+    if value:
+        try:
+            return int(datetime.strptime(value, db.DATE_FORMAT).timestamp() * 1000)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def normalize_record(record: Dict, default_ts: int) -> Optional[Dict]:
+    """
+    Привести запись файла к виду импорта
+
+    Returns:
+        Словарь prompt, tags, ts, model_name, response_text, metadata
+        (model_name и response_text равны None для промта без результата)
+        или None, если в записи нет текста промта
+    """
+    prompt = record.get('prompt')
+    if not isinstance(prompt, str) or not prompt.strip():
+        return None
+
+    response_text = record.get('response_text')
+    if response_text is not None and not isinstance(response_text, str):
+        response_text = str(response_text)
+
+    metadata = record.get('metadata')
+    if metadata in ('', None):
+        metadata = None
+    elif not isinstance(metadata, str):
+        metadata = json.dumps(metadata)
+
+    tags = record.get('tags')
+    if isinstance(tags, (list, tuple)):
+        tags = ', '.join(str(tag) for tag in tags if tag)
+    elif tags is not None and not isinstance(tags, str):
+        tags = str(tags)
+
+    if response_text is None:
+        ts = _parse_ts(record, 'created_ts', 'date')
+    else:
+        ts = _parse_ts(record, 'saved_ts', 'saved_date')
+    return {
+        'prompt': prompt,
+        'tags': tags or None,
+        'ts': ts if ts is not None else default_ts,
+        'model_name': (record.get('model_name') or '').strip() or None,
+        'response_text': response_text,
+        'metadata': metadata,
+    }
+
+
+def _chunks(items: List, size: int = SQL_VARIABLES_LIMIT) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _resolve_prompts(cursor, batch: List[Dict], prompt_ids: Dict[str, int], report: Dict):
+    """Найти (по prompts.content_hash) или создать промты порции; в каждую запись добавляется prompt_id"""
+    new_prompts = {}
+    for item in batch:
+        digest = db.prompt_hash(item['prompt'])
+        item['prompt_hash'] = digest
+        if digest not in prompt_ids and digest not in new_prompts:
+            new_prompts[digest] = item
+
+    digests = list(new_prompts)
+    for chunk in _chunks(digests):
+        cursor.execute(f'SELECT id, content_hash FROM prompts WHERE content_hash IN ({", ".join("?" * len(chunk))})',
+                       chunk)
+        for row in cursor.fetchall():
+            prompt_ids[row['content_hash']] = row['id']
+            del new_prompts[row['content_hash']]
+    report['prompts_existing'] += sum(1 for item in batch
+                                      if item['response_text'] is None and item['prompt_hash'] not in new_prompts)
+
+    if new_prompts:
+        cursor.executemany(f'''
+            INSERT OR IGNORE INTO prompts (date, created_ts, prompt, tags, content_hash, title_key)
+            VALUES ({db._LOCAL_DATE_SQL}, ?, ?, ?, ?, ?)
+        ''', [(item['ts'], item['ts'], item['prompt'], item['tags'], digest, db.prompt_title_key(item['prompt']))
+              for digest, item in new_prompts.items()])
+        report['prompts_created'] += cursor.rowcount
+        for chunk in _chunks(list(new_prompts)):
+            cursor.execute(f'''
+                SELECT id, content_hash, tags FROM prompts WHERE content_hash IN ({", ".join("?" * len(chunk))})
+            ''', chunk)
+            for row in cursor.fetchall():
+                prompt_ids[row['content_hash']] = row['id']
+                if row['tags']:
+                    db.set_prompt_tags(cursor, row['id'], row['tags'])
+
+    # Теги записей, совпавших с существующими (или уже созданными в этом импорте) промтами,
+    # добавляются к их тегам, как в db.get_or_create_prompt
+    merged_tags = {}
+    for item in batch:
+        item['prompt_id'] = prompt_ids[item['prompt_hash']]
+        if item['tags'] and new_prompts.get(item['prompt_hash']) is not item:
+            merged_tags.setdefault(item['prompt_id'], []).append(item['tags'])
+    for prompt_id, tags in merged_tags.items():
+        db._merge_prompt_tags(cursor, prompt_id, ', '.join(tags))
+
+
+def _resolve_models(cursor, results: List[Dict], model_ids: Dict[str, int],
+                    create_models: bool, report: Dict) -> List[Dict]:
+    """Сопоставить имена моделей с ID; возвращает результаты, для которых модель найдена"""
+    unknown = sorted({item['model_name'] for item in results
+                      if item['model_name'] and item['model_name'] not in model_ids})
+    if unknown and create_models:
+        # Модели из чужой БД создаются неактивными: их API и ключи неизвестны
+        created_ts = db.now_ms()
+        cursor.executemany(f'''
+            INSERT OR IGNORE INTO models (name, api_url, api_key_env, model_type, is_active, created_date, created_ts)
+            VALUES (?, '', '', ?, 0, {db._LOCAL_DATE_SQL}, ?)
+        ''', [(name, PLACEHOLDER_MODEL_TYPE, created_ts, created_ts) for name in unknown])
+        report['models_created'] += cursor.rowcount
+        for names in _chunks(unknown):
+            cursor.execute(f'SELECT id, name FROM models WHERE name IN ({", ".join("?" * len(names))})', names)
+            for row in cursor.fetchall():
+                model_ids[row['name']] = row['id']
+
+    resolved = []
+    for item in results:
+        model_id = model_ids.get(item['model_name'])
+        if model_id is None:
+            report['skipped'] += 1
+            continue
+        item['model_id'] = model_id
+        resolved.append(item)
+    return resolved
+
+
+def _store_texts(cursor, results: List[Dict]):
+    """Сохранить тексты ответов порции в blobs; в каждую запись добавляется blob_id"""
+    texts = {}
+    for item in results:
+        digest = db.text_hash(item['response_text'])
+        item['blob_hash'] = digest
+        if digest not in texts:
+            texts[digest] = item['response_text']
+
+    blob_ids = {}
+    digests = list(texts)
+    for chunk in _chunks(digests):
+        cursor.execute(f'SELECT id, hash FROM blobs WHERE hash IN ({", ".join("?" * len(chunk))})', chunk)
+        for row in cursor.fetchall():
+            blob_ids[row['hash']] = row['id']
+
+    rows = []
+    for digest in digests:
+        if digest not in blob_ids:
+            text = texts[digest]
+            codec, data = db.encode_text(text)
+            rows.append((digest, codec, len(text), len(data), data))
+    if rows:
+        cursor.executemany('''
+            INSERT OR IGNORE INTO blobs (hash, codec, text_length, size, data) VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        for chunk in _chunks([row[0] for row in rows]):
+            cursor.execute(f'SELECT id, hash FROM blobs WHERE hash IN ({", ".join("?" * len(chunk))})', chunk)
+            for row in cursor.fetchall():
+                blob_ids[row['hash']] = row['id']
+
+    for item in results:
+        item['blob_id'] = blob_ids[item['blob_hash']]
+
+
+def _import_batch(conn, batch: List[Dict], prompt_ids: Dict[str, int], model_ids: Dict[str, int],
+                  create_models: bool, report: Dict):
+    """Вставка порции записей в одной транзакции"""
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        results = [item for item in batch if item['response_text'] is not None]
+        results = _resolve_models(cursor, results, model_ids, create_models, report)
+        # Промты пропущенных результатов не создаются
+        _resolve_prompts(cursor, [item for item in batch if item['response_text'] is None] + results,
+                         prompt_ids, report)
+        if results:
+            _store_texts(cursor, results)
+            cursor.executemany(f'''
+                INSERT INTO results (prompt_id, model_id, response_text, saved_date, saved_ts, metadata, blob_id, preview)
+                VALUES (?, ?, '', {db._LOCAL_DATE_SQL}, ?, ?, ?, ?)
+            ''', [(item['prompt_id'], item['model_id'], item['ts'], item['ts'], item['metadata'],
+                   item['blob_id'], db.make_preview(item['response_text'])) for item in results])
+            report['results'] += len(results)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def import_file(path: str, format_type: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                create_models: bool = True, progress: Optional[Callable[[int], None]] = None) -> Dict:
+    """
+    Импорт промтов и результатов из файла JSONL или CSV
+
+    Args:
+        path: Путь к файлу
+        format_type: 'jsonl' или 'csv' (None - по расширению)
+        batch_size: Записей в одной транзакции
+        create_models: Создавать неактивные модели для неизвестных имен
+            (иначе результаты таких моделей пропускаются)
+        progress: Функция обратного вызова (прочитано записей)
+
+    Returns:
+        Словарь: path, read, prompts_created, prompts_existing, results,
+        models_created, skipped, errors (номера первых ошибочных строк), duration
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Файл импорта не найден: {path}')
+    format_type = format_type or detect_format(path)
+    if format_type not in IMPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат импорта: {format_type}')
+
+    start_time = time.perf_counter()
+    report = {
+        'path': path,
+        'read': 0,
+        'prompts_created': 0,
+        'prompts_existing': 0,
+        'results': 0,
+        'models_created': 0,
+        'skipped': 0,
+        'errors': [],
+    }
+    default_ts = db.now_ms()
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.execute('PRAGMA cache_size = -65536')
+        # Кеш хешей промтов, уже найденных или созданных при этом импорте
+        prompt_ids = {}
+        cursor.execute('SELECT id, name FROM models')
+        model_ids = {row['name']: row['id'] for row in cursor.fetchall()}
+
+        batch = []
+        for line_number, record in iter_records(path, format_type):
+            report['read'] += 1
+            item = normalize_record(record, default_ts) if record is not None else None
+            if item is None:
+                report['skipped'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append(line_number)
+                continue
+            batch.append(item)
+            if len(batch) >= batch_size:
+                _import_batch(conn, batch, prompt_ids, model_ids, create_models, report)
+                batch = []
+                if progress:
+                    progress(report['read'])
+        if batch:
+            _import_batch(conn, batch, prompt_ids, model_ids, create_models, report)
+        if progress:
+            progress(report['read'])
+    finally:
+        conn.close()
+
+    report['duration'] = time.perf_counter() - start_time
+    return report
+
+
+def format_report(report: Dict) -> str:
+    """Текстовый отчет об импорте для консоли и GUI"""
+    lines = [
+        f"Импорт {report['path']} завершен за {report['duration']:.2f} с",
+        f"  прочитано записей: {report['read']}",
+        f"  промтов создано: {report['prompts_created']}, уже были в БД: {report['prompts_existing']}",
+        f"  результатов: {report['results']}",
+    ]
+    if report['models_created']:
+        lines.append(f"  создано неактивных моделей: {report['models_created']}")
+    if report['skipped']:
+        lines.append(f"  пропущено записей: {report['skipped']}")
+    if report['errors']:
+        lines.append(f"  строки с ошибками: {', '.join(str(n) for n in report['errors'])}")
+    return '\n'.join(lines)
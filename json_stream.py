@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль потокового разбора JSON из ответов моделей
+
+Ответ модели поступает частями (SSE). JsonStreamParser разбирает их по мере
+поступления и сообщает о каждом завершенном значении с его путем, например
+('improved',) или ('variants', 0), не дожидаясь конца ответа.
+
+Разбор терпим к типичным отклонениям ответов моделей: текст и ограждение
+```json до объекта пропускаются, текст после закрывающей скобки объекта
+игнорируется, лишние запятые и управляющие символы внутри строк допускаются.
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
+# Символы чисел и литералов true/false/null
+_SCALAR_CHARS = frozenset('0123456789+-.eEtrufalsn')
+_SCALAR_RUN_RE = re.compile(r'[0-9+\-.eEtrufalsn]+')
+_STRING_RUN_RE = re.compile(r'[^"\\]+')
+_SKIP_RUN_RE = re.compile(r'[\s,:]+')
+_LITERALS = {'true': True, 'false': False, 'null': None}
+
+
+class _Frame:
+    """Открытый объект или массив"""
+    __slots__ = ('value', 'path', 'key')
+
+    def __init__(self, value, path: tuple):
+        self.value = value
+        self.path = path
+        self.key = None  # Ключ объекта, ожидающий значения
+
+
+class JsonStreamParser:
+    """
+    Инкрементальный разбор JSON-объекта
+
+    feed(часть) возвращает список завершенных значений (путь, значение) в порядке
+    их закрытия; значения-контейнеры сообщаются после всех своих элементов.
+    Когда корневой объект закрыт, done = True, а result - разобранный словарь.
+    """
+
+    def __init__(self):
+        self.stack: List[_Frame] = []
+        self.started = False
+        self.done = False
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._string: Optional[List[str]] = None  # Части строки (с escape-последовательностями)
+        self._escape = False
+        self._scalar = ''
+        self._events: List[Tuple[tuple, Any]] = []
+
+    def partial(self) -> Optional[dict]:
+        """
+        Корневой объект в текущем состоянии (для оборванного ответа)
+
+        Незакрытые вложенные объекты и массивы входят в него со всеми завершенными
+        элементами; оборванная строка или число не входят.
+        """
+        if self.result is not None:
+            return self.result
+        child = None
+        for frame in reversed(self.stack):
+            value = dict(frame.value) if isinstance(frame.value, dict) else list(frame.value)
+            if child is not None:
+                if isinstance(value, list):
+                    value.append(child)
+                elif frame.key is not None:
+                    value[frame.key] = child
+            child = value
+        return child
+
+    def feed(self, chunk: str) -> List[Tuple[tuple, Any]]:
+        """Разобрать очередную часть ответа"""
+        i = 0
+        count = len(chunk)
+        while i < count and not self.done and self.error is None:
+            if self._string is not None:
+                i = self._feed_string(chunk, i)
+                continue
+            if not self.started:
+                # Все до первой { - пояснения модели и ограждение ```json
+                start = chunk.find('{', i)
+                if start < 0:
+                    break
+                self.started = True
+                self.stack.append(_Frame({}, ()))
+                i = start + 1
+                continue
+            ch = chunk[i]
+            if ch in _SCALAR_CHARS:
+                match = _SCALAR_RUN_RE.match(chunk, i)
+                self._scalar += match.group()
+                i = match.end()
+                continue
+            if self._scalar:
+                self._finish_scalar()
+                if self.error is not None:
+                    break
+            if ch == '"':
+                self._string = []
+                i += 1
+            elif ch == '{' or ch == '[':
+                self._open({} if ch == '{' else [])
+                i += 1
+            elif ch == '}' or ch == ']':
+                self._close(dict if ch == '}' else list)
+                i += 1
+            else:
+                match = _SKIP_RUN_RE.match(chunk, i)
+                if match is None:
+                    self.error = f'Неожиданный символ {ch!r}'
+                    break
+                i = match.end()  # Разделители не проверяются: лишние запятые допустимы
+        return self._take_events()
+
+    def finish(self) -> List[Tuple[tuple, Any]]:
+        """Конец ответа: завершить число или литерал, оборванный концом текста"""
+        if self._scalar and not self.done and self.error is None:
+            self._finish_scalar()
+        return self._take_events()
+
+    def _take_events(self) -> List[Tuple[tuple, Any]]:
+        events = self._events
+        self._events = []
+        return events
+
+    def _feed_string(self, chunk: str, i: int) -> int:
+        if self._escape:
+            self._string.append(chunk[i])
+            self._escape = False
+            return i + 1
+        match = _STRING_RUN_RE.match(chunk, i)
+        if match is not None:
+            self._string.append(match.group())
+            return match.end()
+        if chunk[i] == '\\':
+            self._string.append('\\')
+            self._escape = True
+            return i + 1
+        # Закрывающая кавычка: escape-последовательности разбирает json (strict=False
+        # пропускает переводы строк, которые модели иногда не экранируют)
+        raw = ''.join(self._string)
+        self._string = None
+        try:
+            value = json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            value = raw
+        self._value(value)
+        return i + 1
+
+    def _finish_scalar(self):
+        text = self._scalar
+        self._scalar = ''
+        if text in _LITERALS:
+            self._value(_LITERALS[text])
+            return
+        try:
+            self._value(json.loads(text))
+        except ValueError:
+            self.error = f'Некорректное значение {text!r}'
+
+    def _child_path(self, frame: _Frame) -> Optional[tuple]:
+        if isinstance(frame.value, dict):
+            if frame.key is None:
+                return None
+            return frame.path + (frame.key,)
+        return frame.path + (len(frame.value),)
+
+    def _open(self, container):
+        path = self._child_path(self.stack[-1])
+        if path is None:
+            self.error = 'Ожидался ключ объекта'
+            return
+        self.stack.append(_Frame(container, path))
+
+    def _close(self, container_type):
+        frame = self.stack[-1]
+        if not isinstance(frame.value, container_type):
+            self.error = 'Несогласованные скобки'
+            return
+        self.stack.pop()
+        if not self.stack:
+            self.result = frame.value
+            self.done = True
+            return
+        self._value(frame.value)
+
+    def _value(self, value):
+        frame = self.stack[-1]
+        if isinstance(frame.value, dict):
+            if frame.key is None:
+                if not isinstance(value, str):
+                    self.error = 'Ожидался ключ объекта'
+                    return
+                frame.key = value
+                return
+            path = frame.path + (frame.key,)
+            frame.value[frame.key] = value
+            frame.key = None
+        else:
+            path = frame.path + (len(frame.value),)
+            frame.value.append(value)
+        self._events.append((path, value))
+
+
+def extract_object(text: str) -> Optional[dict]:
+    """
+    Первый JSON-объект в тексте ответа (с пояснениями, ограждением ``` и т.п.)
+
+    Returns:
+        Словарь или None, если объект не найден или не закрыт
+    """
+    parser = JsonStreamParser()
+    parser.feed(text)
+    parser.finish()
+    return parser.result
@@ -8,7 +8,6 @@ import logging
 import os
 from datetime import datetime
 from typing import Dict, Any
-import version
 
 
 def get_log_dir():
@@ -43,13 +42,57 @@ def get_log_dir():
         return os.path.join(tempfile.gettempdir(), 'ChatList', 'logs')
 
 
-LOG_DIR = get_log_dir()
-LOG_FILE = os.path.join(LOG_DIR, 'chatlist.log')
+_log_file = None
+
+
+def get_log_file() -> str:
+    """Путь к файлу лога: директория определяется при первой записи и кэшируется"""
+    global _log_file
+    if _log_file is None:
+        _log_file = os.path.join(get_log_dir(), 'chatlist.log')
+    return _log_file
+
+
+def __getattr__(name: str):
+    # LOG_DIR и LOG_FILE вычисляются при первом обращении, а не при импорте модуля
+    if name == 'LOG_FILE':
+        return get_log_file()
+    if name == 'LOG_DIR':
+        return os.path.dirname(get_log_file())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class LazyFileHandler(logging.Handler):
+    """Обработчик, который открывает файл лога при первой записи"""
+    
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.file_handler = None
+        self.failed = False  # Файл не удалось открыть: запись в него пропускается
+    
+    def emit(self, record):
+        if self.failed:
+            return
+        try:
+            if self.file_handler is None:
+                self.file_handler = logging.FileHandler(get_log_file(), encoding='utf-8')
+                self.file_handler.setFormatter(self.formatter)
+        except Exception:
+            # Об ошибке сообщается один раз, остальные записи просто не попадают в файл
+            self.failed = True
+            self.handleError(record)
+            return
+        self.file_handler.emit(record)
+    
+    def close(self):
+        if self.file_handler is not None:
+            self.file_handler.close()
+        super().close()
 
 
 def setup_logger():
     """Настройка логгера"""
-    # Директория уже создана в get_log_dir()
+    # Директория определяется и создается при первой записи (LazyFileHandler)
     
     # Настройка формата логирования
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -62,16 +105,10 @@ def setup_logger():
     # Очистка существующих обработчиков
     logger.handlers.clear()
     
-    # Обработчик для файла
-    try:
-        file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        file_formatter = logging.Formatter(log_format, date_format)
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-    except Exception as e:
-        # Если не удалось создать файловый обработчик, продолжаем без него
-        pass
+    # Обработчик для файла (если файл не удастся открыть, запись в него пропускается)
+    file_handler = LazyFileHandler(logging.INFO)
+    file_handler.setFormatter(logging.Formatter(log_format, date_format))
+    logger.addHandler(file_handler)
     
     # Обработчик для консоли (опционально)
     console_handler = logging.StreamHandler()
@@ -80,9 +117,7 @@ def setup_logger():
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
     
-    # Логирование версии при старте (после настройки обработчиков)
-    logger.info(f"ChatList v{version.__version__} - Запуск приложения")
-    
+    # Версия при старте записывается в main.main() - один раз
     return logger
 
 
@@ -135,11 +170,12 @@ def get_logs(limit: int = 100) -> list:
     Returns:
         Список строк логов
     """
-    if not os.path.exists(LOG_FILE):
+    log_file = get_log_file()
+    if not os.path.exists(log_file):
         return []
     
     try:
-        with open(LOG_FILE, 'r', encoding='utf-8') as f:
+        with open(log_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
             return lines[-limit:] if len(lines) > limit else lines
     except Exception as e:
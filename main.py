@@ -5,23 +5,35 @@
 """
 
 import sys
+import startup_profile  # Первым: от момента его импорта отсчитывается время запуска
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTextEdit, QPushButton, QComboBox, QTableWidget, QTableWidgetItem,
     QCheckBox, QLabel, QMessageBox, QProgressBar, QGroupBox, QSplitter,
     QHeaderView, QMenuBar, QMenu, QStatusBar, QDialog, QDialogButtonBox,
-    QFormLayout, QLineEdit, QStyledItemDelegate, QTabWidget, QListWidget
+    QFormLayout, QLineEdit, QStyledItemDelegate, QTabWidget, QListWidget, QListWidgetItem,
+    QDateTimeEdit, QTableView, QAbstractItemView
 )
-from PyQt5.QtCore import QSize
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QSize, QRect
+from PyQt5.QtCore import (
+    Qt, QThread, QObject, pyqtSignal, QDateTime, QTimer, QEvent,
+    QAbstractListModel, QAbstractTableModel, QModelIndex
+)
+from PyQt5.QtGui import QIcon, QColor
 from typing import List, Dict, Optional
+import threading
+import time
 import db
+import maintenance
+import markdown_render
+import metrics
 import models
-import network
-import prompt_improver
+import themes
 import version
 
+# network (requests) и prompt_improver импортируются при первом запросе,
+# backup - при первом резервном копировании: на запуск окна они не влияют
+
 
 class RequestWorker(QThread):
     """Рабочий поток для асинхронной отправки запросов"""
@@ -32,23 +44,615 @@ class RequestWorker(QThread):
         self.model = model
         self.prompt = prompt
         self.timeout = timeout
+        self.created_at = time.perf_counter()
     
     def run(self):
+        # Время ожидания между созданием потока и началом выполнения
+        metrics.REQUEST_QUEUE_WAIT.observe(
+            time.perf_counter() - self.created_at,
+            model=self.model.name, provider=self.model.model_type.lower())
+        import network
         result = network.send_request(self.model, self.prompt, self.timeout)
         self.finished.emit(self.model.id, result)
 
 
+class MaintenanceWorker(QThread):
+    """Рабочий поток обслуживания БД"""
+    finished = pyqtSignal(dict)  # отчет maintenance.run_maintenance или {'error': ...}
+    
+    def __init__(self, trigger: str):
+        super().__init__()
+        self.trigger = trigger
+    
+    def run(self):
+        try:
+            # PASSIVE: контрольная точка не ждет других соединений
+            report = maintenance.run_maintenance(trigger=self.trigger, checkpoint_mode='PASSIVE')
+        except Exception as e:
+            report = {'error': str(e)}
+        self.finished.emit(report)
+
+
+class BackupWorker(QThread):
+    """Рабочий поток создания снимка БД или восстановления из снимка"""
+    progress = pyqtSignal(int, int)  # скопировано страниц, всего страниц
+    finished = pyqtSignal(dict)  # отчет backup_database/restore_database или {'error': ...}
+    
+    def __init__(self, mode: str, path: str, compression: str = 'none'):
+        super().__init__()
+        self.mode = mode
+        self.path = path
+        self.compression = compression
+    
+    def run(self):
+        import backup
+        try:
+            if self.mode == 'restore':
+                report = backup.restore_database(self.path, progress=self.progress.emit)
+            else:
+                report = backup.backup_database(self.path, compression=self.compression,
+                                                progress=self.progress.emit)
+        except Exception as e:
+            report = {'error': str(e)}
+        self.finished.emit(report)
+
+
+class ExportWorker(QThread):
+    """Рабочий поток потокового экспорта результатов"""
+    progress = pyqtSignal(int, int)  # записано результатов, всего (-1, если неизвестно)
+    finished = pyqtSignal(dict)  # отчет exporters.export_results или {'error': ...}
+    
+    def __init__(self, path: str, format_type: str, filters: dict):
+        super().__init__()
+        self.path = path
+        self.format_type = format_type
+        self.filters = filters
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def run(self):
+        import exporters
+        try:
+            report = exporters.export_results(
+                self.path, self.format_type, filters=self.filters,
+                progress=lambda count, total: self.progress.emit(count, -1 if total is None else total),
+                cancel_event=self.cancel_event)
+        except Exception as e:
+            report = {'error': str(e)}
+        self.finished.emit(report)
+
+
+class ImportWorker(QThread):
+    """Рабочий поток пакетного импорта промтов и результатов"""
+    progress = pyqtSignal(int)  # прочитано записей
+    finished = pyqtSignal(dict)  # отчет importers.import_file или {'error': ...}
+    
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+    
+    def run(self):
+        import importers
+        try:
+            report = importers.import_file(self.path, progress=self.progress.emit)
+        except Exception as e:
+            report = {'error': str(e)}
+        self.finished.emit(report)
+
+
+class ArchiveWorker(QThread):
+    """Рабочий поток переноса старых результатов в архивные разделы"""
+    progress = pyqtSignal(int)  # перенесено результатов
+    finished = pyqtSignal(dict)  # отчет db.archive_results или {'error': ...}
+    
+    def __init__(self, cutoff_ts: int):
+        super().__init__()
+        self.cutoff_ts = cutoff_ts
+    
+    def run(self):
+        try:
+            report = db.archive_results(self.cutoff_ts, progress=self.progress.emit)
+        except Exception as e:
+            report = {'error': str(e)}
+        self.finished.emit(report)
+
+
+class SearchWorker(QThread):
+    """Рабочий поток одного поискового запроса"""
+    finished = pyqtSignal(int, object, str)  # поколение запроса, найденные строки, текст ошибки
+    
+    def __init__(self, generation: int, search_func):
+        super().__init__()
+        self.generation = generation
+        self.search_func = search_func
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def run(self):
+        try:
+            rows = self.search_func(self.cancel_event)
+            error = ''
+        except Exception as e:
+            rows, error = None, str(e)
+        if self.cancel_event.is_set():
+            # Отмененный запрос (в том числе прерванный в SQLite) не сообщает результат
+            rows, error = None, ''
+        self.finished.emit(self.generation, rows, error)
+
+
+class BackgroundSearch(QObject):
+    """
+    Отложенный поиск в рабочем потоке
+    
+    Запрос запускается через DEBOUNCE_MS после последнего вызова schedule;
+    новый запрос отменяет выполняющийся, результаты устаревших запросов отбрасываются.
+    """
+    resultsReady = pyqtSignal(object, object)  # найденные строки, контекст запроса
+    failed = pyqtSignal(str)
+    DEBOUNCE_MS = 250
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self.workers = []
+        self.pending = None
+        self.context = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DEBOUNCE_MS)
+        self.timer.timeout.connect(self._start_pending)
+    
+    def schedule(self, search_func, context=None):
+        """Запустить поиск после паузы во вводе"""
+        self.pending = (search_func, context)
+        self.timer.start()
+    
+    def run_now(self, search_func, context=None):
+        """Запустить поиск сразу (смена фильтра, первая загрузка)"""
+        self.timer.stop()
+        self.pending = (search_func, context)
+        self._start_pending()
+    
+    def cancel(self):
+        """Отменить отложенный и выполняющиеся запросы"""
+        self.timer.stop()
+        self.pending = None
+        self.generation += 1
+        for worker in self.workers:
+            worker.cancel()
+    
+    def _start_pending(self):
+        if self.pending is None:
+            return
+        search_func, context = self.pending
+        self.pending = None
+        for worker in self.workers:
+            worker.cancel()
+        self.generation += 1
+        self.context = context
+        worker = SearchWorker(self.generation, search_func)
+        worker.finished.connect(lambda generation, rows, error, worker=worker:
+                                self._on_finished(worker, generation, rows, error))
+        self.workers.append(worker)
+        worker.start()
+    
+    def _on_finished(self, worker, generation: int, rows, error: str):
+        worker.wait()
+        self.workers.remove(worker)
+        if generation != self.generation:
+            return
+        if error:
+            self.failed.emit(error)
+        elif rows is not None:
+            self.resultsReady.emit(rows, self.context)
+    
+    def shutdown(self):
+        """Остановить все запросы (перед закрытием окна)"""
+        self.cancel()
+        for worker in list(self.workers):
+            worker.wait()
+
+
+class UpdateScheduler(QObject):
+    """
+    Планировщик обновлений интерфейса с объединением событий
+    
+    События копятся в буфере по ключу и применяются пакетом не чаще раза
+    в FRAME_MS, поэтому стоимость обновления интерфейса не зависит от
+    частоты событий. Новое событие с тем же ключом заменяет ожидающее
+    (или сливается с ним функцией merge) - такие события учитываются
+    в метрике chatlist_ui_updates_total{outcome="merged"}.
+    """
+    FRAME_MS = 50
+    
+    def __init__(self, apply_func, parent=None):
+        """
+        Args:
+            apply_func: Функция, получающая список (ключ, событие) за кадр в порядке поступления
+        """
+        super().__init__(parent)
+        self.apply_func = apply_func
+        self.pending = {}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.FRAME_MS)
+        self.timer.timeout.connect(self.flush)
+    
+    def post(self, key, event, merge=None):
+        """Поставить событие в очередь; merge(ожидающее, новое) объединяет события одного ключа"""
+        if key in self.pending:
+            previous = self.pending[key]
+            self.pending[key] = merge(previous, event) if merge else event
+            metrics.UI_UPDATES.inc(outcome='merged')
+        else:
+            self.pending[key] = event
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    def flush(self):
+        """Применить накопленные события одним пакетом"""
+        self.timer.stop()
+        if not self.pending:
+            return
+        events = list(self.pending.items())
+        self.pending = {}
+        start_time = time.perf_counter()
+        self.apply_func(events)
+        metrics.UI_FLUSH_TIME.observe(time.perf_counter() - start_time)
+        metrics.UI_UPDATES.inc(len(events), outcome='applied')
+    
+    def clear(self):
+        """Отбросить ожидающие события (например, при очистке таблицы)"""
+        self.timer.stop()
+        if self.pending:
+            metrics.UI_UPDATES.inc(len(self.pending), outcome='dropped')
+        self.pending = {}
+
+
+class RecordTableModel(QAbstractTableModel):
+    """
+    Табличная модель над списком словарей
+    
+    Колонки задаются кортежами (заголовок, функция текста ячейки, функция ключа сортировки).
+    """
+    
+    def __init__(self, columns: list, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.records = []
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self.columns[index.column()][1](self.records[index.row()])
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return None
+    
+    def record(self, row: int) -> Optional[Dict]:
+        return self.records[row] if 0 <= row < len(self.records) else None
+    
+    def set_records(self, records: list):
+        self.beginResetModel()
+        self.records = list(records)
+        self._sort_records()
+        self.endResetModel()
+    
+    def append_records(self, records: list):
+        if not records:
+            return
+        if self.sort_column is not None:
+            # Догруженные строки встают на свои места в текущей сортировке
+            def change():
+                self.records.extend(records)
+                self._sort_records()
+            self._change_layout(change)
+            return
+        first = len(self.records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self.records.extend(records)
+        self.endInsertRows()
+    
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self._change_layout(self._sort_records)
+    
+    def _change_layout(self, change):
+        """Перестановка строк с сохранением выделения и текущей строки представления"""
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        tracked = [self.records[index.row()] for index in old_indexes]
+        change()
+        rows = {id(record): row for row, record in enumerate(self.records)}
+        self.changePersistentIndexList(
+            old_indexes, [self.index(rows[id(record)], index.column()) for record, index in zip(tracked, old_indexes)])
+        self.layoutChanged.emit()
+    
+    def _sort_records(self):
+        if self.sort_column is None:
+            return
+        key = self.columns[self.sort_column][2]
+        self.records.sort(key=key, reverse=self.sort_order == Qt.DescendingOrder)
+
+
+class PromptListModel(QAbstractListModel):
+    """
+    Модель списка промтов для выпадающего списка главного окна
+    
+    Хранит только ID и заголовки; страницы загружаются по мере прокрутки (fetchMore),
+    новые промты добавляются в начало без перечитывания таблицы.
+    Первая строка - "-- Новый промт --" (ID None).
+    """
+    PAGE_SIZE = 200
+    NEW_PROMPT_TEXT = '-- Новый промт --'
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+        self.search = ''
+        self.has_more = False
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items) + 1
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.NEW_PROMPT_TEXT if row == 0 else self.items[row - 1]['title']
+        if role == Qt.UserRole:
+            return None if row == 0 else self.items[row - 1]['id']
+        return None
+    
+    def _load_page(self) -> list:
+        after = None
+        if self.items:
+            last = self.items[-1]
+            after = (last['title_key'], last['id']) if self.search else (last['created_ts'], last['id'])
+        page = db.get_prompt_titles(search=self.search or None, limit=self.PAGE_SIZE, after=after)
+        self.has_more = len(page) == self.PAGE_SIZE
+        return page
+    
+    def reload(self, search: str = ''):
+        """Загрузить первую страницу (последние промты или найденные по началу текста)"""
+        self.beginResetModel()
+        self.search = search
+        self.items = []
+        self.items = self._load_page()
+        self.endResetModel()
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more
+    
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.has_more:
+            return
+        page = self._load_page()
+        if page:
+            first = len(self.items) + 1
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self.items.extend(page)
+            self.endInsertRows()
+    
+    def add_prompt(self, prompt_id: int) -> int:
+        """
+        Добавить промт в начало списка (если его там еще нет)
+        
+        Returns:
+            Номер строки промта в модели
+        """
+        for row, item in enumerate(self.items, start=1):
+            if item['id'] == prompt_id:
+                return row
+        item = db.get_prompt_title(prompt_id)
+        if item is None:
+            return 0
+        self.beginInsertRows(QModelIndex(), 1, 1)
+        self.items.insert(0, item)
+        self.endInsertRows()
+        return 1
+
+
+class LiveResult:
+    """Строка таблицы ответов главного окна"""
+    __slots__ = ('model_id', 'model_name', 'response_text', 'preview', 'metadata',
+                 'success', 'done', 'checked', 'size_hint')
+    
+    def __init__(self, model_id: int, model_name: str):
+        self.model_id = model_id
+        self.model_name = model_name
+        self.response_text = ''
+        self.preview = 'Загрузка...'
+        self.metadata = {}
+        self.success = False
+        self.done = False
+        self.checked = False
+        self.size_hint = None  # Кэш высоты строки: (ширина колонки, высота)
+
+
+class LiveResultsModel(QAbstractTableModel):
+    """
+    Модель таблицы ответов главного окна
+    
+    В ячейке "Ответ" показывается начало ответа (не длиннее настройки
+    max_response_length), полный текст хранится в строке модели.
+    Изменения строк накапливаются и сообщаются представлению одним
+    сигналом dataChanged при вызове flush (раз в кадр UpdateScheduler).
+    """
+    COLUMN_CHECKED, COLUMN_MODEL, COLUMN_RESPONSE = range(3)
+    HEADERS = ['Выбрано', 'Модель', 'Ответ']
+    rowsUpdated = pyqtSignal(int, int)  # первая, последняя измененная строка
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.row_by_model = {}
+        self.max_length = 5000
+        self.dirty_rows = set()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() == self.COLUMN_CHECKED:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if column == self.COLUMN_CHECKED:
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if row.checked else Qt.Unchecked
+            return None
+        if role == Qt.DisplayRole:
+            return row.model_name if column == self.COLUMN_MODEL else row.preview
+        if column != self.COLUMN_RESPONSE:
+            return None
+        if role == Qt.ForegroundRole and row.done and not row.success:
+            return QColor(Qt.red)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignTop | Qt.AlignLeft
+        if role == Qt.ToolTipRole and len(row.response_text) > self.max_length:
+            return row.response_text  # Полный текст при наведении
+        return None
+    
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.column() != self.COLUMN_CHECKED or role != Qt.CheckStateRole:
+            return False
+        self.rows[index.row()].checked = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+    
+    def record(self, row: int) -> Optional[LiveResult]:
+        return self.rows[row] if 0 <= row < len(self.rows) else None
+    
+    def start(self, selected_models: list, max_length: int):
+        """Новая рассылка: по строке "Загрузка..." на каждую модель"""
+        self.beginResetModel()
+        self.dirty_rows.clear()
+        self.max_length = max_length
+        self.rows = [LiveResult(model.id, model.name) for model in selected_models]
+        self.row_by_model = {row.model_id: i for i, row in enumerate(self.rows)}
+        self.endResetModel()
+    
+    def clear(self):
+        self.start([], self.max_length)
+    
+    def set_result(self, model_id: int, result: Dict) -> Optional[int]:
+        """
+        Записать ответ модели; представление узнает об изменении при вызове flush
+        
+        Returns:
+            Номер строки или None, если модели нет в таблице
+        """
+        i = self.row_by_model.get(model_id)
+        if i is None:
+            return None
+        row = self.rows[i]
+        row.response_text = result.get('response_text', 'Ошибка')
+        row.preview = row.response_text[:self.max_length]
+        row.metadata = result.get('metadata', {})
+        row.success = result.get('success', False)
+        row.done = True
+        row.size_hint = None
+        self.dirty_rows.add(i)
+        return i
+    
+    def flush(self):
+        """Одно уведомление dataChanged на все строки, измененные с прошлого сброса"""
+        if not self.dirty_rows:
+            return
+        first, last = min(self.dirty_rows), max(self.dirty_rows)
+        self.dirty_rows.clear()
+        self.dataChanged.emit(self.index(first, self.COLUMN_MODEL), self.index(last, self.COLUMN_RESPONSE))
+        self.rowsUpdated.emit(first, last)
+    
+    def done_rows(self) -> List[LiveResult]:
+        return [row for row in self.rows if row.done]
+    
+    def checked_rows(self) -> List[LiveResult]:
+        return [row for row in self.rows if row.checked and row.done]
+
+
+class LiveResultsDelegate(QStyledItemDelegate):
+    """
+    Делегат таблицы ответов: чекбокс колонки "Выбрано" рисуется стилем по
+    Qt.CheckStateRole (без виджетов в ячейках), высота строки по тексту
+    ответа вычисляется при первом запросе и кэшируется в строке модели
+    """
+    MIN_HEIGHT = 60
+    MAX_HEIGHT = 300
+    PADDING = 10
+    
+    def sizeHint(self, option, index):
+        if index.column() != LiveResultsModel.COLUMN_RESPONSE:
+            return super().sizeHint(option, index)
+        row = index.model().record(index.row())
+        width = max(option.rect.width(), 100)
+        if row.size_hint is None or row.size_hint[0] != width:
+            # Текст длиннее MAX_HEIGHT все равно обрезается, поэтому хватает его начала
+            text = row.preview[:4000]
+            rect = option.fontMetrics.boundingRect(
+                QRect(0, 0, width - self.PADDING, self.MAX_HEIGHT), Qt.TextWordWrap | Qt.AlignTop, text)
+            row.size_hint = (width, max(self.MIN_HEIGHT, min(self.MAX_HEIGHT, rect.height() + self.PADDING)))
+        return QSize(width, row.size_hint[1])
+
+
 class MainWindow(QMainWindow):
+    IDLE_SECONDS = 120  # Обслуживание БД запускается после такого простоя пользователя
+    IDLE_CHECK_INTERVAL_MS = 60 * 1000
+    
     def __init__(self):
         super().__init__()
-        self.temp_results = []  # Временная таблица результатов в памяти
+        self.results_model = LiveResultsModel(self)  # Временная таблица результатов в памяти
+        # Ответы моделей применяются к таблице пакетами, не чаще раза в кадр
+        self.result_updates = UpdateScheduler(self.apply_request_results, self)
         self.current_prompt_id = None
         self.workers = []  # Список активных потоков
-        self.init_database()
-        self.init_ui()
-        self.load_prompts()
-        self.load_models()
-        self.apply_settings()  # Применяем сохраненные настройки
+        self.maintenance_worker = None
+        self.maintenance_manual = False
+        self.backup_worker = None
+        self.import_worker = None
+        self.archive_worker = None
+        profiler = startup_profile.PROFILER
+        with profiler.phase('Миграции БД'):
+            self.init_database()
+        with profiler.phase('Построение главного окна'):
+            self.init_ui()
+        with profiler.phase('Загрузка промтов и моделей'):
+            self.load_prompts()
+            self.load_models()
+        with profiler.phase('Применение настроек'):
+            self.apply_settings()  # Применяем сохраненные настройки
+        self.init_idle_maintenance()
     
     def init_database(self):
         """Инициализация базы данных"""
@@ -118,6 +722,7 @@ class MainWindow(QMainWindow):
         file_menu.addAction('Управление промтами', self.show_prompts_window)
         file_menu.addAction('Управление моделями', self.show_models_window)
         file_menu.addAction('Сохраненные результаты', self.show_results_window)
+        file_menu.addAction('Импорт промтов и результатов...', self.import_data)
         file_menu.addSeparator()
         file_menu.addAction('Выход', self.close)
         
@@ -125,6 +730,15 @@ class MainWindow(QMainWindow):
         settings_menu = menubar.addMenu('Настройки')
         settings_menu.addAction('Настройки...', self.show_settings)
         
+        # Меню "Сервис"
+        service_menu = menubar.addMenu('Сервис')
+        service_menu.addAction('Статистика производительности', self.show_metrics_window)
+        service_menu.addAction('Архивировать старые результаты...', self.archive_old_results)
+        service_menu.addAction('Обслуживание базы данных', lambda: self.start_maintenance('manual'))
+        service_menu.addSeparator()
+        service_menu.addAction('Резервная копия БД...', self.backup_database)
+        service_menu.addAction('Восстановить БД из копии...', self.restore_database)
+        
         # Меню "Справка"
         help_menu = menubar.addMenu('Справка')
         help_menu.addAction('О программе', self.show_about)
@@ -137,9 +751,21 @@ class MainWindow(QMainWindow):
         # Выбор сохраненного промта
         h_layout = QHBoxLayout()
         h_layout.addWidget(QLabel('Выбрать сохраненный промт:'))
+        self.prompt_model = PromptListModel(self)
         self.prompt_combo = QComboBox()
+        self.prompt_combo.setModel(self.prompt_model)
         self.prompt_combo.currentIndexChanged.connect(self.on_prompt_selected)
         h_layout.addWidget(self.prompt_combo, 1)
+        # Поиск по началу текста промта (по индексу), с задержкой после ввода
+        self.prompt_search_input = QLineEdit()
+        self.prompt_search_input.setPlaceholderText('Поиск по началу...')
+        self.prompt_search_input.setMaximumWidth(200)
+        self.prompt_search_timer = QTimer(self)
+        self.prompt_search_timer.setSingleShot(True)
+        self.prompt_search_timer.setInterval(250)
+        self.prompt_search_timer.timeout.connect(self.search_prompts)
+        self.prompt_search_input.textChanged.connect(lambda: self.prompt_search_timer.start())
+        h_layout.addWidget(self.prompt_search_input)
         layout.addLayout(h_layout)
         
         # Поле ввода нового промта
@@ -193,39 +819,24 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout()
         
         # Таблица результатов
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(3)
-        self.results_table.setHorizontalHeaderLabels(['Выбрано', 'Модель', 'Ответ'])
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        # Чекбоксы и высота строк - в делегате, без виджетов в ячейках
+        self.results_table.setItemDelegate(LiveResultsDelegate(self.results_table))
         self.results_table.horizontalHeader().setStretchLastSection(True)
         self.results_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)  # Выбрано
         self.results_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)  # Модель
         self.results_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)  # Ответ
         # Обработчик выделения ячейки (для активации кнопки при выделении колонки "Ответ")
-        self.results_table.itemSelectionChanged.connect(self.on_result_selection_changed)
-        self.results_table.cellClicked.connect(self.on_result_cell_clicked)
+        self.results_table.selectionModel().selectionChanged.connect(self.on_result_selection_changed)
+        self.results_table.clicked.connect(self.on_result_cell_clicked)
         self.results_table.setAlternatingRowColors(True)
         
         # Настройка многострочного отображения для колонки "Ответ"
         self.results_table.verticalHeader().setDefaultSectionSize(100)  # Минимальная высота строки
         self.results_table.setWordWrap(True)  # Включить перенос слов
-        
-        # Делегат для многострочного текста в колонке "Ответ"
-        class MultiLineDelegate(QStyledItemDelegate):
-            def sizeHint(self, option, index):
-                size = super().sizeHint(option, index)
-                if index.column() == 2:  # Колонка "Ответ"
-                    text = index.data(Qt.DisplayRole) or ""
-                    if text:
-                        # Вычисляем высоту на основе количества строк
-                        lines = text.split('\n')
-                        line_count = len(lines)
-                        # Минимум 3 строки, максимум 10 строк
-                        height = max(60, min(300, line_count * 20 + 20))
-                        size.setHeight(height)
-                return size
-        
-        delegate = MultiLineDelegate(self.results_table)
-        self.results_table.setItemDelegateForColumn(2, delegate)  # Колонка "Ответ"
+        # Высота пересчитывается только для строк, изменившихся с прошлого обновления
+        self.results_model.rowsUpdated.connect(self.resize_result_rows)
         
         layout.addWidget(self.results_table)
         
@@ -265,13 +876,27 @@ class MainWindow(QMainWindow):
         return widget
     
     def load_prompts(self):
-        """Загрузка списка промтов"""
-        self.prompt_combo.clear()
-        self.prompt_combo.addItem('-- Новый промт --', None)
-        prompts = db.get_prompts()
-        for prompt in prompts:
-            text = f"{prompt['prompt'][:50]}..." if len(prompt['prompt']) > 50 else prompt['prompt']
-            self.prompt_combo.addItem(text, prompt['id'])
+        """Загрузка первой страницы списка промтов (остальные - при прокрутке списка)"""
+        self.prompt_model.reload(self.prompt_search_input.text().strip())
+        self.prompt_combo.setCurrentIndex(0)
+    
+    def search_prompts(self):
+        """Поиск промтов по началу текста и показ найденных"""
+        search_text = self.prompt_search_input.text().strip()
+        self.prompt_combo.blockSignals(True)
+        self.prompt_model.reload(search_text)
+        self.prompt_combo.setCurrentIndex(0)
+        self.prompt_combo.blockSignals(False)
+        if search_text and self.prompt_model.items:
+            self.prompt_combo.showPopup()
+    
+    def add_prompt_to_list(self, prompt_id: int):
+        """Добавить сохраненный промт в список и выбрать его без перезагрузки списка"""
+        row = self.prompt_model.add_prompt(prompt_id)
+        # Без сигнала: выбор промта из списка очищает результаты и подставляет текст
+        self.prompt_combo.blockSignals(True)
+        self.prompt_combo.setCurrentIndex(row)
+        self.prompt_combo.blockSignals(False)
     
     def load_models(self):
         """Загрузка списка моделей"""
@@ -392,16 +1017,16 @@ class MainWindow(QMainWindow):
         auto_save = db.get_setting('auto_save_prompts', 'false')
         if auto_save.lower() == 'true' and not self.current_prompt_id:
             try:
-                self.current_prompt_id = db.create_prompt(prompt_text)
-                self.load_prompts()
+                self.current_prompt_id = db.get_or_create_prompt(prompt_text)
+                self.add_prompt_to_list(self.current_prompt_id)
             except Exception as e:
                 QMessageBox.warning(self, 'Предупреждение', f'Не удалось сохранить промт: {e}')
         
         # Если промт новый, создаем его
         if not self.current_prompt_id:
             try:
-                self.current_prompt_id = db.create_prompt(prompt_text)
-                self.load_prompts()
+                self.current_prompt_id = db.get_or_create_prompt(prompt_text)
+                self.add_prompt_to_list(self.current_prompt_id)
             except Exception as e:
                 QMessageBox.warning(self, 'Предупреждение', f'Не удалось сохранить промт: {e}')
         
@@ -412,20 +1037,9 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(0)
         self.statusBar.showMessage(f'Отправка запросов к {len(selected_models)} моделям...')
         
-        # Инициализация временной таблицы
-        self.temp_results = []
-        self.results_table.setRowCount(len(selected_models))
-        
-        # Добавление строк в таблицу
-        for i, model in enumerate(selected_models):
-            # Колонка 0: Выбрано (чекбокс)
-            checkbox = QCheckBox()
-            self.results_table.setCellWidget(i, 0, checkbox)
-            # Колонка 1: Модель
-            self.results_table.setItem(i, 1, QTableWidgetItem(model.name))
-            # Колонка 2: Ответ
-            self.results_table.setItem(i, 2, QTableWidgetItem('Загрузка...'))
-            self.results_table.item(i, 2).setFlags(self.results_table.item(i, 2).flags() & ~Qt.ItemIsEditable)
+        # Инициализация временной таблицы: по строке на каждую модель
+        max_length = int(db.get_setting('max_response_length', '5000'))
+        self.results_model.start(selected_models, max_length)
         
         # Отправка запросов в отдельных потоках
         self.workers = []
@@ -438,50 +1052,21 @@ class MainWindow(QMainWindow):
             worker.start()
     
     def on_request_finished(self, model_id: int, result: Dict):
-        """Обработчик завершения запроса"""
-        # Поиск строки с этой моделью
-        for i in range(self.results_table.rowCount()):
-            item = self.results_table.item(i, 1)  # Колонка "Модель"
-            if item:
-                model = models.get_model_by_id(model_id)
-                if model and item.text() == model.name:
-                    # Обновление ответа
-                    response_text = result.get('response_text', 'Ошибка')
-                    success = result.get('success', False)
-                    
-                    # Визуальное выделение ошибок
-                    # Не обрезаем текст для многострочного отображения
-                    response_item = QTableWidgetItem(response_text)
-                    if not success:
-                        response_item.setForeground(Qt.red)
-                    
-                    # Включаем перенос текста
-                    response_item.setTextAlignment(Qt.AlignTop | Qt.AlignLeft)
-                    
-                    # Устанавливаем максимальную длину только для tooltip
-                    max_length = int(db.get_setting('max_response_length', '5000'))
-                    if len(response_text) > max_length:
-                        response_item.setToolTip(response_text)  # Полный текст при наведении
-                    
-                    self.results_table.setItem(i, 2, response_item)  # Колонка "Ответ"
-                    self.results_table.item(i, 2).setFlags(
-                        self.results_table.item(i, 2).flags() & ~Qt.ItemIsEditable)
-                    
-                    # Автоматическая настройка высоты строки
-                    self.results_table.resizeRowToContents(i)
-                    
-                    # Сохранение во временную таблицу
-                    self.temp_results.append({
-                        'model_id': model_id,
-                        'response_text': result.get('response_text', ''),
-                        'metadata': result.get('metadata', {}),
-                        'success': success
-                    })
-                    
-                    # Обновление прогресса
-                    current_value = self.progress_bar.value()
-                    self.progress_bar.setValue(current_value + 1)
-                    break
+        """Обработчик завершения запроса: ответ применяется к таблице в ближайшем кадре"""
+        self.result_updates.post(model_id, result)
+    
+    def apply_request_results(self, events: list):
+        """Применение пакета завершенных запросов: (model_id, результат)"""
+        updated = 0
+        for model_id, result in events:
+            if self.results_model.set_result(model_id, result) is not None:
+                updated += 1
+                if result.get('success'):
+                    # HTML для окна просмотра готовится заранее, пока пользователь читает таблицу
+                    markdown_render.prerender(result.get('response_text', ''))
+        self.results_model.flush()
+        # Обновление прогресса
+        self.progress_bar.setValue(self.progress_bar.value() + updated)
         
         # Проверка завершения всех запросов
         if self.progress_bar.value() >= self.progress_bar.maximum():
@@ -490,8 +1075,9 @@ class MainWindow(QMainWindow):
             self.save_btn.setEnabled(True)
             
             # Подсчет успешных и неуспешных запросов
-            success_count = sum(1 for r in self.temp_results if r.get('success', False))
-            total_count = len(self.temp_results)
+            done_rows = self.results_model.done_rows()
+            success_count = sum(1 for row in done_rows if row.success)
+            total_count = len(done_rows)
             if success_count < total_count:
                 self.statusBar.showMessage(
                     f'Запросы завершены: {success_count} успешно, {total_count - success_count} с ошибками')
@@ -507,25 +1093,17 @@ class MainWindow(QMainWindow):
         saved_count = 0
         errors = []
         
-        for i in range(self.results_table.rowCount()):
-            checkbox = self.results_table.cellWidget(i, 0)  # Колонка "Выбрано"
-            if checkbox and checkbox.isChecked():
-                # Поиск соответствующего результата во временной таблице
-                model_name = self.results_table.item(i, 1).text()  # Колонка "Модель"
-                for temp_result in self.temp_results:
-                    model = models.get_model_by_id(temp_result['model_id'])
-                    if model and model.name == model_name:
-                        try:
-                            db.save_result(
-                                self.current_prompt_id,
-                                temp_result['model_id'],
-                                temp_result['response_text'],
-                                temp_result.get('metadata')
-                            )
-                            saved_count += 1
-                        except Exception as e:
-                            errors.append(f'{model_name}: {str(e)}')
-                        break
+        for row in self.results_model.checked_rows():
+            try:
+                db.save_result(
+                    self.current_prompt_id,
+                    row.model_id,
+                    row.response_text,
+                    row.metadata
+                )
+                saved_count += 1
+            except Exception as e:
+                errors.append(f'{row.model_name}: {str(e)}')
         
         if saved_count > 0:
             message = f'Сохранено результатов: {saved_count}'
@@ -543,38 +1121,39 @@ class MainWindow(QMainWindow):
         """Обработчик изменения выделения в таблице результатов"""
         self.update_open_button_state()
     
-    def on_result_cell_clicked(self, row: int, column: int):
+    def on_result_cell_clicked(self, index):
         """Обработчик клика по ячейке в таблице результатов"""
         self.update_open_button_state()
     
+    def resize_result_rows(self, first: int, last: int):
+        """Подгонка высоты строк, в которых пришли ответы"""
+        for row in range(first, last + 1):
+            self.results_table.resizeRowToContents(row)
+        self.update_open_button_state()
+    
     def update_open_button_state(self):
         """Обновление состояния кнопки "Открыть" на основе выделения"""
-        selected_items = self.results_table.selectedItems()
-        if selected_items:
-            # Проверяем, выделена ли колонка "Ответ" (колонка 2)
-            for item in selected_items:
-                if item.column() == 2:  # Колонка "Ответ"
-                    # Проверяем, что в ячейке есть ответ (не "Загрузка...")
-                    if item.text() and item.text() != 'Загрузка...':
-                        self.open_btn.setEnabled(True)
-                        return
-            # Если выделена другая колонка, отключаем кнопку
-            self.open_btn.setEnabled(False)
-        else:
-            self.open_btn.setEnabled(False)
+        # Кнопка активна, если выделена ячейка колонки "Ответ" (колонка 2) с полученным ответом
+        for index in self.results_table.selectionModel().selectedIndexes():
+            if index.column() == LiveResultsModel.COLUMN_RESPONSE:
+                row = self.results_model.record(index.row())
+                if row and row.done and row.response_text:
+                    self.open_btn.setEnabled(True)
+                    return
+        self.open_btn.setEnabled(False)
     
     def open_selected_response(self):
         """Открыть диалог с форматированным ответом для выделенной ячейки в колонке "Ответ" """
-        selected_items = self.results_table.selectedItems()
-        if not selected_items:
+        selected_indexes = self.results_table.selectionModel().selectedIndexes()
+        if not selected_indexes:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите ячейку с ответом в колонке "Ответ"')
             return
         
         # Ищем выделенную ячейку в колонке "Ответ" (колонка 2)
         row = None
-        for item in selected_items:
-            if item.column() == 2:  # Колонка "Ответ"
-                row = item.row()
+        for index in selected_indexes:
+            if index.column() == LiveResultsModel.COLUMN_RESPONSE:
+                row = index.row()
                 break
         
         if row is None:
@@ -592,8 +1171,8 @@ class MainWindow(QMainWindow):
                 worker.wait()
         self.workers = []
         
-        self.temp_results = []
-        self.results_table.setRowCount(0)
+        self.result_updates.clear()
+        self.results_model.clear()
         self.save_btn.setEnabled(False)
         self.open_btn.setEnabled(False)
         self.progress_bar.setVisible(False)
@@ -622,29 +1201,215 @@ class MainWindow(QMainWindow):
         window = ResultsWindow(self)
         window.exec_()
     
+    def show_metrics_window(self):
+        """Показать окно статистики производительности"""
+        window = MetricsWindow(self)
+        window.exec_()
+    
+    def init_idle_maintenance(self):
+        """Периодическая проверка простоя для фонового обслуживания БД"""
+        self.last_activity = time.monotonic()
+        QApplication.instance().installEventFilter(self)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.timeout.connect(self.check_idle_maintenance)
+        self.idle_timer.start(self.IDLE_CHECK_INTERVAL_MS)
+    
+    def eventFilter(self, obj, event):
+        # Любой ввод пользователя сбрасывает отсчет простоя
+        if event.type() in (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.Wheel):
+            self.last_activity = time.monotonic()
+        return super().eventFilter(obj, event)
+    
+    def check_idle_maintenance(self):
+        """Запуск обслуживания, если пользователь бездействует и запросы не выполняются"""
+        if self.maintenance_worker is not None and self.maintenance_worker.isRunning():
+            return
+        if any(worker.isRunning() for worker in self.workers):
+            return
+        if time.monotonic() - self.last_activity < self.IDLE_SECONDS:
+            return
+        try:
+            if not maintenance.is_due():
+                return
+        except Exception:
+            return
+        self.start_maintenance('idle')
+    
+    def start_maintenance(self, trigger: str):
+        """Запуск обслуживания БД в фоновом потоке"""
+        if self.maintenance_worker is not None and self.maintenance_worker.isRunning():
+            return
+        self.maintenance_manual = trigger == 'manual'
+        self.maintenance_worker = MaintenanceWorker(trigger)
+        self.maintenance_worker.finished.connect(self.on_maintenance_finished)
+        self.maintenance_worker.start()
+        self.statusBar.showMessage('Обслуживание базы данных...')
+    
+    def on_maintenance_finished(self, report: dict):
+        if 'error' in report:
+            self.statusBar.showMessage('Ошибка обслуживания БД')
+            if self.maintenance_manual:
+                QMessageBox.critical(self, 'Ошибка', f"Не удалось выполнить обслуживание БД:\n{report['error']}")
+            return
+        self.statusBar.showMessage(
+            f"Обслуживание БД: {report['duration']:.1f} с, освобождено {report['reclaimed_bytes'] // 1024} КБ")
+        if self.maintenance_manual:
+            QMessageBox.information(self, 'Обслуживание базы данных', maintenance.format_report(report))
+    
+    def closeEvent(self, event):
+        # Дожидаемся завершения обслуживания, копирования, импорта и архивирования, чтобы не прерывать запись в БД
+        for worker in (self.maintenance_worker, self.backup_worker, self.import_worker, self.archive_worker):
+            if worker is not None and worker.isRunning():
+                worker.wait()
+        super().closeEvent(event)
+    
+    def backup_database(self):
+        """Создание снимка БД в фоновом потоке"""
+        from PyQt5.QtWidgets import QFileDialog
+        import backup
+        filters = {'gzip': 'Сжатый снимок (*.db.gz)', 'none': 'База данных SQLite (*.db)'}
+        if 'zstd' in backup.available_compressions():
+            filters['zstd'] = 'Сжатый снимок zstd (*.db.zst)'
+        filename, selected_filter = QFileDialog.getSaveFileName(
+            self, 'Резервная копия БД', backup.default_backup_name('gzip'), ';;'.join(filters.values()))
+        if not filename:
+            return
+        compression = next((key for key, value in filters.items() if value == selected_filter), 'gzip')
+        extension = '.db' + backup.COMPRESSION_EXTENSIONS.get(compression, '')
+        if not filename.endswith(extension):
+            filename = filename.rsplit('.db', 1)[0] + extension
+        self.run_backup_worker(BackupWorker('backup', filename, compression), 'Создание резервной копии...')
+    
+    def restore_database(self):
+        """Восстановление БД из снимка"""
+        from PyQt5.QtWidgets import QFileDialog
+        filename, _ = QFileDialog.getOpenFileName(
+            self, 'Восстановить БД из копии', '', 'Снимки БД (*.db *.db.gz *.db.zst);;Все файлы (*)')
+        if not filename:
+            return
+        reply = QMessageBox.question(
+            self, 'Восстановление БД',
+            'Текущие данные будут заменены данными из копии.\n'
+            'Перед восстановлением текущая БД будет сохранена рядом с файлом БД. Продолжить?',
+            QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self.run_backup_worker(BackupWorker('restore', filename), 'Восстановление БД...')
+    
+    def run_backup_worker(self, worker: 'BackupWorker', title: str):
+        """Запуск копирования с окном прогресса (GUI не блокируется)"""
+        from PyQt5.QtWidgets import QProgressDialog
+        progress_dialog = QProgressDialog(title, None, 0, 100, self)
+        progress_dialog.setWindowTitle('ChatList')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        worker.progress.connect(lambda done, total: progress_dialog.setValue(done * 100 // max(total, 1)))
+        worker.finished.connect(lambda report: self.on_backup_finished(worker, progress_dialog, report))
+        self.backup_worker = worker
+        worker.start()
+    
+    def on_backup_finished(self, worker: 'BackupWorker', progress_dialog, report: dict):
+        progress_dialog.close()
+        if 'error' in report:
+            QMessageBox.critical(self, 'Ошибка', f"Операция не выполнена:\n{report['error']}")
+            return
+        if worker.mode == 'restore':
+            self.load_prompts()
+            self.load_models()
+            message = f"БД восстановлена из {report['path']}"
+            if report['partitions']:
+                message += f"\nВосстановлено архивных разделов: {report['partitions']}"
+            if report['safety_copy']:
+                message += f"\nПредыдущая БД сохранена в {report['safety_copy']}"
+            QMessageBox.information(self, 'Восстановление БД', message)
+        else:
+            message = (f"Снимок сохранен: {report['path']}\n"
+                       f"Размер: {report['size'] / 1024:.0f} КБ (БД {report['db_size'] / 1024:.0f} КБ), "
+                       f"{report['duration']:.1f} с")
+            if report['archive_path']:
+                message += f"\nАрхивные разделы ({report['partitions']}): {report['archive_path']}"
+            if report['missing_partitions']:
+                QMessageBox.warning(
+                    self, 'Резервная копия БД',
+                    message + '\n\nФайлы архивных разделов не найдены и не скопированы:\n'
+                    + ', '.join(report['missing_partitions']))
+                return
+            QMessageBox.information(self, 'Резервная копия БД', message)
+    
+    def import_data(self):
+        """Пакетный импорт из JSONL или CSV в фоновом потоке"""
+        from PyQt5.QtWidgets import QFileDialog, QProgressDialog
+        filename, _ = QFileDialog.getOpenFileName(
+            self, 'Импорт промтов и результатов', '', 'JSONL и CSV (*.jsonl *.ndjson *.csv)')
+        if not filename:
+            return
+        progress_dialog = QProgressDialog('Импорт...', None, 0, 0, self)
+        progress_dialog.setWindowTitle('Импорт')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+        worker = ImportWorker(filename)
+        worker.progress.connect(lambda count: progress_dialog.setLabelText(f'Прочитано записей: {count}'))
+        worker.finished.connect(lambda report: self.on_import_finished(progress_dialog, report))
+        self.import_worker = worker
+        worker.start()
+    
+    def on_import_finished(self, progress_dialog, report: dict):
+        import importers
+        progress_dialog.close()
+        if 'error' in report:
+            QMessageBox.critical(self, 'Ошибка', f"Импорт не выполнен:\n{report['error']}")
+            return
+        self.load_prompts()
+        self.load_models()
+        QMessageBox.information(self, 'Импорт', importers.format_report(report))
+    
+    def archive_old_results(self):
+        """Перенос старых результатов в помесячные архивные разделы (в фоновом потоке)"""
+        from PyQt5.QtWidgets import QInputDialog, QProgressDialog
+        if self.archive_worker is not None and self.archive_worker.isRunning():
+            return
+        days, ok = QInputDialog.getInt(self, 'Архивирование результатов',
+                                       'Переносить в архив результаты старше (дней):', 180, 1, 3650)
+        if not ok:
+            return
+        cutoff_ts = db.now_ms() - days * 86400 * 1000
+        count = sum(item['count'] for item in db.get_archive_candidates(cutoff_ts))
+        if count == 0:
+            QMessageBox.information(self, 'Архивирование', 'Нет результатов для архивирования')
+            return
+        reply = QMessageBox.question(self, 'Архивирование',
+                                     f'Перенести в архив {count} результатов старше {days} дней?\n'
+                                     f'Они останутся доступны при просмотре за соответствующий период.',
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        progress_dialog = QProgressDialog('Архивирование результатов...', None, 0, count, self)
+        progress_dialog.setWindowTitle('Архивирование')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+        worker = ArchiveWorker(cutoff_ts)
+        worker.progress.connect(lambda moved: progress_dialog.setValue(min(moved, count)))
+        worker.finished.connect(lambda report: self.on_archive_finished(progress_dialog, report))
+        self.archive_worker = worker
+        worker.start()
+    
+    def on_archive_finished(self, progress_dialog, report: dict):
+        progress_dialog.close()
+        if 'error' in report:
+            QMessageBox.critical(self, 'Ошибка', f"Не удалось архивировать результаты:\n{report['error']}")
+            return
+        self.statusBar.showMessage(
+            f"Перенесено в архив: {report['moved']} ({', '.join(report['partitions'])})")
+    
     def open_response_dialog(self, row: int):
         """Открыть диалог с форматированным ответом в Markdown"""
         try:
-            # Получение данных из таблицы
-            model_name_item = self.results_table.item(row, 1)  # Колонка "Модель"
-            response_item = self.results_table.item(row, 2)  # Колонка "Ответ"
-            
-            if not model_name_item or not response_item:
+            # Полный текст ответа хранится в строке модели
+            result = self.results_model.record(row)
+            if not result or not result.done:
                 return
-            
-            model_name = model_name_item.text()
-            
-            # Поиск полного текста ответа во временной таблице
-            response_text = ""
-            for temp_result in self.temp_results:
-                model = models.get_model_by_id(temp_result['model_id'])
-                if model and model.name == model_name:
-                    response_text = temp_result.get('response_text', '')
-                    break
-            
-            # Если не нашли во временной таблице, берем из ячейки
-            if not response_text:
-                response_text = response_item.text()
+            model_name = result.model_name
+            response_text = result.response_text
             
             # Создание и показ диалога с форматированным Markdown
             dialog = ResponseViewDialog(self, model_name, response_text)
@@ -662,188 +1427,13 @@ class MainWindow(QMainWindow):
     
     def apply_settings(self):
         """Применить сохраненные настройки"""
-        # Применение темы
-        theme = db.get_setting('theme', 'light')
-        self.apply_theme(theme)
-        
-        # Применение размера шрифта
-        font_size = db.get_setting('font_size', '10')
+        # Тема и размер шрифта применяются к приложению одной таблицей стилей и только при изменении
+        theme = db.get_setting('theme', themes.DEFAULT_THEME)
         try:
-            font_size_int = int(font_size)
-            self.apply_font_size(font_size_int)
+            font_size = int(db.get_setting('font_size', str(themes.DEFAULT_FONT_SIZE)))
         except ValueError:
-            pass
-    
-    def apply_theme(self, theme: str):
-        """Применить тему (light/dark)"""
-        if theme == 'dark':
-            dark_stylesheet = """
-                QMainWindow {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QWidget {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QGroupBox {
-                    border: 1px solid #555555;
-                    border-radius: 5px;
-                    margin-top: 10px;
-                    padding-top: 10px;
-                    font-weight: bold;
-                }
-                QGroupBox::title {
-                    subcontrol-origin: margin;
-                    left: 10px;
-                    padding: 0 5px;
-                }
-                QTextEdit, QLineEdit {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                    padding: 5px;
-                }
-                QPushButton {
-                    background-color: #404040;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                    padding: 5px 15px;
-                }
-                QPushButton:hover {
-                    background-color: #505050;
-                }
-                QPushButton:pressed {
-                    background-color: #353535;
-                }
-                QPushButton:disabled {
-                    background-color: #2b2b2b;
-                    color: #888888;
-                }
-                QComboBox {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                    padding: 5px;
-                }
-                QComboBox:hover {
-                    background-color: #454545;
-                }
-                QComboBox::drop-down {
-                    border: none;
-                }
-                QComboBox QAbstractItemView {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    selection-background-color: #505050;
-                }
-                QTableWidget {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                    gridline-color: #555555;
-                    border: 1px solid #555555;
-                }
-                QTableWidget::item {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QTableWidget::item:selected {
-                    background-color: #505050;
-                    color: #ffffff;
-                }
-                QHeaderView::section {
-                    background-color: #404040;
-                    color: #ffffff;
-                    padding: 5px;
-                    border: 1px solid #555555;
-                }
-                QCheckBox {
-                    color: #ffffff;
-                }
-                QCheckBox::indicator {
-                    background-color: #3c3c3c;
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                }
-                QCheckBox::indicator:checked {
-                    background-color: #0078d4;
-                }
-                QLabel {
-                    color: #ffffff;
-                }
-                QProgressBar {
-                    border: 1px solid #555555;
-                    border-radius: 3px;
-                    text-align: center;
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                }
-                QProgressBar::chunk {
-                    background-color: #0078d4;
-                }
-                QStatusBar {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QMenuBar {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QMenuBar::item {
-                    background-color: transparent;
-                }
-                QMenuBar::item:selected {
-                    background-color: #505050;
-                }
-                QMenu {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                }
-                QMenu::item:selected {
-                    background-color: #505050;
-                }
-                QDialog {
-                    background-color: #2b2b2b;
-                    color: #ffffff;
-                }
-                QTabWidget::pane {
-                    border: 1px solid #555555;
-                    background-color: #2b2b2b;
-                }
-                QTabBar::tab {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                    padding: 5px 15px;
-                }
-                QTabBar::tab:selected {
-                    background-color: #505050;
-                }
-                QListWidget {
-                    background-color: #3c3c3c;
-                    color: #ffffff;
-                    border: 1px solid #555555;
-                }
-                QListWidget::item:selected {
-                    background-color: #505050;
-                }
-            """
-            self.setStyleSheet(dark_stylesheet)
-        else:  # light theme
-            self.setStyleSheet("")  # Сброс к стандартной теме
-    
-    def apply_font_size(self, font_size: int):
-        """Применить размер шрифта"""
-        font = self.font()
-        font.setPointSize(font_size)
-        self.setFont(font)
-        # Применяем шрифт ко всем виджетам
-        for widget in self.findChildren(QWidget):
-            widget.setFont(font)
+            font_size = None
+        themes.apply(QApplication.instance(), theme, font_size)
     
     def show_about(self):
         """Показать информацию о программе"""
@@ -945,6 +1535,83 @@ class SettingsWindow(QDialog):
         self.accept()
 
 
+class DateRangeDialog(QDialog):
+    """Диалог выбора произвольного периода"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Произвольный период')
+        self.setModal(True)
+        
+        layout = QFormLayout()
+        self.setLayout(layout)
+        
+        now = QDateTime.currentDateTime()
+        self.since_edit = QDateTimeEdit(now.addDays(-1))
+        self.since_edit.setCalendarPopup(True)
+        self.since_edit.setDisplayFormat('yyyy-MM-dd HH:mm')
+        layout.addRow('С:', self.since_edit)
+        self.until_edit = QDateTimeEdit(now)
+        self.until_edit.setCalendarPopup(True)
+        self.until_edit.setDisplayFormat('yyyy-MM-dd HH:mm')
+        layout.addRow('По:', self.until_edit)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+    
+    def get_range(self) -> tuple:
+        """Диапазон [since, until) в миллисекундах"""
+        return (self.since_edit.dateTime().toMSecsSinceEpoch(),
+                self.until_edit.dateTime().toMSecsSinceEpoch())
+
+
+class PeriodFilter(QComboBox):
+    """Выпадающий список периода для фильтрации по времени"""
+    periodChanged = pyqtSignal()
+    
+    PERIODS = [
+        ('За все время', None),
+        ('Последний час', 3600),
+        ('Последние сутки', 86400),
+        ('Последняя неделя', 7 * 86400),
+        ('Последний месяц', 30 * 86400),
+    ]
+    CUSTOM = 'custom'
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        for title, window in self.PERIODS:
+            self.addItem(title, window)
+        self.addItem('Произвольный период...', self.CUSTOM)
+        self.custom_range = (None, None)
+        self.last_index = 0
+        self.activated.connect(self.on_activated)
+    
+    def on_activated(self, index: int):
+        if self.itemData(index) == self.CUSTOM:
+            dialog = DateRangeDialog(self)
+            if dialog.exec_() != QDialog.Accepted:
+                self.setCurrentIndex(self.last_index)
+                return
+            self.custom_range = dialog.get_range()
+            since, until = self.custom_range
+            self.setItemText(index, f'{db.format_ts(since, "%Y-%m-%d %H:%M")} — {db.format_ts(until, "%Y-%m-%d %H:%M")}')
+        elif index == self.last_index:
+            return
+        self.last_index = index
+        self.periodChanged.emit()
+    
+    def get_range(self) -> tuple:
+        """Выбранный диапазон (since, until) в миллисекундах, None - без ограничения"""
+        window = self.currentData()
+        if window == self.CUSTOM:
+            return self.custom_range
+        if window is None:
+            return (None, None)
+        return (db.now_ms() - window * 1000, None)
+
+
 class PromptsWindow(QDialog):
     """Окно управления промтами"""
     def __init__(self, parent=None):
@@ -953,6 +1620,10 @@ class PromptsWindow(QDialog):
         self.setModal(True)
         self.resize(800, 600)
         self.all_prompts = []
+        # Последний выполненный поиск: (строка поиска, найденные промты) - для уточнения
+        self.last_filter = ('', [])
+        self.search = BackgroundSearch(self)
+        self.search.resultsReady.connect(self.on_prompts_filtered)
         self.init_ui()
         self.load_prompts()
     
@@ -965,14 +1636,41 @@ class PromptsWindow(QDialog):
         search_layout.addWidget(QLabel('Поиск:'))
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('Введите текст для поиска...')
-        self.search_input.textChanged.connect(self.filter_prompts)
+        self.search_input.textChanged.connect(lambda: self.filter_prompts(immediate=False))
         search_layout.addWidget(self.search_input)
+        search_layout.addWidget(QLabel('Период:'))
+        self.period_filter = PeriodFilter()
+        self.period_filter.periodChanged.connect(self.load_prompts)
+        search_layout.addWidget(self.period_filter)
         layout.addLayout(search_layout)
         
+        # Фильтр по тегам
+        tags_layout = QHBoxLayout()
+        tags_layout.addWidget(QLabel('Теги:'))
+        self.tags_filter = QComboBox()
+        self.tags_filter.setEditable(True)
+        self.tags_filter.lineEdit().setPlaceholderText('Теги через запятую...')
+        self.tags_filter.lineEdit().editingFinished.connect(self.load_prompts)
+        self.tags_filter.activated.connect(self.on_tag_selected)
+        tags_layout.addWidget(self.tags_filter, 1)
+        self.tags_mode_combo = QComboBox()
+        self.tags_mode_combo.addItem('Любой из тегов', 'any')
+        self.tags_mode_combo.addItem('Все теги', 'all')
+        self.tags_mode_combo.currentIndexChanged.connect(self.load_prompts)
+        tags_layout.addWidget(self.tags_mode_combo)
+        layout.addLayout(tags_layout)
+        
         # Таблица промтов
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(['ID', 'Дата', 'Промт', 'Теги'])
+        self.model = RecordTableModel([
+            ('ID', lambda p: str(p['id']), lambda p: p['id']),
+            ('Дата', lambda p: db.format_ts(p['created_ts']), lambda p: p['created_ts'] or 0),
+            ('Промт', lambda p: p['prompt'], lambda p: p['prompt']),
+            ('Теги', lambda p: p.get('tags') or '', lambda p: p.get('tags') or ''),
+        ], self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         self.table.setAlternatingRowColors(True)
@@ -1007,24 +1705,70 @@ class PromptsWindow(QDialog):
         layout.addLayout(buttons_layout)
     
     def load_prompts(self):
-        self.all_prompts = db.get_prompts()
+        tags = self.tags_filter.currentText().strip()
+        since, until = self.period_filter.get_range()
+        self.all_prompts = db.get_prompts(tags=tags or None, tags_mode=self.tags_mode_combo.currentData(),
+                                          since=since, until=until)
+        # Текст для поиска приводится к нижнему регистру один раз при загрузке, а не на каждое нажатие
+        for prompt in self.all_prompts:
+            prompt['search_key'] = f"{prompt['prompt']}\n{prompt.get('tags') or ''}".casefold()
+        self.last_filter = ('', self.all_prompts)
+        self.load_tag_list()
         self.filter_prompts()
     
-    def filter_prompts(self):
-        search_text = self.search_input.text().lower()
-        if search_text:
-            filtered = [p for p in self.all_prompts 
-                       if search_text in p['prompt'].lower() or 
-                          search_text in (p.get('tags', '') or '').lower()]
+    def load_tag_list(self):
+        """Заполнение списка тегов с количеством промтов"""
+        current_text = self.tags_filter.currentText()
+        self.tags_filter.blockSignals(True)
+        self.tags_filter.clear()
+        for tag in db.get_tag_counts():
+            self.tags_filter.addItem(f"{tag['name']} ({tag['prompt_count']})", tag['name'])
+        self.tags_filter.setCurrentIndex(-1)
+        self.tags_filter.setEditText(current_text)
+        self.tags_filter.blockSignals(False)
+    
+    def on_tag_selected(self, index: int):
+        """Выбор тега из списка: в поле подставляется имя тега без счетчика"""
+        self.tags_filter.setEditText(self.tags_filter.itemData(index) or '')
+        self.load_prompts()
+    
+    def filter_prompts(self, immediate: bool = True):
+        """Фильтр загруженных промтов по тексту и тегам в рабочем потоке"""
+        search_text = self.search_input.text().casefold()
+        if not search_text:
+            self.search.cancel()
+            self.on_prompts_filtered(self.all_prompts, '')
+            return
+        # Если запрос дополняет предыдущий, достаточно отфильтровать уже найденные промты
+        last_text, last_found = self.last_filter
+        candidates = last_found if last_text and search_text.startswith(last_text) else self.all_prompts
+        
+        def search_func(cancel_event):
+            found = []
+            for i, prompt in enumerate(candidates):
+                if i % 5000 == 0 and cancel_event.is_set():
+                    return None
+                if search_text in prompt['search_key']:
+                    found.append(prompt)
+            return found
+        
+        if immediate:
+            self.search.run_now(search_func, search_text)
         else:
-            filtered = self.all_prompts
-        
-        self.table.setRowCount(len(filtered))
-        for i, prompt in enumerate(filtered):
-            self.table.setItem(i, 0, QTableWidgetItem(str(prompt['id'])))
-            self.table.setItem(i, 1, QTableWidgetItem(prompt['date']))
-            self.table.setItem(i, 2, QTableWidgetItem(prompt['prompt']))
-            self.table.setItem(i, 3, QTableWidgetItem(prompt.get('tags', '')))
+            self.search.schedule(search_func, search_text)
+    
+    def on_prompts_filtered(self, prompts: list, search_text: str):
+        self.last_filter = (search_text, prompts)
+        self.model.set_records(prompts)
+    
+    def selected_prompt_id(self) -> Optional[int]:
+        """ID промта в текущей строке таблицы"""
+        prompt = self.model.record(self.table.currentIndex().row())
+        return prompt['id'] if prompt else None
+    
+    def done(self, result: int):
+        self.search.shutdown()
+        super().done(result)
     
     def create_prompt(self):
         """Создание нового промта"""
@@ -1033,20 +1777,22 @@ class PromptsWindow(QDialog):
             prompt_text, tags = dialog.get_values()
             if prompt_text:
                 try:
-                    db.create_prompt(prompt_text, tags if tags else None)
+                    _, created = db.create_prompt(prompt_text, tags if tags else None)
                     self.load_prompts()
-                    QMessageBox.information(self, 'Успех', 'Промт создан')
+                    if created:
+                        QMessageBox.information(self, 'Успех', 'Промт создан')
+                    else:
+                        QMessageBox.information(self, 'Информация',
+                                                'Промт уже существует' + (', теги добавлены' if tags else ''))
                 except Exception as e:
                     QMessageBox.critical(self, 'Ошибка', f'Не удалось создать промт:\n{e}')
     
     def edit_prompt(self):
         """Редактирование выбранного промта"""
-        row = self.table.currentRow()
-        if row < 0:
+        prompt_id = self.selected_prompt_id()
+        if prompt_id is None:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите промт для редактирования')
             return
-        
-        prompt_id = int(self.table.item(row, 0).text())
         prompt_data = db.get_prompt_by_id(prompt_id)
         
         if not prompt_data:
@@ -1066,12 +1812,10 @@ class PromptsWindow(QDialog):
     
     def view_prompt(self):
         """Просмотр полного текста промта"""
-        row = self.table.currentRow()
-        if row < 0:
+        prompt_id = self.selected_prompt_id()
+        if prompt_id is None:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите промт для просмотра')
             return
-        
-        prompt_id = int(self.table.item(row, 0).text())
         prompt_data = db.get_prompt_by_id(prompt_id)
         
         if not prompt_data:
@@ -1088,7 +1832,7 @@ class PromptsWindow(QDialog):
         view_dialog.setLayout(layout)
         
         # Информация о промте
-        info_label = QLabel(f'<b>Дата:</b> {prompt_data["date"]}<br><b>Теги:</b> {prompt_data.get("tags", "")}')
+        info_label = QLabel(f'<b>Дата:</b> {db.format_ts(prompt_data["created_ts"])}<br><b>Теги:</b> {prompt_data.get("tags", "")}')
         layout.addWidget(info_label)
         
         # Текст промта
@@ -1106,12 +1850,10 @@ class PromptsWindow(QDialog):
     
     def delete_prompt(self):
         """Удаление выбранного промта"""
-        row = self.table.currentRow()
-        if row < 0:
+        prompt_id = self.selected_prompt_id()
+        if prompt_id is None:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите промт для удаления')
             return
-        
-        prompt_id = int(self.table.item(row, 0).text())
         reply = QMessageBox.question(self, 'Подтверждение', 
                                     f'Удалить промт #{prompt_id}?',
                                     QMessageBox.Yes | QMessageBox.No)
@@ -1288,12 +2030,23 @@ class ModelDialog(QDialog):
 
 class ResultsWindow(QDialog):
     """Окно просмотра сохраненных результатов"""
+    PAGE_SIZE = 200  # Количество строк, загружаемых за один раз
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('Сохраненные результаты')
         self.setModal(True)
         self.resize(1000, 600)
-        self.all_results = []
+        self.has_more_results = False
+        self.loading_more = False  # Следующая страница поиска загружается в рабочем потоке
+        # Запрос отображаемого списка: (строка поиска, since, until) и курсор (saved_ts, id) для догрузки
+        self.current_query = ('', None, None)
+        self.page_cursor = None
+        # Последний поиск, найденный целиком: (строка поиска, since, until, ID) - для уточнения
+        self.last_search = None
+        self.search = BackgroundSearch(self)
+        self.search.resultsReady.connect(self.on_results_found)
+        self.search.failed.connect(self.on_search_failed)
         self.init_ui()
         self.load_results()
     
@@ -1306,21 +2059,32 @@ class ResultsWindow(QDialog):
         search_layout.addWidget(QLabel('Поиск:'))
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText('Введите текст для поиска...')
-        self.search_input.textChanged.connect(self.filter_results)
+        self.search_input.textChanged.connect(lambda: self.load_results(immediate=False))
         search_layout.addWidget(self.search_input)
+        search_layout.addWidget(QLabel('Период:'))
+        self.period_filter = PeriodFilter()
+        self.period_filter.periodChanged.connect(self.load_results)
+        search_layout.addWidget(self.period_filter)
         layout.addLayout(search_layout)
         
         # Таблица результатов
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(['ID', 'Промт', 'Модель', 'Ответ', 'Дата'])
+        self.model = RecordTableModel([
+            ('ID', lambda r: str(r['id']), lambda r: r['id']),
+            ('Промт', lambda r: r.get('prompt') or '', lambda r: r.get('prompt') or ''),
+            ('Модель', lambda r: r.get('model_name') or '', lambda r: r.get('model_name') or ''),
+            ('Ответ', lambda r: r.get('preview') or '', lambda r: r.get('preview') or ''),
+            ('Дата', lambda r: db.format_ts(r.get('saved_ts')), lambda r: r.get('saved_ts') or 0),
+        ], self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
         self.table.setAlternatingRowColors(True)
         self.table.setSortingEnabled(True)  # Включение сортировки
         # Обработчик выделения для активации кнопки "Открыть"
-        self.table.itemSelectionChanged.connect(self.on_result_selection_changed)
-        self.table.cellClicked.connect(self.on_result_cell_clicked)
+        self.table.selectionModel().selectionChanged.connect(self.on_result_selection_changed)
+        self.table.clicked.connect(self.on_result_cell_clicked)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_table_scrolled)
         layout.addWidget(self.table)
         
         # Кнопки
@@ -1339,6 +2103,14 @@ class ResultsWindow(QDialog):
         export_json_btn.clicked.connect(lambda: self.export_results('json'))
         buttons_layout.addWidget(export_json_btn)
         
+        export_jsonl_btn = QPushButton('Экспорт JSONL')
+        export_jsonl_btn.clicked.connect(lambda: self.export_results('jsonl'))
+        buttons_layout.addWidget(export_jsonl_btn)
+        
+        export_csv_btn = QPushButton('Экспорт CSV')
+        export_csv_btn.clicked.connect(lambda: self.export_results('csv'))
+        buttons_layout.addWidget(export_csv_btn)
+        
         buttons_layout.addStretch()
         
         delete_btn = QPushButton('Удалить')
@@ -1351,117 +2123,189 @@ class ResultsWindow(QDialog):
         
         layout.addLayout(buttons_layout)
     
-    def load_results(self):
-        self.all_results = db.get_results()
-        self.filter_results()
-    
-    def filter_results(self):
-        search_text = self.search_input.text().lower()
-        if search_text:
-            filtered = [r for r in self.all_results 
-                       if search_text in (r.get('prompt', '') or '').lower() or
-                          search_text in (r.get('model_name', '') or '').lower() or
-                          search_text in (r.get('response_text', '') or '').lower()]
+    def load_results(self, immediate: bool = True):
+        """Загрузка первой страницы списка; поиск по полным текстам выполняется в рабочем потоке"""
+        search_text = self.search_input.text().strip()
+        since, until = self.period_filter.get_range()
+        query = (search_text, since, until)
+        if not search_text:
+            # Без поиска страница читается по индексу и не требует рабочего потока
+            self.search.cancel()
+            self.show_results(db.get_result_list(limit=self.PAGE_SIZE, since=since, until=until), query)
+            return
+        
+        # Если запрос дополняет предыдущий, найденный целиком, ищем только среди его результатов
+        ids = None
+        if self.last_search:
+            last_text, last_since, last_until, last_ids = self.last_search
+            if (last_since, last_until) == (since, until) and search_text.casefold().startswith(last_text.casefold()):
+                ids = last_ids
+        if ids is not None and not ids:
+            self.search.cancel()
+            self.show_results([], query)
+            return
+        
+        def search_func(cancel_event):
+            return db.get_result_list(search=search_text, limit=self.PAGE_SIZE, since=since, until=until,
+                                      ids=ids, cancel_event=cancel_event)
+        
+        if immediate:
+            self.search.run_now(search_func, (query, False))
+        else:
+            self.search.schedule(search_func, (query, False))
+    
+    def on_results_found(self, page: list, context: tuple):
+        query, more = context
+        if more:
+            self.append_results(page, query)
         else:
-            filtered = self.all_results
-        
-        self.table.setRowCount(len(filtered))
-        for i, result in enumerate(filtered):
-            self.table.setItem(i, 0, QTableWidgetItem(str(result['id'])))
-            self.table.setItem(i, 1, QTableWidgetItem(result.get('prompt', '')[:50]))
-            self.table.setItem(i, 2, QTableWidgetItem(result.get('model_name', '')))
-            response = result.get('response_text', '')
-            max_len = 100
-            if len(response) > max_len:
-                response = response[:max_len] + '...'
-            self.table.setItem(i, 3, QTableWidgetItem(response))
-            self.table.setItem(i, 4, QTableWidgetItem(result.get('saved_date', '')))
+            self.show_results(page, query)
+    
+    def on_search_failed(self, error: str):
+        self.loading_more = False
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка поиска: {error}')
+    
+    def show_results(self, page: list, query: tuple):
+        """Показ первой страницы списка"""
+        search_text, since, until = query
+        self.current_query = query
+        self.loading_more = False
+        self.has_more_results = len(page) == self.PAGE_SIZE
+        self.page_cursor = (page[-1]['saved_ts'], page[-1]['id']) if page else None
+        if search_text and not self.has_more_results:
+            self.last_search = (search_text, since, until, [result['id'] for result in page])
+        elif not search_text:
+            self.last_search = None
+        self.model.set_records(page)
+        self.update_open_button_state()
+    
+    def load_more_results(self):
+        """Догрузка следующей страницы списка"""
+        if not self.has_more_results or self.page_cursor is None or self.loading_more:
+            return
+        query = self.current_query
+        search_text, since, until = query
+        before = self.page_cursor
+        # В памяти хранятся только загруженные строки списка, без полных ответов
+        if not search_text:
+            self.append_results(db.get_result_list(limit=self.PAGE_SIZE, before=before,
+                                                   since=since, until=until), query)
+            return
+        if self.search.pending is not None:
+            return  # Ожидает новый поиск: его первая страница заменит список
+        
+        # Поиск читает полные тексты ответов: страница ищется в рабочем потоке,
+        # как и первая, и отбрасывается, если запрос успел смениться
+        def search_func(cancel_event):
+            return db.get_result_list(search=search_text, limit=self.PAGE_SIZE, before=before,
+                                      since=since, until=until, cancel_event=cancel_event)
+        
+        self.loading_more = True
+        self.search.run_now(search_func, (query, True))
+    
+    def append_results(self, page: list, query: tuple):
+        """Добавление следующей страницы к списку"""
+        self.loading_more = False
+        if query != self.current_query:
+            return
+        self.has_more_results = len(page) == self.PAGE_SIZE
+        if page:
+            self.page_cursor = (page[-1]['saved_ts'], page[-1]['id'])
+        self.model.append_records(page)
+    
+    def on_table_scrolled(self, value: int):
+        """Догрузка списка при прокрутке до конца"""
+        if value >= self.table.verticalScrollBar().maximum():
+            self.load_more_results()
     
     def export_results(self, format_type: str):
-        """Экспорт результатов в Markdown или JSON"""
-        from PyQt5.QtWidgets import QFileDialog
-        import json
-        from datetime import datetime
+        """Экспорт результатов текущего фильтра (поиск и период) в фоновом потоке"""
+        from PyQt5.QtWidgets import QFileDialog, QProgressDialog
+        import exporters
         
-        if not self.all_results:
+        if not self.model.records:
             QMessageBox.warning(self, 'Предупреждение', 'Нет результатов для экспорта')
             return
         
-        if format_type == 'markdown':
-            filename, _ = QFileDialog.getSaveFileName(
-                self, 'Сохранить как Markdown', '', 'Markdown Files (*.md)')
-            if filename:
-                try:
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        f.write(f"# Экспорт результатов ChatList\n\n")
-                        f.write(f"Дата экспорта: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                        f.write(f"Всего результатов: {len(self.all_results)}\n\n")
-                        f.write("---\n\n")
-                        
-                        for result in self.all_results:
-                            f.write(f"## Результат #{result['id']}\n\n")
-                            f.write(f"**Промт:** {result.get('prompt', '')}\n\n")
-                            f.write(f"**Модель:** {result.get('model_name', '')}\n\n")
-                            f.write(f"**Дата:** {result.get('saved_date', '')}\n\n")
-                            f.write(f"**Ответ:**\n\n{result.get('response_text', '')}\n\n")
-                            f.write("---\n\n")
-                    
-                    QMessageBox.information(self, 'Успех', f'Результаты экспортированы в {filename}')
-                except Exception as e:
-                    QMessageBox.critical(self, 'Ошибка', f'Не удалось экспортировать: {e}')
+        exporter_class = exporters.EXPORTERS[format_type]
+        filename, _ = QFileDialog.getSaveFileName(
+            self, f'Сохранить как {exporter_class.title}', '',
+            f'{exporter_class.title} Files (*{exporter_class.extension})')
+        if not filename:
+            return
         
-        elif format_type == 'json':
-            filename, _ = QFileDialog.getSaveFileName(
-                self, 'Сохранить как JSON', '', 'JSON Files (*.json)')
-            if filename:
-                try:
-                    export_data = {
-                        'export_date': datetime.now().isoformat(),
-                        'total_results': len(self.all_results),
-                        'results': self.all_results
-                    }
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        json.dump(export_data, f, ensure_ascii=False, indent=2)
-                    
-                    QMessageBox.information(self, 'Успех', f'Результаты экспортированы в {filename}')
-                except Exception as e:
-                    QMessageBox.critical(self, 'Ошибка', f'Не удалось экспортировать: {e}')
+        # Полные ответы читаются из БД порциями в рабочем потоке, список окна содержит только превью
+        search_text = self.search_input.text().strip()
+        since, until = self.period_filter.get_range()
+        filters = {'search': search_text or None, 'since': since, 'until': until}
+        
+        progress_dialog = QProgressDialog('Экспорт результатов...', 'Отмена', 0, 0, self)
+        progress_dialog.setWindowTitle('Экспорт')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(300)
+        
+        worker = ExportWorker(filename, format_type, filters)
+        
+        def on_progress(count: int, total: int):
+            if total >= 0:
+                progress_dialog.setMaximum(max(total, 1))
+                progress_dialog.setValue(min(count, total))
+            progress_dialog.setLabelText(f'Экспортировано результатов: {count}')
+        
+        worker.progress.connect(on_progress)
+        worker.finished.connect(lambda report: self.on_export_finished(progress_dialog, report))
+        progress_dialog.canceled.connect(worker.cancel)
+        self.export_worker = worker
+        worker.start()
+    
+    def on_export_finished(self, progress_dialog, report: dict):
+        progress_dialog.close()
+        if 'error' in report:
+            QMessageBox.critical(self, 'Ошибка', f"Не удалось экспортировать: {report['error']}")
+        elif not report['cancelled']:
+            QMessageBox.information(
+                self, 'Успех',
+                f"Экспортировано результатов: {report['count']} в {report['path']} "
+                f"({report['duration']:.1f} с)")
+    
+    def done(self, result: int):
+        # Окно закрывается только после остановки экспорта, иначе поток удаляется вместе с окном
+        worker = getattr(self, 'export_worker', None)
+        if worker is not None and worker.isRunning():
+            worker.cancel()
+            worker.wait()
+        self.search.shutdown()
+        super().done(result)
     
     def on_result_selection_changed(self):
         """Обработчик изменения выделения в таблице результатов"""
         self.update_open_button_state()
     
-    def on_result_cell_clicked(self, row: int, column: int):
+    def on_result_cell_clicked(self, index):
         """Обработчик клика по ячейке в таблице результатов"""
         self.update_open_button_state()
     
     def update_open_button_state(self):
         """Обновление состояния кнопки "Открыть" на основе выделения"""
-        selected_items = self.table.selectedItems()
-        if selected_items:
-            # Проверяем, выделена ли колонка "Ответ" (колонка 3)
-            for item in selected_items:
-                if item.column() == 3:  # Колонка "Ответ"
-                    if item.text() and item.text().strip():
-                        self.open_btn.setEnabled(True)
-                        return
-            # Если выделена другая колонка, отключаем кнопку
-            self.open_btn.setEnabled(False)
-        else:
-            self.open_btn.setEnabled(False)
+        # Кнопка активна, если выделена непустая ячейка колонки "Ответ" (колонка 3)
+        for index in self.table.selectionModel().selectedIndexes():
+            if index.column() == 3 and (index.data() or '').strip():
+                self.open_btn.setEnabled(True)
+                return
+        self.open_btn.setEnabled(False)
     
     def open_selected_response(self):
         """Открыть диалог с форматированным ответом для выделенной ячейки в колонке "Ответ" """
-        selected_items = self.table.selectedItems()
-        if not selected_items:
+        selected_indexes = self.table.selectionModel().selectedIndexes()
+        if not selected_indexes:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите ячейку с ответом в колонке "Ответ"')
             return
         
         # Ищем выделенную ячейку в колонке "Ответ" (колонка 3)
         row = None
-        for item in selected_items:
-            if item.column() == 3:  # Колонка "Ответ"
-                row = item.row()
+        for index in selected_indexes:
+            if index.column() == 3:  # Колонка "Ответ"
+                row = index.row()
                 break
         
         if row is None:
@@ -1473,25 +2317,19 @@ class ResultsWindow(QDialog):
     def open_response_dialog(self, row: int):
         """Открыть диалог с форматированным ответом в Markdown"""
         try:
-            # Получение данных из таблицы
-            result_id_item = self.table.item(row, 0)  # Колонка "ID"
-            model_name_item = self.table.item(row, 2)  # Колонка "Модель"
-            response_item = self.table.item(row, 3)  # Колонка "Ответ"
-            
-            if not result_id_item or not model_name_item or not response_item:
+            # Получение данных строки списка
+            result = self.model.record(row)
+            if not result:
                 return
             
-            model_name = model_name_item.text()
+            model_name = result.get('model_name') or ''
             
-            # Получение полного текста ответа из БД
-            result_id = int(result_id_item.text())
-            result_data = db.get_result_by_id(result_id)
+            # Получение полного текста ответа из БД (только для открываемой строки)
+            response_text = db.get_result_body(result['id'])
             
-            if result_data:
-                response_text = result_data.get('response_text', '')
-            else:
-                # Если не нашли в БД, берем из ячейки
-                response_text = response_item.text()
+            if response_text is None:
+                # Если не нашли в БД, берем превью из списка
+                response_text = result.get('preview') or ''
             
             # Создание и показ диалога с форматированным Markdown
             dialog = ResponseViewDialog(self, model_name, response_text)
@@ -1502,9 +2340,9 @@ class ResultsWindow(QDialog):
             traceback.print_exc()
     
     def delete_result(self):
-        row = self.table.currentRow()
-        if row >= 0:
-            result_id = int(self.table.item(row, 0).text())
+        result = self.model.record(self.table.currentIndex().row())
+        if result:
+            result_id = result['id']
             reply = QMessageBox.question(self, 'Подтверждение',
                                         f'Удалить результат #{result_id}?',
                                         QMessageBox.Yes | QMessageBox.No)
@@ -1513,6 +2351,169 @@ class ResultsWindow(QDialog):
                 self.load_results()
 
 
+class MetricsWindow(QDialog):
+    """Окно статистики производительности (задержки по моделям)"""
+    HISTOGRAMS = [
+        ('Полное время', metrics.REQUEST_LATENCY),
+        ('TTFT', metrics.REQUEST_TTFT),
+        ('Очередь', metrics.REQUEST_QUEUE_WAIT),
+        ('Запись в БД', metrics.DB_WRITE_TIME),
+    ]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Статистика производительности')
+        self.setModal(True)
+        self.resize(900, 500)
+        self.init_ui()
+        self.load_metrics()
+    
+    def init_ui(self):
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        self.tabs = QTabWidget()
+        layout.addWidget(self.tabs)
+        
+        # Вкладка "Текущий сеанс"
+        session_widget = QWidget()
+        session_layout = QVBoxLayout()
+        session_widget.setLayout(session_layout)
+        session_layout.addWidget(QLabel('Задержки в миллисекундах с момента запуска приложения'))
+        
+        # Таблица метрик
+        self.table = QTableWidget()
+        self.table.setColumnCount(9)
+        self.table.setHorizontalHeaderLabels(
+            ['Метрика', 'Модель', 'Провайдер', 'Кол-во', 'Среднее', 'p50', 'p95', 'p99', 'Макс'])
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setAlternatingRowColors(True)
+        self.table.setSortingEnabled(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        session_layout.addWidget(self.table)
+        self.tabs.addTab(session_widget, 'Текущий сеанс')
+        
+        # Вкладка "Рейтинг моделей" по сохраненным результатам
+        leaderboard_widget = QWidget()
+        leaderboard_layout = QVBoxLayout()
+        leaderboard_widget.setLayout(leaderboard_layout)
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel('Период:'))
+        # Те же периоды, что в PeriodFilter, кроме произвольного: статистика хранится по часам
+        self.period_combo = QComboBox()
+        for title, window in PeriodFilter.PERIODS:
+            self.period_combo.addItem(title, window)
+        self.period_combo.currentIndexChanged.connect(self.load_model_stats)
+        period_layout.addWidget(self.period_combo)
+        period_layout.addStretch()
+        leaderboard_layout.addLayout(period_layout)
+        
+        self.stats_table = QTableWidget()
+        self.stats_table.setColumnCount(6)
+        self.stats_table.setHorizontalHeaderLabels(
+            ['Модель', 'Результатов', 'Успешных, %', 'Среднее время, с', 'Средн. токенов', 'Средн. длина'])
+        self.stats_table.horizontalHeader().setStretchLastSection(True)
+        self.stats_table.setAlternatingRowColors(True)
+        self.stats_table.setSortingEnabled(True)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        leaderboard_layout.addWidget(self.stats_table)
+        self.tabs.addTab(leaderboard_widget, 'Рейтинг моделей')
+        
+        # Кнопки
+        buttons_layout = QHBoxLayout()
+        
+        refresh_btn = QPushButton('Обновить')
+        refresh_btn.clicked.connect(self.load_metrics)
+        buttons_layout.addWidget(refresh_btn)
+        
+        export_prom_btn = QPushButton('Экспорт Prometheus')
+        export_prom_btn.clicked.connect(lambda: self.export_metrics('prometheus'))
+        buttons_layout.addWidget(export_prom_btn)
+        
+        export_json_btn = QPushButton('Экспорт JSON')
+        export_json_btn.clicked.connect(lambda: self.export_metrics('json'))
+        buttons_layout.addWidget(export_json_btn)
+        
+        buttons_layout.addStretch()
+        
+        close_btn = QPushButton('Закрыть')
+        close_btn.clicked.connect(self.accept)
+        buttons_layout.addWidget(close_btn)
+        
+        layout.addLayout(buttons_layout)
+    
+    def load_metrics(self):
+        """Заполнение таблицы сводками гистограмм"""
+        rows = []
+        for title, histogram in self.HISTOGRAMS:
+            for summary in histogram.summaries():
+                rows.append((title, summary))
+        
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i, (title, summary) in enumerate(rows):
+            labels = summary['labels']
+            self.table.setItem(i, 0, QTableWidgetItem(title))
+            self.table.setItem(i, 1, QTableWidgetItem(labels.get('model', '')))
+            self.table.setItem(i, 2, QTableWidgetItem(labels.get('provider', '')))
+            count_item = QTableWidgetItem()
+            count_item.setData(Qt.DisplayRole, summary['count'])
+            self.table.setItem(i, 3, count_item)
+            for column, key in enumerate(['mean', 'p50', 'p95', 'p99', 'max'], start=4):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, round(summary[key] * 1000, 1))
+                self.table.setItem(i, column, item)
+        self.table.setSortingEnabled(True)
+        
+        self.load_model_stats()
+    
+    def load_model_stats(self):
+        """Заполнение рейтинга моделей по сохраненным результатам"""
+        try:
+            stats = db.get_model_stats(self.period_combo.currentData())
+        except Exception as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось загрузить статистику: {e}')
+            return
+        
+        self.stats_table.setSortingEnabled(False)
+        self.stats_table.setRowCount(len(stats))
+        for i, row in enumerate(stats):
+            values = [
+                row['model_name'] or f"#{row['model_id']}",
+                row['count'],
+                round(row['success_rate'] * 100, 1),
+                round(row['avg_response_time'], 2) if row['avg_response_time'] is not None else '',
+                round(row['avg_tokens'], 1),
+                round(row['avg_length'])
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)
+                self.stats_table.setItem(i, column, item)
+        self.stats_table.setSortingEnabled(True)
+    
+    def export_metrics(self, format_type: str):
+        """Экспорт метрик в формате Prometheus или JSON"""
+        from PyQt5.QtWidgets import QFileDialog
+        
+        if format_type == 'prometheus':
+            filename, _ = QFileDialog.getSaveFileName(
+                self, 'Сохранить метрики', 'chatlist_metrics.prom', 'Prometheus (*.prom *.txt)')
+            content = metrics.REGISTRY.to_prometheus() if filename else None
+        else:
+            filename, _ = QFileDialog.getSaveFileName(
+                self, 'Сохранить метрики', 'chatlist_metrics.json', 'JSON Files (*.json)')
+            content = metrics.REGISTRY.to_json() if filename else None
+        
+        if filename:
+            try:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                QMessageBox.information(self, 'Успех', f'Метрики экспортированы в {filename}')
+            except Exception as e:
+                QMessageBox.critical(self, 'Ошибка', f'Не удалось экспортировать: {e}')
+
+
 class PromptDialog(QDialog):
     """Диалог для создания/редактирования промта"""
     def __init__(self, parent=None, prompt_data=None):
@@ -1565,14 +2566,47 @@ class PromptDialog(QDialog):
         super().accept()
 
 
+class VariantsLoader(QThread):
+    """Рабочий поток загрузки вариантов улучшения от одной или нескольких моделей (параллельно)"""
+    fieldReceived = pyqtSignal(str, str, str)  # название модели, ключ, текст - поле потокового ответа
+    modelFinished = pyqtSignal(str, dict)  # название модели, результат get_prompt_variants
+    finished = pyqtSignal(dict)  # объединенный результат или {'error': ...}
+    
+    def __init__(self, models_list: list, prompt: str, use_cache: bool = True, parent=None):
+        super().__init__(parent)
+        self.models_list = models_list
+        self.prompt = prompt
+        self.use_cache = use_cache
+    
+    def run(self):
+        import prompt_improver
+        try:
+            result = prompt_improver.get_prompt_variants_parallel(
+                self.models_list, self.prompt, use_cache=self.use_cache,
+                on_result=lambda model, variants_data: self.modelFinished.emit(model.name, variants_data),
+                on_field=lambda model, key, text: self.fieldReceived.emit(model.name, key, text))
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        self.finished.emit(result)
+
+
 class PromptImproverDialog(QDialog):
     """Диалог для улучшения промтов с помощью AI"""
+    ALL_MODELS_TEXT = 'Все активные модели (параллельно)'
+    SPECIALIZED_TITLES = {'code': 'Для кода', 'analysis': 'Для анализа', 'creative': 'Для креатива'}
+    
     def __init__(self, parent=None, original_prompt: str = "", available_models: List = None):
         super().__init__(parent)
         self.original_prompt = original_prompt
         self.available_models = available_models or []
         self.selected_text = None
         self.variants_data = None
+        self.generation = 0
+        self.merger = None
+        self.models_received = 0
+        self.models_requested = 0
+        self.models_cached = 0
+        self.list_entries = []  # Варианты в строках variants_list (kind, text, models)
         self.setWindowTitle('Улучшение промта')
         self.setModal(True)
         self.resize(900, 700)
@@ -1589,6 +2623,10 @@ class PromptImproverDialog(QDialog):
         self.model_combo = QComboBox()
         for model in self.available_models:
             self.model_combo.addItem(model.name, model)
+        if len(self.available_models) > 1:
+            # Запрос ко всем моделям сразу: варианты появляются по мере ответов и объединяются без повторов
+            self.model_combo.addItem(self.ALL_MODELS_TEXT, None)
+        self.model_combo.currentIndexChanged.connect(lambda: self.start_loading())
         model_layout.addWidget(self.model_combo, 1)
         layout.addLayout(model_layout)
         
@@ -1685,6 +2723,10 @@ class PromptImproverDialog(QDialog):
         
         # Кнопки
         buttons_layout = QHBoxLayout()
+        # Повторное открытие на том же промте берет варианты из кэша; эта кнопка запрашивает модели заново
+        self.regenerate_btn = QPushButton('Сгенерировать заново')
+        self.regenerate_btn.clicked.connect(lambda: self.start_loading(use_cache=False))
+        buttons_layout.addWidget(self.regenerate_btn)
         buttons_layout.addStretch()
         
         close_btn = QPushButton('Закрыть')
@@ -1710,70 +2752,125 @@ class PromptImproverDialog(QDialog):
             selected_model = self.available_models[0]
         
         # Установка выбранной модели в комбобокс
+        self.model_combo.blockSignals(True)
         for i in range(self.model_combo.count()):
             if self.model_combo.itemData(i) == selected_model:
                 self.model_combo.setCurrentIndex(i)
                 break
-        
-        # Загрузка вариантов в отдельном потоке
-        from PyQt5.QtCore import QThread, pyqtSignal
-        
-        class VariantsLoader(QThread):
-            finished = pyqtSignal(dict)
-            
-            def __init__(self, model, prompt):
-                super().__init__()
-                self.model = model
-                self.prompt = prompt
-            
-            def run(self):
-                variants = prompt_improver.get_prompt_variants(self.model, self.prompt)
-                self.finished.emit(variants)
-        
-        self.loader = VariantsLoader(selected_model, self.original_prompt)
-        self.loader.finished.connect(self.on_variants_loaded)
-        self.loader.start()
+        self.model_combo.blockSignals(False)
+        self.start_loading()
+    
+    def start_loading(self, use_cache: bool = True):
+        """Запуск загрузки вариантов от выбранной модели или от всех моделей сразу"""
+        selected_model = self.model_combo.currentData()
+        models_list = [selected_model] if selected_model is not None else list(self.available_models)
+        
+        # Ответы предыдущей загрузки (до смены модели) отбрасываются
+        self.generation += 1
+        generation = self.generation
+        self.merger = None
+        self.variants_data = None
+        self.models_received = 0
+        self.models_cached = 0
+        self.models_requested = len(models_list)
+        self.improved_text.clear()
+        self.variants_list.clear()
+        self.list_entries = []
+        for field in (self.code_text, self.analysis_text, self.creative_text):
+            field.clear()
+        self.progress_label.setText('Загрузка вариантов улучшения...')
+        self.progress_label.setVisible(True)
+        
+        # Поток принадлежит главному окну, чтобы пережить закрытие диалога до ответа моделей
+        loader = VariantsLoader(models_list, self.original_prompt, use_cache, self.parent() or self)
+        loader.fieldReceived.connect(
+            lambda model_name, key, text: self.on_model_field(generation, model_name, key, text))
+        loader.modelFinished.connect(
+            lambda model_name, variants_data: self.on_model_variants(generation, model_name, variants_data))
+        loader.finished.connect(lambda result: self.on_variants_loaded(loader, generation, result))
+        self.loader = loader
+        loader.start()
+    
+    def get_merger(self):
+        if self.merger is None:
+            import prompt_improver
+            self.merger = prompt_improver.VariantMerger()
+        return self.merger
+    
+    def on_model_field(self, generation: int, model_name: str, key: str, text: str):
+        """Поле потокового ответа модели: вариант показывается, не дожидаясь конца ответа"""
+        if generation != self.generation:
+            return
+        for entry in self.get_merger().add_field(model_name, key, text):
+            self.show_candidate(entry)
+        self.update_candidate_tooltips()
     
-    def on_variants_loaded(self, variants_data: Dict):
-        """Обработчик загрузки вариантов"""
-        self.variants_data = variants_data
-        self.progress_label.setVisible(False)
+    def on_model_variants(self, generation: int, model_name: str, variants_data: Dict):
+        """Варианты одной модели: новые добавляются в диалог сразу, повторы только отмечаются"""
+        if generation != self.generation:
+            return
+        self.get_merger()
+        self.models_received += 1
+        if variants_data.get('cached'):
+            self.models_cached += 1
+        for entry in self.merger.add(model_name, variants_data):
+            self.show_candidate(entry)
+        self.update_candidate_tooltips()
+        if self.models_requested > 1:
+            self.progress_label.setText(
+                f'Получено ответов: {self.models_received} из {self.models_requested}...')
+    
+    def show_candidate(self, entry: Dict):
+        """Показать новый вариант улучшения"""
+        kind = entry['kind']
+        if kind == 'improved':
+            self.improved_text.setPlainText(entry['text'])
+            return
+        if kind in self.SPECIALIZED_TITLES:
+            field = {'code': self.code_text, 'analysis': self.analysis_text, 'creative': self.creative_text}[kind]
+            if not field.toPlainText():
+                field.setPlainText(entry['text'])
+                return
+        # Обычные варианты и специализированные версии от других моделей - в общий список
+        self.variants_list.addItem(QListWidgetItem(entry['text']))
+        self.list_entries.append(entry)
+    
+    def update_candidate_tooltips(self):
+        """Подсказки списка вариантов: какие модели предложили вариант"""
+        for row, entry in enumerate(self.list_entries):
+            title = self.SPECIALIZED_TITLES.get(entry['kind'])
+            models_text = 'Модели: ' + ', '.join(entry['models'])
+            self.variants_list.item(row).setToolTip(f'{title}. {models_text}' if title else models_text)
+    
+    def on_variants_loaded(self, loader, generation: int, result: Dict):
+        """Обработчик завершения загрузки вариантов (всех запрошенных моделей)"""
+        loader.wait()
+        loader.deleteLater()
+        if generation != self.generation:
+            return
+        self.variants_data = result
         
-        if not variants_data.get('success', False):
-            error = variants_data.get('error', 'Неизвестная ошибка')
+        errors = result.get('errors') or {}
+        if not result.get('success', False):
+            self.progress_label.setVisible(False)
+            error = result.get('error', 'Неизвестная ошибка')
             QMessageBox.warning(self, 'Ошибка', f'Не удалось улучшить промт:\n{error}')
             # Показываем исходный промт как улучшенный
             self.improved_text.setPlainText(self.original_prompt)
-            return
-        
-        # Заполнение улучшенной версии
-        improved = variants_data.get('improved', self.original_prompt)
-        self.improved_text.setPlainText(improved)
-        
-        # Заполнение вариантов
-        variants = variants_data.get('variants', [])
-        self.variants_list.clear()
-        for variant in variants:
-            self.variants_list.addItem(variant)
-        
-        # Заполнение специализированных версий
-        code_version = variants_data.get('code_version')
-        if code_version:
-            self.code_text.setPlainText(code_version)
+        elif errors:
+            # Часть моделей не ответила - варианты остальных уже показаны
+            self.progress_label.setText('Не ответили: ' + '; '.join(f'{name}: {error}' for name, error in errors.items()))
+        elif self.models_cached and self.models_cached == self.models_received:
+            self.progress_label.setText('Варианты из кэша. "Сгенерировать заново" - новый запрос к моделям')
+        elif self.models_cached:
+            self.progress_label.setText(f'Из кэша: ответы {self.models_cached} из {self.models_received} моделей')
         else:
-            self.code_text.setPlainText('Не доступно')
+            self.progress_label.setVisible(False)
         
-        analysis_version = variants_data.get('analysis_version')
-        if analysis_version:
-            self.analysis_text.setPlainText(analysis_version)
-        else:
-            self.analysis_text.setPlainText('Не доступно')
-        
-        creative_version = variants_data.get('creative_version')
-        if creative_version:
-            self.creative_text.setPlainText(creative_version)
-        else:
-            self.creative_text.setPlainText('Не доступно')
+        # Незаполненные специализированные версии
+        for field in (self.code_text, self.analysis_text, self.creative_text):
+            if not field.toPlainText():
+                field.setPlainText('Не доступно')
     
     def select_variant(self, variant_type: str):
         """Выбор варианта для подстановки"""
@@ -1841,14 +2938,9 @@ class ResponseViewDialog(QDialog):
         # Сохранение оригинального текста для копирования
         self.original_text = response_text
         
-        # Попытка использовать setMarkdown (доступно в Qt 5.14+)
+        # HTML берется из кэша (ответы главного окна готовятся в фоне при получении)
         try:
-            # Проверяем наличие метода setMarkdown
-            if hasattr(self.text_view, 'setMarkdown'):
-                self.text_view.setMarkdown(response_text)
-            else:
-                # Если setMarkdown недоступен, конвертируем markdown в HTML
-                self.text_view.setHtml(self.markdown_to_html(response_text))
+            self.text_view.setHtml(markdown_render.render_html(response_text))
         except Exception as e:
             # В случае ошибки используем обычный текст
             self.text_view.setPlainText(response_text)
@@ -1869,64 +2961,6 @@ class ResponseViewDialog(QDialog):
         
         layout.addLayout(buttons_layout)
     
-    def markdown_to_html(self, markdown_text: str) -> str:
-        """Простая конвертация Markdown в HTML (базовая поддержка)"""
-        html = markdown_text
-        
-        # Заголовки
-        import re
-        html = re.sub(r'^# (.*?)$', r'<h1>\1</h1>', html, flags=re.MULTILINE)
-        html = re.sub(r'^## (.*?)$', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-        html = re.sub(r'^### (.*?)$', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-        
-        # Жирный текст
-        html = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html)
-        html = re.sub(r'__(.*?)__', r'<strong>\1</strong>', html)
-        
-        # Курсив
-        html = re.sub(r'\*(.*?)\*', r'<em>\1</em>', html)
-        html = re.sub(r'_(.*?)_', r'<em>\1</em>', html)
-        
-        # Код (inline)
-        html = re.sub(r'`([^`]+)`', r'<code>\1</code>', html)
-        
-        # Блоки кода
-        html = re.sub(r'```(\w+)?\n(.*?)```', r'<pre><code>\2</code></pre>', html, flags=re.DOTALL)
-        
-        # Списки
-        lines = html.split('\n')
-        in_list = False
-        result_lines = []
-        for line in lines:
-            if re.match(r'^[-*+] ', line):
-                if not in_list:
-                    result_lines.append('<ul>')
-                    in_list = True
-                result_lines.append(f'<li>{line[2:]}</li>')
-            elif re.match(r'^\d+\. ', line):
-                if not in_list:
-                    result_lines.append('<ol>')
-                    in_list = True
-                result_lines.append(f'<li>{re.sub(r"^\d+\. ", "", line)}</li>')
-            else:
-                if in_list:
-                    result_lines.append('</ul>' if '<ol>' not in '\n'.join(result_lines[-10:]) else '</ol>')
-                    in_list = False
-                if line.strip():
-                    result_lines.append(f'<p>{line}</p>')
-                else:
-                    result_lines.append('<br>')
-        
-        if in_list:
-            result_lines.append('</ul>')
-        
-        html = '\n'.join(result_lines)
-        
-        # Заменяем переносы строк на <br>
-        html = html.replace('\n', '<br>')
-        
-        return f'<div style="font-family: Arial, sans-serif; padding: 10px;">{html}</div>'
-    
     def copy_to_clipboard(self, text: str):
         """Копировать текст в буфер обмена"""
         from PyQt5.QtWidgets import QApplication
@@ -1936,7 +2970,10 @@ class ResponseViewDialog(QDialog):
 
 
 def main():
-    app = QApplication(sys.argv)
+    profiler = startup_profile.PROFILER
+    profiler.mark('Импорт модулей')
+    with profiler.phase('Создание QApplication'):
+        app = QApplication(sys.argv)
     app.setApplicationName('ChatList')
     app.setApplicationVersion(version.__version__)
     
@@ -1950,11 +2987,21 @@ def main():
         pass  # Игнорируем ошибки при загрузке иконки
     
     # Логирование версии при старте
-    import logger
-    logger.logger.info(f"ChatList v{version.__version__} - Запуск приложения")
+    with profiler.phase('Настройка логирования'):
+        import logger
+        logger.logger.info(f"ChatList v{version.__version__} - Запуск приложения")
     
     window = MainWindow()
-    window.show()
+    with profiler.phase('Показ окна'):
+        window.show()
+    
+    def on_event_loop_started():
+        profiler.mark('Первая итерация цикла событий')
+        if startup_profile.is_requested():
+            print(profiler.format_report())
+            app.quit()
+    
+    QTimer.singleShot(0, on_event_loop_started)
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль обслуживания базы данных
+
+Шаги обслуживания:
+- PRAGMA optimize - обновление статистики планировщика запросов (ANALYZE
+  выполняется только для таблиц, где он нужен, с ограничением analysis_limit);
+- PRAGMA incremental_vacuum - возврат свободных страниц файловой системе
+  (требует auto_vacuum = INCREMENTAL; существующая БД переводится полным VACUUM);
+- PRAGMA wal_checkpoint - перенос WAL в основной файл с ограничением размера журнала.
+
+В GUI обслуживание запускается в простое (MaintenanceWorker в main.py),
+без GUI - командой python cli.py maintenance. Каждый запуск записывается
+в таблицу maintenance_runs.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+import db
+import metrics
+
+
+# Интервал между автоматическими запусками по умолчанию (настройка maintenance_interval_hours)
+DEFAULT_INTERVAL_HOURS = 24
+
+# Не больше страниц за один запуск инкрементальной очистки, чтобы запуск был коротким
+DEFAULT_VACUUM_PAGES = 2000
+
+# Ограничение числа строк, анализируемых на индекс при PRAGMA optimize
+ANALYSIS_LIMIT = 400
+
+# Размер, до которого усекается файл WAL после контрольной точки
+JOURNAL_SIZE_LIMIT = 16 * 1024 * 1024
+
+# Режимы контрольной точки: PASSIVE не ждет читателей и писателей (для работы в фоне)
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _files_size() -> int:
+    """Суммарный размер файла БД и WAL в байтах"""
+    total = 0
+    for path in (db.DB_NAME, db.DB_NAME + '-wal'):
+        if os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def _pragma_value(cursor, name: str) -> int:
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+def get_interval_hours() -> float:
+    """Интервал автоматического обслуживания из настроек"""
+    try:
+        return float(db.get_setting('maintenance_interval_hours', str(DEFAULT_INTERVAL_HOURS)))
+    except ValueError:
+        return DEFAULT_INTERVAL_HOURS
+
+
+def get_runs(limit: int = 20) -> List[Dict]:
+    """Последние запуски обслуживания (новые первыми)"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT * FROM maintenance_runs ORDER BY started_ts DESC LIMIT ?', (limit,))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def is_due(interval_hours: Optional[float] = None) -> bool:
+    """Пора ли выполнять обслуживание (прошло больше интервала с последнего запуска)"""
+    if interval_hours is None:
+        interval_hours = get_interval_hours()
+    if interval_hours <= 0:
+        return False
+    runs = get_runs(limit=1)
+    if not runs:
+        return True
+    return db.now_ms() - runs[0]['started_ts'] >= interval_hours * 3600 * 1000
+
+
+def run_maintenance(trigger: str = 'manual', vacuum_pages: int = DEFAULT_VACUUM_PAGES,
+                    full_vacuum: bool = False, checkpoint_mode: str = 'PASSIVE') -> Dict:
+    """
+    Выполнить обслуживание БД
+
+    Args:
+        trigger: Источник запуска для журнала ('idle', 'cli', 'manual')
+        vacuum_pages: Максимум страниц, возвращаемых инкрементальной очисткой (0 - все свободные)
+        full_vacuum: Выполнить полный VACUUM (долго; переводит старую БД в auto_vacuum = INCREMENTAL)
+        checkpoint_mode: Режим контрольной точки WAL (см. CHECKPOINT_MODES)
+
+    Returns:
+        Отчет с длительностью шагов (секунды) и освобожденным местом (байты)
+    """
+    if checkpoint_mode not in CHECKPOINT_MODES:
+        raise ValueError(f'Неизвестный режим контрольной точки: {checkpoint_mode}')
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        report = {
+            'started_ts': db.now_ms(),
+            'trigger': trigger,
+            'size_before': _files_size(),
+        }
+        start_time = time.perf_counter()
+
+        # 1. Статистика для планировщика запросов
+        step_start = time.perf_counter()
+        conn.executescript(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}; PRAGMA optimize;')
+        report['optimize_time'] = time.perf_counter() - step_start
+
+        # 2. Возврат свободных страниц
+        step_start = time.perf_counter()
+        page_size = _pragma_value(cursor, 'page_size')
+        pages_before = _pragma_value(cursor, 'page_count')
+        auto_vacuum = _pragma_value(cursor, 'auto_vacuum')
+        if full_vacuum:
+            if auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+                cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+            report['vacuum_mode'] = 'full'
+        elif auto_vacuum == AUTO_VACUUM_INCREMENTAL:
+            # execute() модуля sqlite3 делает один шаг прагмы (одна страница),
+            # executescript выполняет ее до конца
+            conn.executescript(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+            report['vacuum_mode'] = 'incremental'
+        else:
+            # БД создана до перехода на auto_vacuum = INCREMENTAL: нужен однократный полный VACUUM
+            report['vacuum_mode'] = 'needs_full'
+        pages_after = _pragma_value(cursor, 'page_count')
+        report['reclaimed_bytes'] = max(0, pages_before - pages_after) * page_size
+        report['free_bytes'] = _pragma_value(cursor, 'freelist_count') * page_size
+        report['vacuum_time'] = time.perf_counter() - step_start
+
+        # 3. Контрольная точка WAL
+        step_start = time.perf_counter()
+        cursor.execute(f'PRAGMA journal_size_limit = {JOURNAL_SIZE_LIMIT}')
+        cursor.execute(f'PRAGMA wal_checkpoint({checkpoint_mode})')
+        busy, wal_frames, checkpointed = cursor.fetchone()
+        report['wal_busy'] = bool(busy)
+        report['wal_frames'] = wal_frames
+        report['checkpointed_frames'] = checkpointed
+        report['checkpoint_time'] = time.perf_counter() - step_start
+
+        report['duration'] = time.perf_counter() - start_time
+        report['size_after'] = _files_size()
+
+        cursor.execute('''
+            INSERT INTO maintenance_runs
+                (started_ts, trigger, duration, optimize_time, vacuum_time, checkpoint_time, vacuum_mode,
+                 reclaimed_bytes, wal_frames, checkpointed_frames, size_before, size_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (report['started_ts'], trigger, report['duration'], report['optimize_time'],
+              report['vacuum_time'], report['checkpoint_time'], report['vacuum_mode'],
+              report['reclaimed_bytes'], wal_frames, checkpointed,
+              report['size_before'], report['size_after']))
+        conn.commit()
+
+        for step in ('optimize', 'vacuum', 'checkpoint'):
+            metrics.DB_MAINTENANCE_TIME.observe(report[f'{step}_time'], step=step)
+        metrics.DB_RECLAIMED_BYTES.inc(report['reclaimed_bytes'])
+        return report
+    finally:
+        conn.close()
+
+
+def format_report(report: Dict) -> str:
+    """Текстовый отчет об обслуживании для консоли и строки состояния"""
+    vacuum_modes = {
+        'full': 'полная очистка',
+        'incremental': 'инкрементальная очистка',
+        'needs_full': 'очистка пропущена (нужен однократный --full-vacuum)',
+    }
+    lines = [
+        f"Обслуживание БД завершено за {report['duration']:.2f} с",
+        f"  optimize: {report['optimize_time']:.2f} с",
+        f"  {vacuum_modes[report['vacuum_mode']]}: {report['vacuum_time']:.2f} с, "
+        f"освобождено {report['reclaimed_bytes'] / 1024:.0f} КБ",
+        f"  контрольная точка WAL: {report['checkpoint_time']:.2f} с, "
+        f"кадров {report['checkpointed_frames']}/{report['wal_frames']}"
+        + (' (БД занята, перенос не завершен)' if report['wal_busy'] else ''),
+        f"  размер файлов: {report['size_before'] / 1024:.0f} КБ -> {report['size_after'] / 1024:.0f} КБ",
+    ]
+    return '\n'.join(lines)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль преобразования ответов моделей из Markdown в HTML
+
+Разбор выполняется за один проход по строкам (блоки: заголовки, блоки кода,
+списки, цитаты, таблицы, абзацы), встроенная разметка обрабатывается одним
+заранее скомпилированным регулярным выражением. Готовый HTML хранится
+в LRU-кэше по хэшу текста; prerender готовит HTML в фоновом потоке, пока
+пользователь еще не открыл ответ.
+"""
+
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+
+# Сколько готовых HTML хранить в кэше
+CACHE_SIZE = 128
+
+# Обертка документа (как в прежнем диалоге просмотра ответа)
+DOCUMENT_TEMPLATE = '<div style="font-family: Arial, sans-serif; padding: 10px;">{}</div>'
+
+_FENCE_RE = re.compile(r'^\s*(```|~~~)\s*([\w+#.-]*)\s*$')
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_HR_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+_UL_RE = re.compile(r'^\s*[-*+]\s+(.*)$')
+_OL_RE = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_QUOTE_RE = re.compile(r'^\s*>\s?(.*)$')
+_TABLE_SEPARATOR_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+
+# Встроенная разметка: код, ссылка, жирный, курсив - одной альтернативой,
+# чтобы содержимое `кода` не разбиралось дальше. Длина фрагментов ограничена,
+# чтобы незакрытые * и _ в длинной строке не давали квадратичного перебора
+_INLINE_RE = re.compile(
+    r'``(?P<code2>[^\n]{1,1000}?)``'
+    r'|`(?P<code>[^`\n]+)`'
+    r'|\[(?P<link_text>[^\[\]\n]{1,500})\]\((?P<link_url>https?://[^)\s]+)\)'
+    r'|\*\*(?P<bold>[^\n]{1,500}?)\*\*'
+    r'|__(?P<bold2>[^\n]{1,500}?)__'
+    r'|\*(?P<em>[^*\s](?:[^*\n]{0,500}?[^*\s])?)\*'
+    r'|(?<!\w)_(?P<em2>[^_\s](?:[^_\n]{0,500}?[^_\s])?)_(?!\w)'
+)
+
+_cache: 'OrderedDict[str, str]' = OrderedDict()
+_pending: Dict[str, Any] = {}  # Выполняющиеся фоновые подготовки (concurrent.futures.Future)
+_lock = threading.Lock()
+_executor = None
+
+
+def render_inline(text: str) -> str:
+    """HTML для встроенной разметки одной строки (текст экранируется)"""
+    parts = []
+    position = 0
+    for match in _INLINE_RE.finditer(text):
+        parts.append(html.escape(text[position:match.start()], quote=False))
+        position = match.end()
+        code = match.group('code') or match.group('code2')
+        if code:
+            parts.append(f"<code>{html.escape(code.strip(), quote=False)}</code>")
+        elif match.group('link_url'):
+            url = html.escape(match.group('link_url'))
+            parts.append(f'<a href="{url}">{render_inline(match.group("link_text"))}</a>')
+        elif match.group('bold') or match.group('bold2'):
+            parts.append(f"<strong>{render_inline(match.group('bold') or match.group('bold2'))}</strong>")
+        else:
+            parts.append(f"<em>{render_inline(match.group('em') or match.group('em2'))}</em>")
+    parts.append(html.escape(text[position:], quote=False))
+    return ''.join(parts)
+
+
+def _split_table_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def markdown_to_html(markdown_text: str) -> str:
+    """
+    Преобразование Markdown в HTML за один проход по строкам
+
+    Поддерживаются заголовки, блоки кода ``` и ~~~, маркированные и нумерованные
+    списки, цитаты, горизонтальные линии, таблицы с разделителем |---| и абзацы;
+    внутри строк - `код`, **жирный**, *курсив* и ссылки.
+    """
+    lines = markdown_text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    out = []
+    paragraph = []
+    list_tag = None
+    code_fence = None
+
+    def close_paragraph():
+        if paragraph:
+            out.append('<p>' + '<br>'.join(render_inline(line) for line in paragraph) + '</p>')
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f'</{list_tag}>')
+            list_tag = None
+
+    i = 0
+    count = len(lines)
+    while i < count:
+        line = lines[i]
+        i += 1
+
+        if code_fence is not None:
+            fence = _FENCE_RE.match(line)
+            if fence and fence.group(1) == code_fence and not fence.group(2):
+                out.append('</code></pre>')
+                code_fence = None
+            else:
+                out.append(html.escape(line, quote=False) + '\n')
+            continue
+
+        fence = _FENCE_RE.match(line)
+        if fence:
+            close_paragraph()
+            close_list()
+            code_fence = fence.group(1)
+            out.append('<pre><code>')
+            continue
+
+        if not line.strip():
+            close_paragraph()
+            close_list()
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            close_paragraph()
+            close_list()
+            level = len(heading.group(1))
+            out.append(f'<h{level}>{render_inline(heading.group(2))}</h{level}>')
+            continue
+
+        if _HR_RE.match(line):
+            close_paragraph()
+            close_list()
+            out.append('<hr>')
+            continue
+
+        item = _UL_RE.match(line)
+        tag = 'ul'
+        if item is None:
+            item = _OL_RE.match(line)
+            tag = 'ol'
+        if item is not None:
+            close_paragraph()
+            if list_tag != tag:
+                close_list()
+                out.append(f'<{tag}>')
+                list_tag = tag
+            out.append(f'<li>{render_inline(item.group(1))}</li>')
+            continue
+
+        quote = _QUOTE_RE.match(line)
+        if quote:
+            close_paragraph()
+            close_list()
+            quoted = [quote.group(1)]
+            while i < count:
+                quote = _QUOTE_RE.match(lines[i])
+                if quote is None:
+                    break
+                quoted.append(quote.group(1))
+                i += 1
+            out.append('<blockquote>' + '<br>'.join(render_inline(text) for text in quoted) + '</blockquote>')
+            continue
+
+        if '|' in line and i < count and _TABLE_SEPARATOR_RE.match(lines[i]):
+            close_paragraph()
+            close_list()
+            out.append('<table border="1" cellspacing="0" cellpadding="4"><tr>')
+            out.extend(f'<th>{render_inline(cell)}</th>' for cell in _split_table_row(line))
+            out.append('</tr>')
+            i += 1
+            while i < count and '|' in lines[i] and lines[i].strip():
+                out.append('<tr>')
+                out.extend(f'<td>{render_inline(cell)}</td>' for cell in _split_table_row(lines[i]))
+                out.append('</tr>')
+                i += 1
+            out.append('</table>')
+            continue
+
+        close_list()
+        paragraph.append(line)
+
+    if code_fence is not None:
+        out.append('</code></pre>')
+    close_paragraph()
+    close_list()
+    return DOCUMENT_TEMPLATE.format(''.join(out))
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _store(key: str, rendered: str):
+    with _lock:
+        _cache[key] = rendered
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def render_html(markdown_text: str) -> str:
+    """
+    HTML для текста ответа: из кэша, из выполняющейся фоновой подготовки
+    или преобразованием на месте
+    """
+    key = _text_key(markdown_text)
+    with _lock:
+        rendered = _cache.get(key)
+        if rendered is not None:
+            _cache.move_to_end(key)
+            return rendered
+        future = _pending.get(key)
+    if future is not None:
+        return future.result()
+    rendered = markdown_to_html(markdown_text)
+    _store(key, rendered)
+    return rendered
+
+
+def _prerender_task(key: str, markdown_text: str) -> str:
+    try:
+        rendered = markdown_to_html(markdown_text)
+        _store(key, rendered)
+        return rendered
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def prerender(markdown_text: str):
+    """Подготовить HTML в фоновом потоке (например, как только пришел ответ модели)"""
+    global _executor
+    if not markdown_text:
+        return
+    key = _text_key(markdown_text)
+    with _lock:
+        if key in _cache or key in _pending:
+            return
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='markdown')
+        _pending[key] = _executor.submit(_prerender_task, key, markdown_text)
+
+
+def clear_cache():
+    """Очистить кэш готового HTML"""
+    with _lock:
+        _cache.clear()
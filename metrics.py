@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль метрик производительности: счетчики, gauge и гистограммы задержек
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Any
+
+
+# Границы бакетов, которые выгружаются в формате Prometheus (в секундах)
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Квантили, которые попадают в JSON-снимок и в окно статистики
+SNAPSHOT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = '') -> str:
+    """Сформировать строку меток в формате Prometheus"""
+    parts = []
+    for name, value in zip(labelnames, labelvalues):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    """Форматирование числа для Prometheus"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Базовый класс метрики с набором меток"""
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """Преобразовать метки в ключ словаря значений"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {tuple(labels)}")
+        return tuple(str(labels[name]) if labels[name] is not None else '' for name in self.labelnames)
+
+    def reset(self):
+        """Сбросить все значения метрики"""
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Монотонно возрастающий счетчик"""
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        if amount < 0:
+            raise ValueError('Счетчик не может уменьшаться')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class Gauge(_Metric):
+    """Значение, которое может как расти, так и уменьшаться"""
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+
+class _HistogramState:
+    """Состояние гистограммы для одного набора меток"""
+    __slots__ = ('buckets', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма в стиле HDR: логарифмические бакеты с фиксированной
+    относительной точностью, поэтому квантили (p95/p99) вычисляются
+    с погрешностью не более precision при любом разбросе значений
+    и постоянном объеме памяти.
+    """
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 min_value: float = 0.0001, precision: float = 0.01):
+        super().__init__(name, help_text, labelnames)
+        self.min_value = min_value
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+
+    def _bucket_index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.log(value / self.min_value) / self._log_base) + 1
+
+    def _bucket_upper(self, index: int) -> float:
+        if index == 0:
+            return self.min_value
+        return self.min_value * math.exp(index * self._log_base)
+
+    def observe(self, value: float, **labels):
+        """Зарегистрировать значение (в секундах)"""
+        if value < 0:
+            value = 0.0
+        key = self._key(labels)
+        index = self._bucket_index(value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = _HistogramState()
+            state.buckets[index] = state.buckets.get(index, 0) + 1
+            state.count += 1
+            state.sum += value
+            if value < state.min:
+                state.min = value
+            if value > state.max:
+                state.max = value
+
+    @contextmanager
+    def time(self, **labels):
+        """Контекстный менеджер для замера длительности блока кода"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, state: _HistogramState, q: float) -> float:
+        if state.count == 0:
+            return 0.0
+        rank = q * state.count
+        seen = 0
+        for index in sorted(state.buckets):
+            seen += state.buckets[index]
+            if seen >= rank:
+                # Верхняя граница бакета не может превышать реальный максимум
+                return min(self._bucket_upper(index), state.max)
+        return state.max
+
+    def quantile(self, q: float, **labels) -> float:
+        """Получить квантиль q (0..1) для набора меток"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return self._quantile(state, q) if state else 0.0
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """Сводка по всем наборам меток: count, sum, min, max, mean и квантили"""
+        with self._lock:
+            items = sorted(self._values.items())
+            summaries = []
+            for key, state in items:
+                summary = {
+                    'labels': dict(zip(self.labelnames, key)),
+                    'count': state.count,
+                    'sum': state.sum,
+                    'min': state.min if state.count else 0.0,
+                    'max': state.max,
+                    'mean': state.sum / state.count if state.count else 0.0,
+                }
+                for q in SNAPSHOT_QUANTILES:
+                    summary[f'p{int(q * 100)}'] = self._quantile(state, q)
+                summaries.append(summary)
+            return summaries
+
+    def cumulative_buckets(self, key: Tuple[str, ...]) -> List[Tuple[float, int]]:
+        """Кумулятивные бакеты для выгрузки в Prometheus"""
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                return []
+            result = []
+            ordered = sorted(state.buckets.items())
+            position = 0
+            cumulative = 0
+            for bound in PROMETHEUS_BUCKETS:
+                while position < len(ordered) and self._bucket_upper(ordered[position][0]) <= bound * (1 + self.precision):
+                    cumulative += ordered[position][1]
+                    position += 1
+                result.append((bound, cumulative))
+            result.append((math.inf, state.count))
+            return result
+
+
+class MetricsRegistry:
+    """Реестр метрик приложения"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric_class, name: str, help_text: str, labelnames, **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if not isinstance(existing, metric_class):
+                    raise ValueError(f"Метрика {name} уже зарегистрирована с другим типом")
+                return existing
+            metric = metric_class(name, help_text, tuple(labelnames), **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames=(), **kwargs) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, **kwargs)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def reset(self):
+        """Сбросить значения всех метрик (сами метрики остаются зарегистрированными)"""
+        for metric in self.metrics():
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Снимок всех метрик в виде словаря"""
+        data = {'timestamp': time.time(), 'metrics': {}}
+        for metric in self.metrics():
+            entry = {'type': metric.metric_type, 'help': metric.help}
+            if isinstance(metric, Histogram):
+                entry['series'] = metric.summaries()
+            else:
+                entry['series'] = [
+                    {'labels': dict(zip(metric.labelnames, key)), 'value': value}
+                    for key, value in metric.samples()
+                ]
+            data['metrics'][metric.name] = entry
+        return data
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Экспорт снимка метрик в JSON"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Экспорт метрик в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+            if isinstance(metric, Histogram):
+                for summary in metric.summaries():
+                    key = tuple(summary['labels'][name] for name in metric.labelnames)
+                    for bound, count in metric.cumulative_buckets(key):
+                        le = 'le="' + _format_value(bound) + '"'
+                        lines.append(f'{metric.name}_bucket{_format_labels(metric.labelnames, key, le)} {count}')
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f'{metric.name}_sum{labels} {_format_value(summary["sum"])}')
+                    lines.append(f'{metric.name}_count{labels} {summary["count"]}')
+            else:
+                for key, value in metric.samples():
+                    lines.append(f'{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Глобальный реестр метрик
+REGISTRY = MetricsRegistry()
+
+# Метрики запросов к API
+REQUEST_LATENCY = REGISTRY.histogram(
+    'chatlist_request_latency_seconds', 'Полное время запроса к API', ('model', 'provider'))
+REQUEST_TTFT = REGISTRY.histogram(
+    'chatlist_request_ttft_seconds', 'Время до первой части потокового ответа (TTFT)', ('model', 'provider'))
+REQUEST_QUEUE_WAIT = REGISTRY.histogram(
+    'chatlist_request_queue_wait_seconds', 'Ожидание запроса в очереди до начала выполнения', ('model', 'provider'))
+REQUESTS_TOTAL = REGISTRY.counter(
+    'chatlist_requests_total', 'Количество запросов к API', ('model', 'provider', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'chatlist_requests_in_flight', 'Количество выполняющихся запросов', ('model', 'provider'))
+
+# Метрики базы данных
+DB_WRITE_TIME = REGISTRY.histogram(
+    'chatlist_db_write_seconds', 'Время записи в базу данных', ('model', 'provider'))
+DB_MAINTENANCE_TIME = REGISTRY.histogram(
+    'chatlist_db_maintenance_seconds', 'Время шагов обслуживания базы данных', ('step',))
+DB_RECLAIMED_BYTES = REGISTRY.counter(
+    'chatlist_db_reclaimed_bytes_total', 'Место, освобожденное обслуживанием базы данных')
+
+# Метрики интерфейса
+UI_UPDATES = REGISTRY.counter(
+    'chatlist_ui_updates_total', 'События обновления интерфейса: применены, слиты с более новыми или отброшены', ('outcome',))
+UI_FLUSH_TIME = REGISTRY.histogram(
+    'chatlist_ui_flush_seconds', 'Время применения пакета обновлений интерфейса')
+
+
+def record_request(model_name: str, provider: str, result: Dict[str, Any], elapsed: float):
+    """
+    Зарегистрировать завершенный запрос к API
+
+    Args:
+        model_name: Название модели
+        provider: Тип провайдера (model_type)
+        result: Результат network.send_request
+        elapsed: Полное время запроса в секундах
+    """
+    success = result.get('success', False)
+    REQUEST_LATENCY.observe(elapsed, model=model_name, provider=provider)
+    # ttft есть только у потоковых ответов: у обычного запроса он совпал бы с полным временем
+    ttft = result.get('ttft')
+    if ttft is not None:
+        REQUEST_TTFT.observe(ttft, model=model_name, provider=provider)
+    REQUESTS_TOTAL.inc(model=model_name, provider=provider, status='success' if success else 'error')
@@ -0,0 +1,805 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль версионных миграций схемы базы данных
+
+Версия схемы хранится в PRAGMA user_version. Каждая миграция состоит из:
+- schema: изменения схемы, выполняются в одной транзакции вместе с
+  увеличением user_version (или не выполняются вовсе);
+- backfill (необязательно): перенос данных порциями с фиксацией после
+  каждой порции, чтобы большая БД не блокировалась на минуты;
+- estimate (необязательно): количество строк для backfill, для dry-run.
+
+Все шаги идемпотентны: если backfill был прерван, при следующем запуске
+schema повторно выполняется без ошибок, а backfill продолжает с места остановки.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+import db
+
+
+class Migration:
+    """Описание одной миграции"""
+
+    def __init__(self, version: int, description: str, schema: Callable,
+                 backfill: Optional[Callable] = None, estimate: Optional[Callable] = None):
+        self.version = version
+        self.description = description
+        self.schema = schema
+        self.backfill = backfill
+        self.estimate = estimate
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, backfill: Optional[Callable] = None,
+              estimate: Optional[Callable] = None):
+    """Декоратор регистрации функции изменения схемы как миграции"""
+    def decorator(schema: Callable) -> Callable:
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f'Миграция версии {version} уже зарегистрирована')
+        MIGRATIONS.append(Migration(version, description, schema, backfill, estimate))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return schema
+    return decorator
+
+
+# ==================== Вспомогательные функции ====================
+
+def table_exists(cursor: sqlite3.Cursor, table: str) -> bool:
+    """Проверить наличие таблицы"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor: sqlite3.Cursor, table: str, column: str) -> bool:
+    """Проверить наличие колонки в таблице"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def add_column_if_missing(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> bool:
+    """Добавить колонку в существующую таблицу, если ее еще нет"""
+    if column_exists(cursor, table, column):
+        return False
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+def run_in_batches(conn: sqlite3.Connection, select_sql: str, process_row: Callable,
+                   batch_size: int, params: tuple = ()) -> int:
+    """
+    Обработать строки порциями с фиксацией после каждой порции
+
+    select_sql должен выбирать id первой колонкой и содержать условие
+    "id > ?" и "ORDER BY id LIMIT ?" (курсор по id) - последними
+    параметрами передаются последний обработанный id и размер порции.
+
+    Returns:
+        Количество обработанных строк
+    """
+    cursor = conn.cursor()
+    last_id = 0
+    processed = 0
+    while True:
+        cursor.execute(select_sql, params + (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for row in rows:
+            process_row(cursor, row)
+        conn.commit()
+        last_id = rows[-1][0]
+        processed += len(rows)
+        # Даем другим соединениям возможность захватить блокировку между порциями
+        time.sleep(0)
+    return processed
+
+
+def _count(cursor: sqlite3.Cursor, sql: str, params: tuple = ()) -> int:
+    cursor.execute(sql, params)
+    return cursor.fetchone()[0]
+
+
+# ==================== Миграции ====================
+
+@migration(1, 'Базовая схема: промты, модели, результаты, настройки')
+def _v1_base_schema(cursor: sqlite3.Cursor):
+    # Таблица промтов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            prompt TEXT NOT NULL,
+            tags TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompts_date ON prompts(date)')
+
+    # Таблица моделей
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            api_url TEXT NOT NULL,
+            api_key_env TEXT NOT NULL,
+            model_type TEXT NOT NULL,
+            is_active INTEGER NOT NULL DEFAULT 1,
+            created_date TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_models_name ON models(name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_models_active ON models(is_active)')
+
+    # Таблица результатов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_id INTEGER NOT NULL,
+            model_id INTEGER NOT NULL,
+            response_text TEXT NOT NULL,
+            saved_date TEXT NOT NULL,
+            metadata TEXT,
+            FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
+            FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE SET NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_prompt ON results(prompt_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_model ON results(model_id)')
+
+    # Таблица настроек
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            value TEXT,
+            description TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_settings_key ON settings(key)')
+
+    # Вставка стандартных настроек
+    cursor.executemany('''
+        INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)
+    ''', [
+        ('default_timeout', '30', 'Таймаут HTTP-запросов в секундах'),
+        ('max_response_length', '5000', 'Максимальная длина ответа для отображения'),
+        ('auto_save_prompts', 'false', 'Автоматически сохранять промты при отправке'),
+        ('theme', 'system', 'Тема интерфейса')
+    ])
+
+
+def _stats_columns_sql(row: str, with_blobs: bool, with_ts: bool = False) -> str:
+    """Выражения для извлечения полей статистики из строки results (NEW или r)"""
+    if with_ts:
+        ts_sql = f"COALESCE({row}.saved_ts / 1000, CAST(strftime('%s', {row}.saved_date, 'utc') AS INTEGER))"
+    else:
+        ts_sql = f"CAST(strftime('%s', {row}.saved_date, 'utc') AS INTEGER)"
+    if with_blobs:
+        length_sql = f'COALESCE((SELECT text_length FROM blobs WHERE id = {row}.blob_id), length({row}.response_text))'
+    else:
+        length_sql = f'length({row}.response_text)'
+    return f'''
+        {row}.id,
+        {row}.model_id,
+        {ts_sql},
+        json_extract({row}.metadata, '$.response_time'),
+        json_extract({row}.metadata, '$.tokens_used'),
+        COALESCE(json_extract({row}.metadata, '$.success'),
+                 json_extract({row}.metadata, '$.response_time') IS NOT NULL),
+        {length_sql}
+    '''
+
+
+def _create_stats_insert_trigger(cursor: sqlite3.Cursor):
+    """(Пере)создание триггера заполнения result_stats при вставке результата"""
+    with_blobs = column_exists(cursor, 'results', 'blob_id')
+    with_ts = column_exists(cursor, 'results', 'saved_ts')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_results_stats_insert')
+    # Не OR REPLACE: способ разрешения конфликтов переходит во вложенный триггер
+    # trg_result_stats_insert, и его INSERT OR IGNORE обнулял бы почасовую строку
+    cursor.execute(f'''
+        CREATE TRIGGER trg_results_stats_insert AFTER INSERT ON results
+        BEGIN
+            INSERT OR IGNORE INTO result_stats
+                (result_id, model_id, saved_ts, response_time, tokens_used, success, response_length)
+            SELECT {_stats_columns_sql('NEW', with_blobs, with_ts)};
+        END
+    ''')
+
+
+def _v2_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    cursor = conn.cursor()
+    with_blobs = table_exists(cursor, 'blobs') and column_exists(cursor, 'results', 'blob_id')
+    columns = _stats_columns_sql('r', with_blobs, column_exists(cursor, 'results', 'saved_ts'))
+
+    def process(cursor, row):
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO result_stats
+                (result_id, model_id, saved_ts, response_time, tokens_used, success, response_length)
+            SELECT {columns} FROM results r WHERE r.id = ?
+        ''', (row[0],))
+
+    return run_in_batches(conn, '''
+        SELECT r.id FROM results r
+        WHERE r.id > ? AND NOT EXISTS (SELECT 1 FROM result_stats s WHERE s.result_id = r.id)
+        ORDER BY r.id LIMIT ?
+    ''', process, batch_size)
+
+
+def _v2_estimate(cursor: sqlite3.Cursor) -> int:
+    if not table_exists(cursor, 'results'):
+        return 0
+    if not table_exists(cursor, 'result_stats'):
+        return _count(cursor, 'SELECT COUNT(*) FROM results')
+    return _count(cursor, '''
+        SELECT COUNT(*) FROM results r
+        WHERE NOT EXISTS (SELECT 1 FROM result_stats s WHERE s.result_id = r.id)
+    ''')
+
+
+@migration(2, 'Статистика результатов: result_stats и почасовые агрегаты',
+           backfill=_v2_backfill, estimate=_v2_estimate)
+def _v2_result_stats(cursor: sqlite3.Cursor):
+    # result_stats - по строке на результат с уже извлеченными из JSON полями.
+    # model_stats_hourly - материализованные агрегаты по модели и часу,
+    # обновляются инкрементально триггерами при вставке и удалении.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS result_stats (
+            result_id INTEGER PRIMARY KEY,
+            model_id INTEGER,
+            saved_ts INTEGER NOT NULL,
+            response_time REAL,
+            tokens_used INTEGER,
+            success INTEGER NOT NULL,
+            response_length INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_result_stats_model ON result_stats(model_id, saved_ts)')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS model_stats_hourly (
+            model_id INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            success_count INTEGER NOT NULL DEFAULT 0,
+            timed_count INTEGER NOT NULL DEFAULT 0,
+            time_sum REAL NOT NULL DEFAULT 0,
+            tokens_sum INTEGER NOT NULL DEFAULT 0,
+            length_sum INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (model_id, hour)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_model_stats_hour ON model_stats_hourly(hour)')
+
+    # Заполнение result_stats при вставке/удалении результатов
+    _create_stats_insert_trigger(cursor)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_results_stats_delete AFTER DELETE ON results
+        BEGIN
+            DELETE FROM result_stats WHERE result_id = OLD.id;
+        END
+    ''')
+
+    # Инкрементальное обновление почасовых агрегатов
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_result_stats_insert AFTER INSERT ON result_stats
+        BEGIN
+            INSERT OR IGNORE INTO model_stats_hourly (model_id, hour)
+            VALUES (COALESCE(NEW.model_id, 0), NEW.saved_ts / 3600);
+            UPDATE model_stats_hourly SET
+                count = count + 1,
+                success_count = success_count + NEW.success,
+                timed_count = timed_count + (NEW.response_time IS NOT NULL),
+                time_sum = time_sum + COALESCE(NEW.response_time, 0),
+                tokens_sum = tokens_sum + COALESCE(NEW.tokens_used, 0),
+                length_sum = length_sum + NEW.response_length
+            WHERE model_id = COALESCE(NEW.model_id, 0) AND hour = NEW.saved_ts / 3600;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_result_stats_delete AFTER DELETE ON result_stats
+        BEGIN
+            UPDATE model_stats_hourly SET
+                count = count - 1,
+                success_count = success_count - OLD.success,
+                timed_count = timed_count - (OLD.response_time IS NOT NULL),
+                time_sum = time_sum - COALESCE(OLD.response_time, 0),
+                tokens_sum = tokens_sum - COALESCE(OLD.tokens_used, 0),
+                length_sum = length_sum - OLD.response_length
+            WHERE model_id = COALESCE(OLD.model_id, 0) AND hour = OLD.saved_ts / 3600;
+            DELETE FROM model_stats_hourly
+            WHERE model_id = COALESCE(OLD.model_id, 0) AND hour = OLD.saved_ts / 3600 AND count <= 0;
+        END
+    ''')
+
+
+def _v3_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    # Перенос текстов из results.response_text в blobs и заполнение превью.
+    # Освобожденное место возвращается после VACUUM.
+    def process(cursor, row):
+        if row['blob_id'] is None:
+            text = row['response_text']
+            blob_id = db.store_text(cursor, text) if text else None
+        else:
+            text = db.decode_text(row['codec'], row['data']) if row['data'] is not None else ''
+            blob_id = row['blob_id']
+        cursor.execute('''
+            UPDATE results SET blob_id = ?, response_text = CASE WHEN ? IS NULL THEN response_text ELSE '' END,
+                   preview = ?
+            WHERE id = ?
+        ''', (blob_id, blob_id, db.make_preview(text), row['id']))
+
+    return run_in_batches(conn, '''
+        SELECT r.id, r.response_text, r.blob_id, b.codec, b.data FROM results r
+        LEFT JOIN blobs b ON r.blob_id = b.id
+        WHERE r.id > ? AND ((r.blob_id IS NULL AND r.response_text != '') OR r.preview IS NULL)
+        ORDER BY r.id LIMIT ?
+    ''', process, batch_size)
+
+
+def _v3_estimate(cursor: sqlite3.Cursor) -> int:
+    if not table_exists(cursor, 'results'):
+        return 0
+    if not column_exists(cursor, 'results', 'blob_id') or not column_exists(cursor, 'results', 'preview'):
+        return _count(cursor, 'SELECT COUNT(*) FROM results')
+    return _count(cursor, '''
+        SELECT COUNT(*) FROM results
+        WHERE (blob_id IS NULL AND response_text != '') OR preview IS NULL
+    ''')
+
+
+@migration(3, 'Дедуплицированное хранилище ответов blobs и превью в results',
+           backfill=_v3_backfill, estimate=_v3_estimate)
+def _v3_blob_storage(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash TEXT NOT NULL UNIQUE,
+            codec TEXT NOT NULL,
+            text_length INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+    add_column_if_missing(cursor, 'results', 'blob_id', 'INTEGER REFERENCES blobs(id)')
+    add_column_if_missing(cursor, 'results', 'preview', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_blob ON results(blob_id)')
+
+    # Удаление текста, на который больше не ссылается ни один результат
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_results_blob_gc AFTER DELETE ON results
+        WHEN OLD.blob_id IS NOT NULL
+        BEGIN
+            DELETE FROM blobs WHERE id = OLD.blob_id
+                AND NOT EXISTS (SELECT 1 FROM results WHERE blob_id = OLD.blob_id);
+        END
+    ''')
+
+    # Длина ответа для статистики теперь берется из blobs
+    _create_stats_insert_trigger(cursor)
+
+
+def _v4_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    # Разбор строк тегов, сохраненных старыми версиями
+    return run_in_batches(conn, '''
+        SELECT p.id, p.tags FROM prompts p
+        WHERE p.id > ? AND p.tags IS NOT NULL AND p.tags != ''
+            AND NOT EXISTS (SELECT 1 FROM prompt_tags pt WHERE pt.prompt_id = p.id)
+        ORDER BY p.id LIMIT ?
+    ''', lambda cursor, row: db.set_prompt_tags(cursor, row['id'], row['tags']), batch_size)
+
+
+def _v4_estimate(cursor: sqlite3.Cursor) -> int:
+    if not table_exists(cursor, 'prompts'):
+        return 0
+    if not table_exists(cursor, 'prompt_tags'):
+        return _count(cursor, "SELECT COUNT(*) FROM prompts WHERE tags IS NOT NULL AND tags != ''")
+    return _count(cursor, '''
+        SELECT COUNT(*) FROM prompts p
+        WHERE p.tags IS NOT NULL AND p.tags != ''
+            AND NOT EXISTS (SELECT 1 FROM prompt_tags pt WHERE pt.prompt_id = p.id)
+    ''')
+
+
+@migration(4, 'Нормализованные теги: tags и prompt_tags',
+           backfill=_v4_backfill, estimate=_v4_estimate)
+def _v4_tags(cursor: sqlite3.Cursor):
+    # tags - справочник тегов со счетчиком промтов (prompt_count поддерживается триггерами),
+    # prompt_tags - связи промт-тег. Строка prompts.tags сохраняется для отображения.
+    cursor.execute('DROP INDEX IF EXISTS idx_prompts_tags')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_key TEXT NOT NULL UNIQUE,
+            prompt_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_tags (
+            tag_id INTEGER NOT NULL,
+            prompt_id INTEGER NOT NULL,
+            PRIMARY KEY (tag_id, prompt_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompt_tags_prompt ON prompt_tags(prompt_id)')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_prompt_tags_insert AFTER INSERT ON prompt_tags
+        BEGIN
+            UPDATE tags SET prompt_count = prompt_count + 1 WHERE id = NEW.tag_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_prompt_tags_delete AFTER DELETE ON prompt_tags
+        BEGIN
+            UPDATE tags SET prompt_count = prompt_count - 1 WHERE id = OLD.tag_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_prompts_tags_delete AFTER DELETE ON prompts
+        BEGIN
+            DELETE FROM prompt_tags WHERE prompt_id = OLD.id;
+        END
+    ''')
+
+
+# Перевод текстовой даты (локальное время) в миллисекунды UTC
+_TEXT_TO_MS_SQL = "CAST(strftime('%s', {column}, 'utc') AS INTEGER) * 1000"
+
+# Таблица -> (колонка с текстовой датой, колонка с отметкой времени в мс)
+_TIMESTAMP_COLUMNS = [
+    ('prompts', 'date', 'created_ts'),
+    ('models', 'created_date', 'created_ts'),
+    ('results', 'saved_date', 'saved_ts'),
+]
+
+
+def _v5_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    processed = 0
+    for table, text_column, ts_column in _TIMESTAMP_COLUMNS:
+        update_sql = (f'UPDATE {table} SET {ts_column} = '
+                      f'{_TEXT_TO_MS_SQL.format(column=text_column)} WHERE id = ?')
+        processed += run_in_batches(
+            conn,
+            f'SELECT id FROM {table} WHERE id > ? AND {ts_column} IS NULL ORDER BY id LIMIT ?',
+            lambda cursor, row, sql=update_sql: cursor.execute(sql, (row[0],)),
+            batch_size)
+    return processed
+
+
+def _v5_estimate(cursor: sqlite3.Cursor) -> int:
+    total = 0
+    for table, text_column, ts_column in _TIMESTAMP_COLUMNS:
+        if not table_exists(cursor, table):
+            continue
+        if column_exists(cursor, table, ts_column):
+            total += _count(cursor, f'SELECT COUNT(*) FROM {table} WHERE {ts_column} IS NULL')
+        else:
+            total += _count(cursor, f'SELECT COUNT(*) FROM {table}')
+    return total
+
+
+@migration(5, 'Отметки времени в миллисекундах (created_ts, saved_ts) с индексами',
+           backfill=_v5_backfill, estimate=_v5_estimate)
+def _v5_timestamps(cursor: sqlite3.Cursor):
+    # Текстовые колонки дат остаются для совместимости со старыми версиями,
+    # сортировка и фильтры по времени выполняются по целочисленным колонкам
+    for table, text_column, ts_column in _TIMESTAMP_COLUMNS:
+        add_column_if_missing(cursor, table, ts_column, 'INTEGER')
+
+    cursor.execute('DROP INDEX IF EXISTS idx_prompts_date')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompts_created ON prompts(created_ts, id)')
+
+    # Покрывающий индекс списка результатов: сортировка по saved_ts и все колонки
+    # списка читаются из индекса без обращения к строкам
+    cursor.execute('DROP INDEX IF EXISTS idx_results_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_results_saved
+        ON results(saved_ts, id, prompt_id, model_id, preview)
+    ''')
+
+    # Час для статистики берется из saved_ts
+    _create_stats_insert_trigger(cursor)
+
+
+@migration(6, 'Архивирование старых результатов в помесячные разделы')
+def _v6_archive(cursor: sqlite3.Cursor):
+    # Каталог разделов: файлы archive/results-YYYY-MM.db рядом с БД
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            name TEXT PRIMARY KEY,
+            file TEXT NOT NULL,
+            min_ts INTEGER NOT NULL,
+            max_ts INTEGER NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Результаты, перенесенные в архив, помечаются перед удалением из оперативной БД:
+    # их статистика остается в result_stats и почасовых агрегатах
+    add_column_if_missing(cursor, 'results', 'archived', 'INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('DROP TRIGGER IF EXISTS trg_results_stats_delete')
+    cursor.execute('''
+        CREATE TRIGGER trg_results_stats_delete AFTER DELETE ON results
+        WHEN OLD.archived = 0
+        BEGIN
+            DELETE FROM result_stats WHERE result_id = OLD.id;
+        END
+    ''')
+
+
+@migration(7, 'Журнал обслуживания БД')
+def _v7_maintenance_runs(cursor: sqlite3.Cursor):
+    # Длительность шагов в секундах, освобожденное место в байтах
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_ts INTEGER NOT NULL,
+            trigger TEXT NOT NULL,
+            duration REAL NOT NULL,
+            optimize_time REAL,
+            vacuum_time REAL,
+            checkpoint_time REAL,
+            vacuum_mode TEXT,
+            reclaimed_bytes INTEGER NOT NULL DEFAULT 0,
+            wal_frames INTEGER,
+            checkpointed_frames INTEGER,
+            size_before INTEGER,
+            size_after INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_maintenance_runs_started ON maintenance_runs(started_ts)')
+    cursor.execute('''
+        INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)
+    ''', ('maintenance_interval_hours', '24', 'Интервал автоматического обслуживания БД в часах'))
+
+
+def _v8_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    # Промты обходятся по возрастанию id, поэтому из дублей остается самый ранний
+    def process(cursor, row):
+        digest = db.prompt_hash(row['prompt'])
+        cursor.execute('SELECT id FROM prompts WHERE content_hash = ?', (digest,))
+        keeper = cursor.fetchone()
+        if keeper is None:
+            cursor.execute('UPDATE prompts SET content_hash = ? WHERE id = ?', (digest, row['id']))
+            return
+        # Дубль: результаты и теги переходят к сохраняемому промту, связь записывается
+        # в prompt_merges для архивных разделов (в той же транзакции, что и удаление)
+        cursor.execute('UPDATE results SET prompt_id = ? WHERE prompt_id = ?', (keeper['id'], row['id']))
+        cursor.execute('INSERT OR REPLACE INTO prompt_merges (old_id, new_id) VALUES (?, ?)',
+                       (row['id'], keeper['id']))
+        db._merge_prompt_tags(cursor, keeper['id'], row['tags'])
+        cursor.execute('DELETE FROM prompts WHERE id = ?', (row['id'],))
+
+    processed = run_in_batches(conn, '''
+        SELECT id, prompt, tags FROM prompts
+        WHERE id > ? AND content_hash IS NULL
+        ORDER BY id LIMIT ?
+    ''', process, batch_size)
+
+    # Архивные разделы подключаются вне транзакции, по одному
+    cursor = conn.cursor()
+    cursor.execute('SELECT old_id, new_id FROM prompt_merges')
+    merges = [(row['new_id'], row['old_id']) for row in cursor.fetchall()]
+    if merges:
+        for partition in db._get_partitions(cursor):
+            if not os.path.exists(os.path.join(db.get_archive_dir(), partition['file'])):
+                continue
+            with db._attached_partition(conn, partition) as alias:
+                conn.executemany(f'UPDATE {alias}.results SET prompt_id = ? WHERE prompt_id = ?', merges)
+                conn.commit()
+    cursor.execute('DROP TABLE prompt_merges')
+    conn.commit()
+    return processed
+
+
+def _v8_estimate(cursor: sqlite3.Cursor) -> int:
+    if not table_exists(cursor, 'prompts'):
+        return 0
+    if not column_exists(cursor, 'prompts', 'content_hash'):
+        return _count(cursor, 'SELECT COUNT(*) FROM prompts')
+    return _count(cursor, 'SELECT COUNT(*) FROM prompts WHERE content_hash IS NULL')
+
+
+@migration(8, 'Хеш текста промтов и объединение дублей',
+           backfill=_v8_backfill, estimate=_v8_estimate)
+def _v8_prompt_hash(cursor: sqlite3.Cursor):
+    # Хеш нормализованного текста (db.prompt_hash); NULL - еще не обработан переносом
+    add_column_if_missing(cursor, 'prompts', 'content_hash', 'TEXT')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_prompts_hash ON prompts(content_hash)')
+    # Объединенные дубли: old_id -> new_id, до переноса ссылок в архивных разделах
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_merges (
+            old_id INTEGER PRIMARY KEY,
+            new_id INTEGER NOT NULL
+        )
+    ''')
+
+
+def _v9_backfill(conn: sqlite3.Connection, batch_size: int) -> int:
+    # casefold выполняется в Python: lower() в SQLite меняет регистр только латиницы
+    return run_in_batches(conn, '''
+        SELECT id, prompt FROM prompts
+        WHERE id > ? AND title_key IS NULL
+        ORDER BY id LIMIT ?
+    ''', lambda cursor, row: cursor.execute('UPDATE prompts SET title_key = ? WHERE id = ?',
+                                              (db.prompt_title_key(row['prompt']), row['id'])), batch_size)
+
+
+def _v9_estimate(cursor: sqlite3.Cursor) -> int:
+    if not table_exists(cursor, 'prompts'):
+        return 0
+    if not column_exists(cursor, 'prompts', 'title_key'):
+        return _count(cursor, 'SELECT COUNT(*) FROM prompts')
+    return _count(cursor, 'SELECT COUNT(*) FROM prompts WHERE title_key IS NULL')
+
+
+@migration(9, 'Ключ поиска промтов по началу текста',
+           backfill=_v9_backfill, estimate=_v9_estimate)
+def _v9_prompt_title_key(cursor: sqlite3.Cursor):
+    # Начало текста без учета регистра (db.prompt_title_key) для поиска по префиксу в списке промтов
+    add_column_if_missing(cursor, 'prompts', 'title_key', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompts_title ON prompts(title_key, id)')
+
+
+@migration(10, 'Кэш ответов улучшения промтов')
+def _v10_improver_cache(cursor: sqlite3.Cursor):
+    # Разобранные ответы моделей на мета-промт улучшения (JSON); ключ - хеш исходного
+    # промта (db.prompt_hash), тип варианта и модель. Устаревшие записи удаляются по created_ts
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS improver_cache (
+            prompt_hash TEXT NOT NULL,
+            variant_type TEXT NOT NULL,
+            model_id INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_ts INTEGER NOT NULL,
+            PRIMARY KEY (prompt_hash, variant_type, model_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_improver_cache_created ON improver_cache(created_ts)')
+    cursor.execute('''
+        INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)
+    ''', ('improver_cache_ttl_hours', '168', 'Срок хранения ответов улучшения промтов в часах (0 - без кэша)'))
+
+
+@migration(11, 'Сохраненные варианты улучшения промтов')
+def _v11_prompt_variants(cursor: sqlite3.Cursor):
+    # Варианты, полученные пакетным улучшением библиотеки промтов (batch_improver.py):
+    # по строке на вариант, kind - improved/variant/code/analysis/creative
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_variants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_id INTEGER NOT NULL,
+            model_id INTEGER,
+            kind TEXT NOT NULL,
+            text TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            created_ts INTEGER NOT NULL,
+            FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
+            FOREIGN KEY (model_id) REFERENCES models(id) ON DELETE SET NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_prompt_variants_prompt ON prompt_variants(prompt_id, model_id)')
+
+
+# ==================== Запуск миграций ====================
+
+def configure_database(conn: sqlite3.Connection):
+    """
+    Постоянные настройки файла БД (выполняются вне транзакции)
+
+    - auto_vacuum = INCREMENTAL: задается только для новой пустой БД, существующая
+      переводится полным VACUUM при обслуживании (см. maintenance.py);
+    - journal_mode = WAL: чтение не блокирует запись, контрольные точки
+      выполняются при обслуживании.
+    """
+    cursor = conn.cursor()
+    conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    cursor.execute('PRAGMA journal_mode = WAL')
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def latest_version() -> int:
+    """Версия схемы, которую ожидает код приложения"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    """Миграции, которые еще не применены к БД"""
+    current = get_schema_version(conn)
+    return [m for m in MIGRATIONS if m.version > current]
+
+
+def migrate(conn: sqlite3.Connection, dry_run: bool = False, batch_size: int = 500,
+            progress: Optional[Callable[[Migration, str], None]] = None) -> List[Dict]:
+    """
+    Применить недостающие миграции
+
+    Args:
+        conn: Соединение с БД
+        dry_run: Только оценить объем работы, ничего не изменяя
+        batch_size: Размер порции для переноса данных
+        progress: Функция обратного вызова (migration, stage) для отображения хода
+
+    Returns:
+        Отчет: по словарю на миграцию (version, description, rows, batches,
+        а после применения - processed и duration)
+    """
+    current = get_schema_version(conn)
+    if current > latest_version():
+        raise RuntimeError(
+            f'Версия схемы БД ({current}) новее, чем поддерживает приложение ({latest_version()}). '
+            f'Обновите ChatList.')
+
+    if not dry_run:
+        configure_database(conn)
+
+    report = []
+    cursor = conn.cursor()
+    for item in pending_migrations(conn):
+        rows = item.estimate(cursor) if item.estimate else 0
+        entry = {
+            'version': item.version,
+            'description': item.description,
+            'rows': rows,
+            'batches': (rows + batch_size - 1) // batch_size
+        }
+        report.append(entry)
+        if dry_run:
+            continue
+
+        start_time = time.perf_counter()
+
+        # Изменения схемы - в одной транзакции
+        if progress:
+            progress(item, 'schema')
+        conn.commit()
+        cursor.execute('BEGIN')
+        try:
+            item.schema(cursor)
+            if not item.backfill:
+                cursor.execute(f'PRAGMA user_version = {int(item.version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        # Перенос данных порциями; версия фиксируется только после его завершения,
+        # поэтому прерванный перенос будет продолжен при следующем запуске
+        if item.backfill:
+            if progress:
+                progress(item, 'backfill')
+            entry['processed'] = item.backfill(conn, batch_size)
+            cursor.execute(f'PRAGMA user_version = {int(item.version)}')
+            conn.commit()
+
+        entry['duration'] = time.perf_counter() - start_time
+    return report
+
+
+def format_report(report: List[Dict], dry_run: bool = False) -> str:
+    """Текстовый отчет о миграциях для консоли"""
+    if not report:
+        return 'Схема БД актуальна, миграции не требуются'
+    lines = ['План миграций (dry-run):' if dry_run else 'Применены миграции:']
+    for entry in report:
+        line = f"  v{entry['version']}: {entry['description']}"
+        if entry['rows']:
+            line += f" - строк для переноса: {entry['rows']} ({entry['batches']} порций)"
+        if 'duration' in entry:
+            line += f" - {entry['duration']:.2f} с"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -20,6 +20,7 @@ class Model:
         self.model_type = model_data.get('model_type')
         self.is_active = model_data.get('is_active', 1)
         self.created_date = model_data.get('created_date')
+        self.created_ts = model_data.get('created_ts')
     
     def get_api_key(self) -> str:
         """Получить API-ключ из переменных окружения"""
@@ -67,7 +68,8 @@ class Model:
             'api_key_env': self.api_key_env,
             'model_type': self.model_type,
             'is_active': self.is_active,
-            'created_date': self.created_date
+            'created_date': self.created_date,
+            'created_ts': self.created_ts
         }
 
 
@@ -7,10 +7,11 @@
 import json
 import time
 import requests
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, Optional, Any
 from models import Model
 import db
 import logger
+import metrics
 
 
 def send_to_openai(model: Model, prompt: str, timeout: int = 30) -> Dict[str, Any]:
@@ -380,7 +381,158 @@ def send_to_openrouter(model: Model, prompt: str, timeout: int = 30) -> Dict[str
         return result
 
 
-def send_request(model: Model, prompt: str, timeout: Optional[int] = None) -> Dict[str, Any]:
+# ==================== Потоковые ответы (SSE) ====================
+
+# Модели API для потоковых запросов (как в send_to_* выше; для Groq модель задает URL)
+STREAM_API_MODELS = {
+    'openai': 'gpt-3.5-turbo',
+    'deepseek': 'deepseek-chat',
+    'groq': None,
+    'openrouter': 'openai/gpt-3.5-turbo',
+    'anthropic': 'claude-3-sonnet-20240229'
+}
+
+
+def _iter_sse_data(response):
+    """Поле data каждого события SSE (до [DONE])"""
+    response.encoding = 'utf-8'  # text/event-stream без charset requests читает как latin-1
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        yield data
+
+
+def _stream_params(model: Model, prompt: str):
+    """URL, заголовки и тело потокового запроса для типа модели"""
+    model_type = model.model_type.lower()
+    api_key = model.get_api_key()
+    api_model = STREAM_API_MODELS[model_type]
+    if model_type == 'anthropic':
+        headers = {
+            'x-api-key': api_key,
+            'anthropic-version': '2023-06-01',
+            'Content-Type': 'application/json'
+        }
+        payload = {
+            'model': api_model,
+            'max_tokens': 1024,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'stream': True
+        }
+        return model.api_url, headers, payload
+    
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json'
+    }
+    payload = {
+        'messages': [{'role': 'user', 'content': prompt}],
+        'temperature': 0.7,
+        'stream': True
+    }
+    if api_model:
+        payload['model'] = api_model
+    url = model.api_url
+    if model_type == 'openrouter':
+        headers['HTTP-Referer'] = 'https://github.com/chatlist'
+        headers['X-Title'] = 'ChatList'
+        url = url or 'https://openrouter.ai/api/v1/chat/completions'
+    return url, headers, payload
+
+
+def stream_request(model: Model, prompt: str, on_text: Callable[[str], None],
+                   timeout: int = 30) -> Dict[str, Any]:
+    """
+    Отправить запрос с потоковым ответом (OpenAI-совместимые API и Anthropic)
+    
+    Args:
+        model: Объект модели
+        prompt: Текст промта
+        on_text: Функция обратного вызова для каждой полученной части текста
+        timeout: Таймаут соединения и ожидания очередной части в секундах
+    
+    Returns:
+        Словарь с ответом, как у send_to_*, и ttft - время до первой части текста
+        (только в потоковом ответе: у обычного запроса ответ приходит целиком)
+    """
+    model_type = model.model_type.lower()
+    url, headers, payload = _stream_params(model, prompt)
+    parts = []
+    usage = {}
+    ttft = None
+    api_model = payload.get('model')
+    
+    try:
+        start_time = time.time()
+        with requests.post(url, headers=headers, json=payload, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for data in _iter_sse_data(response):
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                if model_type == 'anthropic':
+                    event_type = event.get('type')
+                    if event_type == 'error':
+                        raise requests.exceptions.RequestException(
+                            event.get('error', {}).get('message', 'Ошибка потока'))
+                    if event_type == 'message_start':
+                        usage.update(event.get('message', {}).get('usage') or {})
+                    elif event_type == 'message_delta':
+                        usage.update(event.get('usage') or {})
+                    text = (event.get('delta') or {}).get('text') if event_type == 'content_block_delta' else None
+                else:
+                    if event.get('usage'):
+                        usage = event['usage']
+                    api_model = event.get('model', api_model)
+                    choices = event.get('choices') or [{}]
+                    text = (choices[0].get('delta') or {}).get('content')
+                if text:
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                    parts.append(text)
+                    on_text(text)
+        
+        elapsed_time = time.time() - start_time
+        tokens_used = usage.get('total_tokens') or usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+        metadata = {
+            'tokens_used': tokens_used,
+            'response_time': round(elapsed_time, 2),
+            'model_used': api_model or model_type,
+            'streamed': True
+        }
+        
+        result = {
+            'response_text': ''.join(parts),
+            'metadata': metadata,
+            'success': True
+        }
+        if ttft is not None:
+            result['ttft'] = ttft
+        
+        # Логирование
+        logger.log_request(model.name, prompt, result, elapsed_time)
+        
+        return result
+    except requests.exceptions.RequestException as e:
+        result = {
+            'response_text': f'Ошибка запроса: {str(e)}',
+            'metadata': {},
+            'success': False,
+            'error': str(e)
+        }
+        
+        # Логирование ошибки
+        logger.log_request(model.name, prompt, result)
+        
+        return result
+
+
+def send_request(model: Model, prompt: str, timeout: Optional[int] = None,
+                 on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
     """
     Универсальная функция-роутер для отправки запросов к разным API
     
@@ -388,6 +540,8 @@ def send_request(model: Model, prompt: str, timeout: Optional[int] = None) -> Di
         model: Объект модели
         prompt: Текст промта
         timeout: Таймаут запроса (если None, берется из настроек)
+        on_text: Если задана, ответ запрашивается потоком (SSE) и части текста
+                 передаются в эту функцию по мере получения
     
     Returns:
         Словарь с ответом: {'response_text': str, 'metadata': dict, 'success': bool}
@@ -398,20 +552,31 @@ def send_request(model: Model, prompt: str, timeout: Optional[int] = None) -> Di
     
     model_type = model.model_type.lower()
     
-    if model_type == 'openai':
-        return send_to_openai(model, prompt, timeout)
-    elif model_type == 'deepseek':
-        return send_to_deepseek(model, prompt, timeout)
-    elif model_type == 'groq':
-        return send_to_groq(model, prompt, timeout)
-    elif model_type == 'anthropic':
-        return send_to_anthropic(model, prompt, timeout)
-    elif model_type == 'openrouter':
-        return send_to_openrouter(model, prompt, timeout)
-    else:
+    senders = {
+        'openai': send_to_openai,
+        'deepseek': send_to_deepseek,
+        'groq': send_to_groq,
+        'anthropic': send_to_anthropic,
+        'openrouter': send_to_openrouter
+    }
+    sender = senders.get(model_type)
+    if sender is None:
         return {
             'response_text': f'Неподдерживаемый тип модели: {model_type}',
             'metadata': {},
             'success': False,
             'error': f'Unknown model type: {model_type}'
         }
+    
+    # Замер полного времени запроса для реестра метрик
+    metrics.REQUESTS_IN_FLIGHT.inc(model=model.name, provider=model_type)
+    start_time = time.perf_counter()
+    try:
+        if on_text is not None:
+            result = stream_request(model, prompt, on_text, timeout)
+        else:
+            result = sender(model, prompt, timeout)
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec(model=model.name, provider=model_type)
+    metrics.record_request(model.name, model_type, result, time.perf_counter() - start_time)
+    return result
@@ -4,12 +4,67 @@
 Модуль для улучшения промтов с помощью AI
 """
 
-import json
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Any
 from models import Model
+import db
+import json_stream
 import network
 
 
+# Ключи специализированных версий в ответе get_prompt_variants и их вид в объединенном списке
+SPECIALIZED_KEYS = {
+    'code_version': 'code',
+    'analysis_version': 'analysis',
+    'creative_version': 'creative',
+}
+
+# Не больше одновременных запросов при параллельном улучшении
+MAX_PARALLEL_MODELS = 8
+
+# Сколько вариантов переформулировки берется из ответа одной модели
+MAX_VARIANTS = 3
+
+# Срок хранения ответов в кэше improver_cache по умолчанию (настройка improver_cache_ttl_hours)
+DEFAULT_CACHE_TTL_HOURS = 168
+
+# Тип варианта в кэше для get_prompt_variants (improve_prompt использует свой variant_type)
+MULTI_VARIANT_TYPE = 'multi'
+
+
+def _cache_ttl_ms() -> int:
+    try:
+        hours = float(db.get_setting('improver_cache_ttl_hours', str(DEFAULT_CACHE_TTL_HOURS)))
+    except ValueError:
+        hours = DEFAULT_CACHE_TTL_HOURS
+    return int(hours * 3600 * 1000)
+
+
+def _cache_get(model: Model, original_prompt: str, variant_type: str) -> Optional[Dict[str, Any]]:
+    """Ответ из кэша (с пометкой cached) или None"""
+    try:
+        ttl_ms = _cache_ttl_ms()
+        if ttl_ms <= 0 or model.id is None:
+            return None
+        cached = db.get_improver_cache(db.prompt_hash(original_prompt), variant_type, model.id, ttl_ms)
+    except Exception:
+        return None  # Кэш необязателен: при ошибке БД запрос отправляется в модель
+    if cached is not None:
+        cached['cached'] = True
+    return cached
+
+
+def _cache_put(model: Model, original_prompt: str, variant_type: str, result: Dict[str, Any]):
+    """Сохранить успешный ответ в кэш"""
+    try:
+        ttl_ms = _cache_ttl_ms()
+        if ttl_ms <= 0 or model.id is None:
+            return
+        db.set_improver_cache(db.prompt_hash(original_prompt), variant_type, model.id, result, max_age_ms=ttl_ms)
+    except Exception:
+        pass
+
+
 def create_improvement_prompt(original_prompt: str, variant_type: str = "improved") -> str:
     """
     Создание системного промта для улучшения
@@ -83,7 +138,8 @@ def create_multi_variant_prompt(original_prompt: str) -> str:
     return system_prompt
 
 
-def improve_prompt(model: Model, original_prompt: str, variant_type: str = "improved") -> Dict[str, Any]:
+def improve_prompt(model: Model, original_prompt: str, variant_type: str = "improved",
+                   use_cache: bool = True) -> Dict[str, Any]:
     """
     Улучшение промта с помощью указанной модели
     
@@ -91,10 +147,16 @@ def improve_prompt(model: Model, original_prompt: str, variant_type: str = "impr
         model: Модель для улучшения промта
         original_prompt: Исходный промт
         variant_type: Тип варианта
+        use_cache: Взять ответ из кэша, если он есть (False - запросить заново)
     
     Returns:
-        Словарь с результатом: {'improved_text': str, 'success': bool, 'error': str}
+        Словарь с результатом: {'improved_text': str, 'success': bool, 'error': str},
+        для ответа из кэша - с 'cached': True
     """
+    if use_cache:
+        cached = _cache_get(model, original_prompt, variant_type)
+        if cached is not None:
+            return cached
     try:
         improvement_prompt = create_improvement_prompt(original_prompt, variant_type)
         result = network.send_request(model, improvement_prompt)
@@ -107,10 +169,12 @@ def improve_prompt(model: Model, original_prompt: str, variant_type: str = "impr
             if improved_text.startswith("'") and improved_text.endswith("'"):
                 improved_text = improved_text[1:-1]
             
-            return {
+            result = {
                 'improved_text': improved_text,
                 'success': True
             }
+            _cache_put(model, original_prompt, variant_type, result)
+            return result
         else:
             return {
                 'improved_text': original_prompt,
@@ -125,13 +189,60 @@ def improve_prompt(model: Model, original_prompt: str, variant_type: str = "impr
         }
 
 
-def get_prompt_variants(model: Model, original_prompt: str) -> Dict[str, Any]:
+def _text_or(value: Any, default: Optional[str] = None) -> Optional[str]:
+    """Значение поля ответа, если это непустая строка (модель может вернуть объект, число и т.п.)"""
+    return value if isinstance(value, str) and value.strip() else default
+
+
+def _object_variants(parsed: Dict[str, Any], original_prompt: str) -> Dict[str, Any]:
+    """Поля результата get_prompt_variants из разобранного JSON-объекта ответа"""
+    variants = parsed.get('variants')
+    if not isinstance(variants, list):
+        variants = []
+    return {
+        'improved': _text_or(parsed.get('improved'), original_prompt),
+        'variants': [text for text in variants if _text_or(text)][:MAX_VARIANTS],
+        'code_version': _text_or(parsed.get('code_version')),
+        'analysis_version': _text_or(parsed.get('analysis_version')),
+        'creative_version': _text_or(parsed.get('creative_version')),
+    }
+
+
+def _field_emitter(on_field: Callable[[str, Any], None]):
+    """
+    Функция для network.send_request(on_text=...): разбирает ответ потоком
+    и передает в on_field каждое готовое поле (improved, каждый элемент variants,
+    code_version и т.д.)
+    """
+    parser = json_stream.JsonStreamParser()
+    variants_sent = 0
+    
+    def on_text(text: str):
+        nonlocal variants_sent
+        for path, value in parser.feed(text):
+            if not _text_or(value):
+                continue
+            if len(path) == 1 and (path[0] == 'improved' or path[0] in SPECIALIZED_KEYS):
+                on_field(path[0], value)
+            elif len(path) == 2 and path[0] == 'variants' and variants_sent < MAX_VARIANTS:
+                variants_sent += 1
+                on_field('variants', value)
+    
+    return on_text
+
+
+def get_prompt_variants(model: Model, original_prompt: str, use_cache: bool = True,
+                        on_field: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
     """
     Получение нескольких вариантов улучшения промта
     
     Args:
         model: Модель для улучшения промта
         original_prompt: Исходный промт
+        use_cache: Взять ответ из кэша, если он есть (False - запросить заново)
+        on_field: Если задана, ответ запрашивается потоком и каждое готовое поле
+                  передается в эту функцию (ключ, текст), не дожидаясь конца ответа;
+                  для variants - по одному элементу. Вызывается в потоке запроса
     
     Returns:
         Словарь с вариантами:
@@ -142,12 +253,20 @@ def get_prompt_variants(model: Model, original_prompt: str) -> Dict[str, Any]:
             'analysis_version': Optional[str],
             'creative_version': Optional[str],
             'success': bool,
-            'error': Optional[str]
+            'error': Optional[str],
+            'parsed': False - ответ не разобран как JSON-объект целиком
+                      (поля взяты из оборванного объекта или из строк текста; не кэшируется),
+            'cached': True - для ответа из кэша
         }
     """
+    if use_cache:
+        cached = _cache_get(model, original_prompt, MULTI_VARIANT_TYPE)
+        if cached is not None:
+            return cached
     try:
         multi_prompt = create_multi_variant_prompt(original_prompt)
-        result = network.send_request(model, multi_prompt)
+        on_text = _field_emitter(on_field) if on_field is not None else None
+        result = network.send_request(model, multi_prompt, on_text=on_text)
         
         if not result.get('success', False):
             return {
@@ -162,46 +281,50 @@ def get_prompt_variants(model: Model, original_prompt: str) -> Dict[str, Any]:
         
         response_text = result.get('response_text', '').strip()
         
-        # Попытка парсинга JSON
-        try:
-            # Ищем JSON в ответе (может быть обернут в markdown код блоки)
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_text = response_text[json_start:json_end]
-                parsed = json.loads(json_text)
-                
-                return {
-                    'improved': parsed.get('improved', original_prompt),
-                    'variants': parsed.get('variants', [])[:3],  # Максимум 3 варианта
-                    'code_version': parsed.get('code_version'),
-                    'analysis_version': parsed.get('analysis_version'),
-                    'creative_version': parsed.get('creative_version'),
-                    'success': True
-                }
-        except (json.JSONDecodeError, KeyError):
-            pass
-        
-        # Если JSON не распарсился, пытаемся извлечь варианты из текста
-        # Разделяем на строки и ищем улучшенную версию
-        lines = [line.strip() for line in response_text.split('\n') if line.strip()]
-        
-        improved = original_prompt
-        variants = []
+        # Ответ может быть обернут в ```json и дополнен пояснениями до и после объекта
+        parser = json_stream.JsonStreamParser()
+        parser.feed(response_text)
+        parser.finish()
+        if parser.result is not None:
+            variants_data = _object_variants(parser.result, original_prompt)
+            variants_data['success'] = True
+            _cache_put(model, original_prompt, MULTI_VARIANT_TYPE, variants_data)
+            return variants_data
         
-        # Первая непустая строка - обычно улучшенная версия
-        if lines:
-            improved = lines[0]
-            # Остальные строки - варианты
-            variants = lines[1:4] if len(lines) > 1 else []
+        # Ответы, не разобранные целиком, не кэшируются и помечаются parsed = False
+        if parser.started:
+            # Объект не закрыт (ответ оборван или испорчен): берем уже завершенные поля
+            partial = parser.partial() or {}
+            variants_data = _object_variants(partial, original_prompt)
+            variants_data['parsed'] = False
+            variants_data['success'] = bool(_text_or(partial.get('improved')) or variants_data['variants']
+                                            or any(variants_data[key] for key in SPECIALIZED_KEYS))
+            if not variants_data['success']:
+                variants_data['error'] = parser.error or 'Ответ модели оборван: JSON-объект не закрыт'
+            return variants_data
         
+        # JSON в ответе нет: первая непустая строка - улучшенная версия, остальные - варианты
+        # (строки ограждения ``` пропускаются)
+        lines = [line.strip() for line in response_text.split('\n')
+                 if line.strip() and not line.strip().startswith('```')]
+        if not lines:
+            return {
+                'improved': original_prompt,
+                'variants': [],
+                'code_version': None,
+                'analysis_version': None,
+                'creative_version': None,
+                'parsed': False,
+                'success': False,
+                'error': 'Пустой ответ модели'
+            }
         return {
-            'improved': improved,
-            'variants': variants[:3],
+            'improved': lines[0],
+            'variants': lines[1:MAX_VARIANTS + 1],
             'code_version': None,
             'analysis_version': None,
             'creative_version': None,
+            'parsed': False,
             'success': True
         }
         
@@ -215,3 +338,130 @@ def get_prompt_variants(model: Model, original_prompt: str) -> Dict[str, Any]:
             'success': False,
             'error': str(e)
         }
+
+
+def variant_key(text: str) -> str:
+    """Ключ для сравнения вариантов: без различий в регистре, пробелах и обрамляющих кавычках"""
+    return ' '.join(text.split()).strip('"\'«». ').casefold()
+
+
+class VariantMerger:
+    """
+    Объединение вариантов улучшения от нескольких моделей
+
+    Каждый вариант хранится один раз; для повторов запоминаются модели,
+    которые его предложили. Улучшенной версией считается первая полученная,
+    улучшенные версии остальных моделей попадают в список вариантов.
+    """
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self.by_key: Dict[str, Dict[str, Any]] = {}
+        self.improved: Optional[Dict[str, Any]] = None
+        self.specialized: Dict[str, Dict[str, Any]] = {}
+        self.errors: Dict[str, str] = {}
+
+    def _add(self, kind: str, text: Optional[str], model_name: str) -> Optional[Dict[str, Any]]:
+        if not _text_or(text):
+            return None
+        key = variant_key(text)
+        entry = self.by_key.get(key)
+        if entry is not None:
+            if model_name not in entry['models']:
+                entry['models'].append(model_name)
+            return None
+        entry = {'kind': kind, 'text': text.strip(), 'models': [model_name]}
+        self.by_key[key] = entry
+        self.entries.append(entry)
+        return entry
+
+    def add(self, model_name: str, variants_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Добавить результат get_prompt_variants одной модели
+
+        Returns:
+            Новые (ранее не встречавшиеся) варианты: словари kind, text, models
+        """
+        if not variants_data.get('success', False):
+            self.errors[model_name] = variants_data.get('error', 'Неизвестная ошибка')
+            return []
+        added = []
+        improved_kind = 'improved' if self.improved is None else 'variant'
+        entry = self._add(improved_kind, variants_data.get('improved'), model_name)
+        if entry is not None:
+            added.append(entry)
+            if improved_kind == 'improved':
+                self.improved = entry
+        for text in variants_data.get('variants') or []:
+            entry = self._add('variant', text, model_name)
+            if entry is not None:
+                added.append(entry)
+        for key, kind in SPECIALIZED_KEYS.items():
+            entry = self._add(kind, variants_data.get(key), model_name)
+            if entry is not None:
+                added.append(entry)
+                self.specialized.setdefault(kind, entry)
+        return added
+
+    def add_field(self, model_name: str, key: str, text: str) -> List[Dict[str, Any]]:
+        """Добавить одно поле потокового ответа (см. get_prompt_variants(on_field=...))"""
+        if key == 'variants':
+            return self.add(model_name, {'success': True, 'variants': [text]})
+        return self.add(model_name, {'success': True, key: text})
+
+    def result(self, original_prompt: str) -> Dict[str, Any]:
+        """Объединенный результат в формате get_prompt_variants (плюс candidates и errors)"""
+        return {
+            'improved': self.improved['text'] if self.improved else original_prompt,
+            'variants': [entry['text'] for entry in self.entries if entry['kind'] == 'variant'],
+            'code_version': self.specialized['code']['text'] if 'code' in self.specialized else None,
+            'analysis_version': self.specialized['analysis']['text'] if 'analysis' in self.specialized else None,
+            'creative_version': self.specialized['creative']['text'] if 'creative' in self.specialized else None,
+            'candidates': self.entries,
+            'errors': self.errors,
+            'success': self.improved is not None,
+            'error': None if self.improved is not None else '; '.join(
+                f'{name}: {error}' for name, error in self.errors.items()) or 'Нет ответов'
+        }
+
+
+def get_prompt_variants_parallel(models_list: List[Model], original_prompt: str,
+                                 on_result: Optional[Callable[[Model, Dict[str, Any]], None]] = None,
+                                 max_workers: int = MAX_PARALLEL_MODELS,
+                                 use_cache: bool = True,
+                                 on_field: Optional[Callable[[Model, str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Получение вариантов улучшения сразу от нескольких моделей
+
+    Запросы выполняются параллельно, поэтому общее время - время самой медленной модели.
+
+    Args:
+        models_list: Модели для улучшения промта
+        original_prompt: Исходный промт
+        on_result: Функция обратного вызова (модель, результат get_prompt_variants),
+                   вызывается в вызывающем потоке по мере получения ответов
+        max_workers: Максимум одновременных запросов
+        use_cache: Брать ответы моделей из кэша (False - запросить заново)
+        on_field: Функция обратного вызова (модель, ключ, текст) для полей потоковых
+                  ответов (см. get_prompt_variants); вызывается в потоках запросов
+
+    Returns:
+        Объединенный результат (см. VariantMerger.result)
+    """
+    merger = VariantMerger()
+    if not models_list:
+        return merger.result(original_prompt)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(models_list)))) as executor:
+        futures = {}
+        for model in models_list:
+            model_on_field = None
+            if on_field is not None:
+                model_on_field = lambda key, text, model=model: on_field(model, key, text)
+            futures[executor.submit(get_prompt_variants, model, original_prompt, use_cache, model_on_field)] = model
+        for future in as_completed(futures):
+            model = futures[future]
+            variants_data = future.result()  # get_prompt_variants не выбрасывает исключений
+            merger.add(model.name, variants_data)
+            if on_result:
+                on_result(model, variants_data)
+    return merger.result(original_prompt)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль профилирования запуска приложения
+
+Время этапов запуска (создание QApplication, миграции, построение окна и т.д.)
+замеряется всегда - это несколько вызовов perf_counter. Отчет печатается,
+если main.py запущен с ключом --profile-startup (окно закрывается сразу после
+первой итерации цикла событий).
+
+Команда python cli.py startup-profile запускает такой старт в отдельном
+процессе под python -X importtime и дополняет отчет самыми медленными
+импортами.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+PROFILE_FLAG = '--profile-startup'
+
+# Момент импорта модуля: main.py импортирует его первым, до PyQt5
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """Замер этапов запуска"""
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = start if start is not None else time.perf_counter()
+        self.phases: List[Dict] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замерить этап запуска"""
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                'name': name,
+                'offset': phase_start - self.start,
+                'duration': time.perf_counter() - phase_start
+            })
+
+    def mark(self, name: str):
+        """Отметить момент без длительности (например, первую итерацию цикла событий)"""
+        now = time.perf_counter()
+        self.phases.append({'name': name, 'offset': now - self.start, 'duration': 0.0})
+
+    def total(self) -> float:
+        if not self.phases:
+            return 0.0
+        return max(phase['offset'] + phase['duration'] for phase in self.phases)
+
+    def format_report(self) -> str:
+        lines = ['Этапы запуска:']
+        for phase in self.phases:
+            lines.append(f"  {phase['offset'] * 1000:8.1f} мс  +{phase['duration'] * 1000:7.1f} мс  {phase['name']}")
+        lines.append(f'  Всего: {self.total() * 1000:.1f} мс')
+        return '\n'.join(lines)
+
+
+# Профилировщик текущего процесса
+PROFILER = StartupProfiler(PROCESS_START)
+
+
+def is_requested(argv: Optional[List[str]] = None) -> bool:
+    """Запрошен ли отчет о запуске"""
+    return PROFILE_FLAG in (argv if argv is not None else sys.argv)
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """
+    Разбор вывода python -X importtime
+
+    Строки имеют вид "import time:  self [us] | cumulative | imported package".
+
+    Returns:
+        Список словарей: module, self_us, cumulative_us
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Строка заголовка
+        # Вложенные импорты выделены дополнительными пробелами после первого
+        entries.append({'module': parts[2][1:].rstrip(), 'self_us': self_us, 'cumulative_us': cumulative_us})
+    return entries
+
+
+def format_import_report(entries: List[Dict], top: int = 15) -> str:
+    """Самые медленные импорты (по собственному и суммарному времени)"""
+    total_us = sum(entry['self_us'] for entry in entries)
+    lines = [f'Импорты: {len(entries)} модулей, {total_us / 1000:.1f} мс']
+    lines.append('  Суммарное время (с вложенными импортами):')
+    top_level = [entry for entry in entries if not entry['module'].startswith(' ')]
+    for entry in sorted(top_level, key=lambda e: e['cumulative_us'], reverse=True)[:top]:
+        lines.append(f"    {entry['cumulative_us'] / 1000:8.1f} мс  {entry['module']}")
+    lines.append('  Собственное время:')
+    for entry in sorted(entries, key=lambda e: e['self_us'], reverse=True)[:top]:
+        lines.append(f"    {entry['self_us'] / 1000:8.1f} мс  {entry['module'].strip()}")
+    return '\n'.join(lines)
+
+
+def profile_startup(top: int = 15, timeout: float = 120) -> Dict:
+    """
+    Запустить main.py --profile-startup под python -X importtime в отдельном процессе
+
+    Returns:
+        Словарь: returncode, phases (отчет об этапах), imports (разобранный importtime), report
+    """
+    import subprocess
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')  # Окно не показывается на экране
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', main_path, PROFILE_FLAG],
+        capture_output=True, text=True, encoding='utf-8', errors='replace', env=env, timeout=timeout)
+    imports = parse_importtime(process.stderr)
+    other_errors = [line for line in process.stderr.splitlines() if not line.startswith('import time:')]
+    report = [process.stdout.strip(), format_import_report(imports, top)]
+    if process.returncode != 0 and other_errors:
+        report.append('Ошибки запуска:\n' + '\n'.join(other_errors[-20:]))
+    return {
+        'returncode': process.returncode,
+        'phases': process.stdout,
+        'imports': imports,
+        'report': '\n\n'.join(part for part in report if part)
+    }
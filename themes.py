@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Модуль тем оформления
+
+Таблицы стилей хранятся в файлах themes/<тема>.qss. Файл читается один раз,
+из него убираются комментарии и лишние пробелы; готовая строка кэшируется.
+Размер шрифта добавляется в ту же таблицу стилей, поэтому смена темы и шрифта
+дает один пересчет стилей. Таблица применяется на уровне QApplication и только
+если тема или размер шрифта действительно изменились.
+
+В сборке PyInstaller (--onefile) файлы тем распаковываются в sys._MEIPASS
+(см. --add-data в build.ps1).
+"""
+
+import os
+import re
+import sys
+from functools import lru_cache
+from typing import Optional
+
+
+THEMES_DIR = 'themes'
+DEFAULT_THEME = 'light'
+DEFAULT_FONT_SIZE = 10
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_SPACE_RE = re.compile(r'\s+')
+_PUNCTUATION_SPACE_RE = re.compile(r'\s*([{};:,])\s*')
+
+# Последняя примененная пара (тема, размер шрифта)
+_applied: Optional[tuple] = None
+
+
+def resource_path(*parts: str) -> str:
+    """Путь к файлу ресурсов: рядом с модулем или в каталоге распаковки PyInstaller"""
+    base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, *parts)
+
+
+def compile_stylesheet(text: str) -> str:
+    """Убрать комментарии и лишние пробелы из таблицы стилей"""
+    text = _COMMENT_RE.sub('', text)
+    text = _SPACE_RE.sub(' ', text)
+    return _PUNCTUATION_SPACE_RE.sub(r'\1', text).strip()
+
+
+@lru_cache(maxsize=None)
+def load_stylesheet(theme: str) -> str:
+    """
+    Таблица стилей темы (читается с диска один раз)
+
+    Неизвестная тема или отсутствующий файл дают пустую таблицу - стандартное оформление Qt.
+    """
+    path = resource_path(THEMES_DIR, f'{theme}.qss')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return compile_stylesheet(f.read())
+    except OSError:
+        return ''
+
+
+@lru_cache(maxsize=32)
+def build_stylesheet(theme: str, font_size: int) -> str:
+    """Итоговая таблица стилей: размер шрифта и правила темы"""
+    return f'QWidget{{font-size:{font_size}pt;}}' + load_stylesheet(theme)
+
+
+def apply(app, theme: str, font_size: Optional[int] = None) -> bool:
+    """
+    Применить тему и размер шрифта ко всему приложению
+
+    Args:
+        app: QApplication
+        theme: Имя темы (light/dark)
+        font_size: Размер шрифта в пунктах (None - по умолчанию)
+
+    Returns:
+        True, если таблица стилей была изменена
+    """
+    global _applied
+    key = (theme, font_size or DEFAULT_FONT_SIZE)
+    if key == _applied:
+        return False
+    app.setStyleSheet(build_stylesheet(*key))
+    _applied = key
+    return True